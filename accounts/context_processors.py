@@ -0,0 +1,18 @@
+"""
+Ce module expose les rôles de l'utilisateur aux templates.
+
+Fonctions :
+- roles : ajoute ``roles``, ``is_coach`` et ``is_client`` au contexte.
+"""
+
+
+def roles(request):
+    roles = getattr(request, "roles", None)
+    if roles is None:
+        return {}
+    # Les callables ne sont évalués par le template que s'ils sont utilisés
+    return {
+        "roles": roles,
+        "is_coach": lambda: roles.is_coach,
+        "is_client": lambda: roles.is_client,
+    }
@@ -0,0 +1,41 @@
+"""
+Ce module contient les middlewares de l'application accounts.
+
+Classes :
+- RolesMiddleware : ajoute ``request.roles`` (coach / client), résolu à la demande.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .roles import roles_utilisateur
+
+
+class RolesMiddleware:
+    """
+    Ajoute ``request.roles`` à chaque requête.
+
+    Les rôles ne sont calculés qu'au premier accès, puis lus depuis le cache :
+    une page qui n'en a pas besoin ne coûte aucune requête supplémentaire.
+    Doit être placé après AuthenticationMiddleware.
+
+    Compatible sync et async : sous ASGI, il n'impose pas de passage par un thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.roles = SimpleLazyObject(lambda: roles_utilisateur(request.user))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.roles = SimpleLazyObject(lambda: roles_utilisateur(request.user))
+        return await self.get_response(request)
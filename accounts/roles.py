@@ -0,0 +1,90 @@
+"""
+Ce module résout une fois pour toutes le rôle d'un utilisateur (coach ou client).
+
+Le résultat est mémorisé sur l'objet utilisateur pour la durée de la requête et
+dans le cache Django entre les requêtes. Il est invalidé par les signaux
+d'appartenance aux groupes (voir ``accounts.signals``), dans le processus qui a
+fait la modification : les rôles servent aux contrôles d'accès, ils ne sont donc
+mis en cache que si le cache est partagé entre les processus serveur (voir
+``core.caches``), et relus en base à chaque requête sinon.
+
+Fonctions :
+- roles_utilisateur : rôles d'un utilisateur (coach / client).
+- coachs_actifs : coachs auprès desquels les clients peuvent réserver.
+- invalider_roles : retire du cache les rôles d'utilisateurs donnés.
+- coach_affiche_modifie : indique si un utilisateur enregistré rend la liste des coachs périmée.
+- invalider_coachs_actifs : retire du cache la liste des coachs.
+"""
+
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from core.caches import cache_partage
+
+Roles = namedtuple("Roles", ["is_coach", "is_client"])
+
+AUCUN_ROLE = Roles(is_coach=False, is_client=False)
+
+CACHE_TIMEOUT = 60 * 60
+CLE_COACHS_ACTIFS = "accounts:coachs_actifs"
+
+# Champs des coachs affichés à la réservation (nom complet, ou identifiant à défaut)
+CHAMPS_AFFICHES = frozenset({"username", "first_name", "last_name", "is_active"})
+
+
+def _cle(user_id):
+    return f"accounts:roles:{user_id}"
+
+
+def roles_utilisateur(user):
+    """Retourne les rôles de ``user`` en au plus une requête (aucune si en cache)."""
+    if not user.is_authenticated:
+        return AUCUN_ROLE
+
+    roles = getattr(user, "_roles", None)
+    if roles is None:
+        partage = cache_partage()
+        roles = cache.get(_cle(user.pk)) if partage else None
+        if roles is None:
+            groupes = set(user.groups.values_list("name", flat=True))
+            roles = Roles(is_coach="coach" in groupes, is_client="client" in groupes)
+            if partage:
+                cache.set(_cle(user.pk), roles, CACHE_TIMEOUT)
+        user._roles = roles
+    return roles
+
+
+def coachs_actifs():
+    """Retourne la liste des coachs proposés à la réservation (une requête au plus, aucune si en cache)."""
+    partage = cache_partage()
+    coachs = cache.get(CLE_COACHS_ACTIFS) if partage else None
+    if coachs is None:
+        coachs = list(get_user_model().objects.filter(groups__name="coach", is_active=True).order_by("pk"))
+        if partage:
+            cache.set(CLE_COACHS_ACTIFS, coachs, CACHE_TIMEOUT)
+    return coachs
+
+
+def invalider_roles(user_ids):
+    cache.delete_many([_cle(user_id) for user_id in user_ids])
+
+
+def coach_affiche_modifie(user):
+    """
+    Indique si l'enregistrement de ``user`` rend périmée la liste des coachs en
+    cache : coach de la liste dont un champ affiché a changé, ou coach actif
+    absent de la liste (réactivé).
+    """
+    coachs = cache.get(CLE_COACHS_ACTIFS)
+    if coachs is None:
+        return False
+    affiche = next((coach for coach in coachs if coach.pk == user.pk), None)
+    if affiche is not None:
+        return any(getattr(affiche, champ) != getattr(user, champ) for champ in CHAMPS_AFFICHES)
+    return user.is_active and roles_utilisateur(user).is_coach
+
+
+def invalider_coachs_actifs():
+    cache.delete(CLE_COACHS_ACTIFS)
@@ -0,0 +1,49 @@
+"""
+Ce module invalide le cache des rôles quand l'appartenance aux groupes change.
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import roles
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def groupes_modifies(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear", "pre_clear"):
+        return
+
+    if not reverse:
+        # user.groups.add(...) : l'instance est l'utilisateur
+        user_ids = [instance.pk]
+    elif pk_set:
+        # group.user_set.add(...) : pk_set contient les utilisateurs
+        user_ids = list(pk_set)
+    else:
+        # group.user_set.clear() : membres relus avant la suppression
+        user_ids = list(instance.user_set.values_list("pk", flat=True))
+
+    roles.invalider_roles(user_ids)
+    roles.invalider_coachs_actifs()
+
+
+@receiver(pre_delete, sender=Group)
+@receiver(post_save, sender=Group)
+def groupe_modifie(sender, instance, **kwargs):
+    roles.invalider_roles(instance.user_set.values_list("pk", flat=True))
+    roles.invalider_coachs_actifs()
+
+
+@receiver(post_save, sender=User)
+def utilisateur_modifie(sender, instance, created, update_fields, **kwargs):
+    # Les coachs sont mis en cache avec leur nom affiché à la réservation. Un nouvel
+    # utilisateur n'est encore dans aucun groupe, et la mise à jour de last_login
+    # à chaque connexion ne touche aucun champ affiché.
+    if created or (update_fields is not None and not roles.CHAMPS_AFFICHES & set(update_fields)):
+        return
+    if roles.coach_affiche_modifie(instance):
+        roles.invalider_coachs_actifs()
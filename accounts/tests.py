@@ -1,3 +1,152 @@
-from django.test import TestCase
+import tempfile
+from datetime import time, timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from seances.models import Seance
+
+from .roles import coachs_actifs, roles_utilisateur
+
+
+class RolesTests(TestCase):
+    """Les rôles sont mis en cache (partagé) et invalidés quand les groupes changent."""
+
+    def setUp(self):
+        # Cache partagé entre processus, comme en production
+        dossier = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": dossier},
+            "fragments": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "fragments"},
+        }))
+        cache.clear()
+        self.coachs = Group.objects.create(name="coach")
+        self.clients = Group.objects.create(name="client")
+        self.user = User.objects.create_user("alice")
+
+    def roles(self):
+        # Nouvel objet à chaque appel : seul le cache partagé est sollicité
+        return roles_utilisateur(User.objects.get(pk=self.user.pk))
+
+    def test_roles_en_cache(self):
+        self.clients.user_set.add(self.user)
+        self.assertTrue(self.roles().is_client)
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            roles_utilisateur(user)
+
+    def test_pas_de_cache_local(self):
+        # Cache propre au processus : les rôles sont relus en base à chaque requête
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            self.clients.user_set.add(self.user)
+            self.assertTrue(self.roles().is_client)
+            user = User.objects.get(pk=self.user.pk)
+            with self.assertNumQueries(1):
+                self.assertTrue(roles_utilisateur(user).is_client)
+
+    def test_invalidation_sur_changement_de_groupe(self):
+        self.clients.user_set.add(self.user)
+        self.assertFalse(self.roles().is_coach)
+
+        self.user.groups.add(self.coachs)
+        self.assertTrue(self.roles().is_coach)
+        self.assertEqual(coachs_actifs(), [self.user])
+
+        self.coachs.user_set.clear()
+        self.assertFalse(self.roles().is_coach)
+        self.assertEqual(coachs_actifs(), [])
+
+    def test_invalidation_des_coachs_sur_champ_affiche(self):
+        self.coachs.user_set.add(self.user)
+        client = User.objects.create_user("bob")
+        self.clients.user_set.add(client)
+        coachs_actifs()
+
+        # Connexion (last_login), enregistrement d'un client ou d'un coach inchangé : liste conservée
+        self.client.force_login(self.user)
+        client.first_name = "Bob"
+        client.save()
+        User.objects.get(pk=self.user.pk).save()
+        with self.assertNumQueries(0):
+            coachs_actifs()
+
+        coach = User.objects.get(pk=self.user.pk)
+        coach.first_name = "Alice"
+        coach.save()
+        self.assertEqual(coachs_actifs()[0].get_full_name(), "Alice")
+
+        coach.is_active = False
+        coach.save(update_fields=["is_active"])
+        self.assertEqual(coachs_actifs(), [])
+        coach.is_active = True
+        coach.save()
+        self.assertEqual(coachs_actifs(), [coach])
+
+    def test_redirection_dashboard(self):
+        self.coachs.user_set.add(self.user)
+        self.client.force_login(self.user)
+        self.assertRedirects(self.client.get(reverse("accounts:dashboard")), reverse("accounts:dashboard_coach"))
+
+
+@override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cached_db")
+class SessionsTests(TestCase):
+    """
+    Les pages courantes n'écrivent pas la table des sessions (messages en cookie),
+    et ne la lisent pas avec le backend ``cached_db`` (défaut avec un cache partagé).
+    """
+
+    def setUp(self):
+        cache.clear()
+        Group.objects.create(name="coach")
+        Group.objects.create(name="client")
+
+    def requetes_session(self, *appels):
+        with CaptureQueriesContext(connection) as requetes:
+            for appel in appels:
+                appel()
+        return [requete["sql"] for requete in requetes if "django_session" in requete["sql"]]
+
+    def test_inscription_puis_tableau_de_bord(self):
+        response = self.client.post(reverse("accounts:signup"), {
+            "username": "bob", "email": "bob@exemple.fr",
+            "password1": "Motdepasse-solide-42", "password2": "Motdepasse-solide-42",
+        })
+        self.assertRedirects(response, reverse("accounts:dashboard"), fetch_redirect_response=False)
+
+        response = self.client.get(reverse("accounts:dashboard_client"))
+        self.assertTrue(response.context["show_signup_modal"])
+        requetes = self.requetes_session(lambda: self.client.get(reverse("accounts:dashboard_client")))
+        self.assertEqual(requetes, [])
+
+    def test_message_flash_sans_ecriture_de_session(self):
+        client = User.objects.create_user("bob")
+        Group.objects.get(name="client").user_set.add(client)
+        coach = User.objects.create_user("coach")
+        Group.objects.get(name="coach").user_set.add(coach)
+        seance = Seance.objects.create(
+            client=client, coach=coach, date=timezone.localdate() + timedelta(days=7), heure_debut=time(10, 0),
+            objet="Coaching personnel",
+        )
+        self.client.force_login(client)
+
+        reponses = []
+        requetes = self.requetes_session(
+            lambda: reponses.append(self.client.post(reverse("seances:annuler_seance", args=[seance.pk]))),
+            lambda: reponses.append(self.client.get(reverse("accounts:dashboard_client"))),
+        )
+        self.assertEqual(requetes, [])
+        self.assertContains(reponses[1], "Le rendez-vous a été annulé.")
+
+    def test_backend_db_sans_ecriture(self):
+        client = User.objects.create_user("bob")
+        Group.objects.get(name="client").user_set.add(client)
+        with self.settings(SESSION_ENGINE="django.contrib.sessions.backends.db"):
+            self.client.force_login(client)
+            requetes = self.requetes_session(lambda: self.client.get(reverse("accounts:dashboard_client")))
+        self.assertEqual(len(requetes), 1)
+        self.assertTrue(requetes[0].startswith("SELECT"))
@@ -7,6 +7,9 @@ from django.contrib.auth.models import Group
 from django.contrib.auth.decorators import login_required 
 from django.views.decorators.cache import never_cache
 from django.utils.timezone import now, localtime,localdate
+from core.asynchrone import arender, autilisateur
+from django.urls import reverse
+from seances import agenda, fragments
 from seances.models import Seance
 from datetime import date
 """
@@ -17,8 +20,8 @@ Fonctions :
 - logout_user : Gère la déconnexion des utilisateurs.
 - signup_user : Gère l'inscription des nouveaux utilisateurs.
 - dashboard : Redirige les utilisateurs vers leur tableau de bord approprié.
-- dashboard_client : Affiche le tableau de bord pour les clients.
-- dashboard_coach : Affiche le tableau de bord pour les coachs.
+- dashboard_client : Affiche le tableau de bord pour les clients (async).
+- dashboard_coach : Affiche le tableau de bord pour les coachs (async).
 
 """
 @never_cache
@@ -107,7 +110,8 @@ def dashboard(request):
     """
     Redirige les utilisateurs vers leur tableau de bord approprié.
 
-    Vérifie si l'utilisateur appartient au groupe "coach" ou "client" et redirige en conséquence.
+    Vérifie si l'utilisateur appartient au groupe "coach" ou "client" (rôles mis en cache,
+    voir ``accounts.roles``) et redirige en conséquence.
 
     Paramètres :
     - request : L'objet HttpRequest contenant les données de la requête.
@@ -115,9 +119,9 @@ def dashboard(request):
     Retourne :
     - Une redirection vers le tableau de bord du coach, du client ou la page d'accueil.
     """
-    if request.user.groups.filter(name="coach").exists():
+    if request.roles.is_coach:
         return redirect("accounts:dashboard_coach")
-    elif request.user.groups.filter(name="client").exists():
+    elif request.roles.is_client:
         return redirect("accounts:dashboard_client")
     else: 
         return redirect("core:index")
@@ -125,9 +129,9 @@ def dashboard(request):
 
 @login_required
 @never_cache
-def dashboard_client(request):
+async def dashboard_client(request):
     """
-    Affiche le tableau de bord pour les clients.
+    Affiche le tableau de bord pour les clients (vue asynchrone).
 
     Récupère les rendez-vous futurs du client connecté et les affiche dans un rendu.
 
@@ -137,39 +141,30 @@ def dashboard_client(request):
     Retourne :
     - Un rendu de la page du tableau de bord du client avec les rendez-vous.
     """
+    user = await autilisateur(request)
+
     # Récupérer et supprimer la clé 'show_signup_modal' de la session
-    show_signup_modal = request.session.pop('show_signup_modal', None)
+    show_signup_modal = await request.session.apop('show_signup_modal', None)
 
     current_datetime = localtime(now())  # datetime aware au fuseau local
 
-    mes_rendezvous = Seance.objects.filter(
-    client=request.user,
-    code_rdv=0
-    ).filter(
-        date__gt=current_datetime.date()
-    ) | Seance.objects.filter(
-        client=request.user,
-        code_rdv=0,
-        date=current_datetime.date(),
-        heure_debut__gt=current_datetime.time()
-    )
-
+    mes_rendezvous = [rdv async for rdv in Seance.objects.upcoming_for_client(user, current_datetime)]
 
     context = {
-        'is_client': True,
-        'is_coach': False,
         'show_signup_modal': show_signup_modal,
         'mes_rendezvous': mes_rendezvous,
+        'url_agenda': request.build_absolute_uri(reverse('seances:agenda_ics', args=[agenda.jeton(user)])),
     }
-    return render(request, 'accounts/dashboard_client.html', context)
+    return await arender(request, 'accounts/dashboard_client.html', context)
 
 @login_required
 @never_cache
-def dashboard_coach(request):
+async def dashboard_coach(request):
     """
-    Affiche le tableau de bord pour les coachs.
+    Affiche le tableau de bord pour les coachs (vue asynchrone).
 
     Récupère les rendez-vous du jour pour le coach connecté et les affiche dans un rendu.
+    Le tableau est mis en cache par coach et par jour (voir ``seances.fragments``).
 
     Paramètres :
     - request : L'objet HttpRequest contenant les données de la requête.
@@ -177,19 +172,20 @@ def dashboard_coach(request):
     Retourne :
     - Un rendu de la page du tableau de bord du coach avec les rendez-vous du jour.
     """
+    user = await autilisateur(request)
     today = localdate()  # Date du jour, timezone-aware
 
-    # Ne récupérer que les séances du jour
-    rendezvous_coach = Seance.objects.filter(
-        coach=request.user,
-        date=today,
-        code_rdv=0
-    ).order_by('heure_debut')
+    async def contexte_tableau():
+        return {'rendezvous_coach': [rdv async for rdv in Seance.objects.today_for_coach(user, today)]}
 
+    # Tableau des séances du jour, servi depuis le cache tant qu'aucune séance du coach ne change
+    tableau_rendezvous = await fragments.arendre(
+        request, "rendezvous_du_jour", user.pk, today,
+        'accounts/partials/rendezvous_du_jour.html', contexte_tableau,
+    )
 
     context = {
-        'is_client': False,
-        'is_coach': True,
-        'rendezvous_coach': rendezvous_coach,
+        'tableau_rendezvous': tableau_rendezvous,
+        'url_agenda': request.build_absolute_uri(reverse('seances:agenda_ics', args=[agenda.jeton(user)])),
     }
-    return render(request, 'accounts/dashboard_coach.html', context)
+    return await arender(request, 'accounts/dashboard_coach.html', context)
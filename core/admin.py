@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Tache
+
+
+@admin.register(Tache)
+class TacheAdmin(admin.ModelAdmin):
+    list_display = ("nom", "statut", "executer_le", "tentatives", "verrouille_par")
+    list_filter = ("statut", "nom")
+    readonly_fields = ("cree_le", "termine_le", "derniere_erreur")
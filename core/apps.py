@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.contrib.staticfiles.apps import StaticFilesConfig
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import caches  # noqa: F401 (contrôle de déploiement des caches)
+
+        if settings.PRECHARGER_GABARITS:
+            from .gabarits import precharger_gabarits
+            precharger_gabarits()
+
+
+class CoreStaticFilesConfig(StaticFilesConfig):
+    # Les SVG et la police de Bootstrap Icons ne servent qu'à construire
+    # static/css/icones.css (voir core.icones) : inutile de les collecter.
+    ignore_patterns = [*StaticFilesConfig.ignore_patterns, "css/bootstrap-icons/*"]
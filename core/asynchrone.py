@@ -0,0 +1,31 @@
+"""
+Ce module contient des utilitaires pour les vues asynchrones.
+
+Fonctions :
+- autilisateur : charge l'utilisateur connecté avec l'API async de Django.
+- arender : équivalent de ``render`` pour les vues async.
+"""
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+
+
+async def autilisateur(request):
+    """
+    Charge l'utilisateur connecté et le place dans ``request.user``.
+
+    ``request.user`` est paresseux et se charge de façon synchrone : sans cet
+    appel, le premier accès depuis une vue async lèverait SynchronousOnlyOperation.
+    """
+    request.user = await request.auser()
+    return request.user
+
+
+async def arender(request, template_name, context=None):
+    """
+    Rend un template depuis une vue async.
+
+    Le rendu (context processors, session, messages) reste synchrone : il est
+    exécuté dans un thread. Les données de ``context`` doivent déjà être chargées.
+    """
+    return await sync_to_async(render)(request, template_name, context)
@@ -0,0 +1,54 @@
+"""
+Ce module indique si un cache est partagé entre les processus serveur.
+
+Les données dérivées mises en cache (occupations, horaires, rôles, fragments)
+sont invalidées par des signaux, dans le processus qui a fait la modification.
+L'invalidation n'atteint les autres processus que si le cache est partagé :
+avec un cache en mémoire du processus (LocMemCache), un seul processus
+serveur doit tourner.
+
+Fonctions :
+- cache_partage : indique si un alias de cache est vu par tous les processus.
+- duree_cache : durée de conservation, raccourcie pour un cache propre au processus.
+- verifier_caches : contrôle de déploiement (``manage.py check --deploy``).
+"""
+
+import functools
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.module_loading import import_string
+
+
+@functools.cache
+def _backend_partage(backend):
+    return not issubclass(import_string(backend), LocMemCache)
+
+
+def cache_partage(alias="default"):
+    return _backend_partage(settings.CACHES[alias]["BACKEND"])
+
+
+# Durée maximale (en secondes) d'une entrée dans un cache propre au processus :
+# borne le temps pendant lequel un autre processus sert une donnée périmée
+DUREE_CACHE_LOCAL = 60
+
+
+def duree_cache(duree, alias="default"):
+    """Retourne ``duree`` si le cache est partagé, sinon au plus ``DUREE_CACHE_LOCAL``."""
+    return duree if cache_partage(alias) else min(duree, DUREE_CACHE_LOCAL)
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def verifier_caches(app_configs, **kwargs):
+    return [
+        checks.Warning(
+            f"Le cache « {alias} » est propre à chaque processus : ses invalidations "
+            "n'atteignent pas les autres processus serveur.",
+            hint="Avec plusieurs processus, choisir un cache partagé (CACHE_BACKEND / FRAGMENT_CACHE_BACKEND).",
+            id="core.W001",
+        )
+        for alias in settings.CACHES
+        if not cache_partage(alias)
+    ]
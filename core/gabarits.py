@@ -0,0 +1,71 @@
+"""
+Ce module précharge les gabarits du projet dans le cache du moteur de templates.
+
+Avec le chargeur ``cached`` (voir TEMPLATES dans les réglages), un gabarit est
+lu et compilé une seule fois par processus, à sa première utilisation. Le
+préchargement déplace ce coût au démarrage : la première requête de chaque
+page après un déploiement n'analyse plus ``base.html``, ``dashboard.html`` et
+leurs inclusions.
+
+Le moteur ``GabaritsMesures`` (BACKEND des réglages TEMPLATES) chronomètre
+aussi chaque rendu pour les métriques de requêtes (voir ``core.metriques``).
+
+Classes :
+- GabaritMesure : gabarit dont le rendu est chronométré.
+- GabaritsMesures : moteur Django qui retourne des ``GabaritMesure``.
+
+Fonctions :
+- precharger_gabarits : compile tous les gabarits .html du projet.
+"""
+
+from pathlib import Path
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist, engines
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from .metriques import mesurer_gabarit
+
+
+class GabaritMesure(Template):
+    def render(self, context=None, request=None):
+        with mesurer_gabarit():
+            return super().render(context, request)
+
+
+class GabaritsMesures(DjangoTemplates):
+    def from_string(self, template_code):
+        return GabaritMesure(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return GabaritMesure(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def _dossiers(loader):
+    # Le chargeur « cached » délègue à une liste de chargeurs
+    for sous_loader in getattr(loader, "loaders", [loader]):
+        for dossier in sous_loader.get_dirs():
+            yield Path(dossier)
+
+
+def precharger_gabarits():
+    """
+    Compile les gabarits .html des dossiers du projet (hors django.contrib)
+    et retourne la liste de leurs noms.
+    """
+    noms = []
+    for moteur in engines.all():
+        if not isinstance(moteur, DjangoTemplates):
+            continue
+        for loader in moteur.engine.template_loaders:
+            for dossier in _dossiers(loader):
+                if not dossier.is_relative_to(settings.BASE_DIR):
+                    continue
+                for chemin in sorted(dossier.rglob("*.html")):
+                    nom = chemin.relative_to(dossier).as_posix()
+                    moteur.get_template(nom)
+                    noms.append(nom)
+    return noms
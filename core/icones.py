@@ -0,0 +1,72 @@
+"""
+Ce module produit la feuille ``static/css/icones.css`` : le sous-ensemble de
+Bootstrap Icons réellement utilisé par les gabarits.
+
+Chaque icône est intégrée au CSS sous forme de masque SVG (data URI) coloré
+par ``currentColor`` : les classes ``bi bi-…`` des gabarits restent inchangées,
+mais le navigateur ne télécharge plus ni la police complète ni la feuille de
+style de plus de 2 000 icônes.
+
+Fonctions :
+- icones_utilisees : noms des icônes référencées par les gabarits et scripts du projet.
+- generer_css : contenu de la feuille de style pour une liste d'icônes.
+"""
+
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from django.apps import apps
+from django.conf import settings
+
+SOURCE = Path(settings.BASE_DIR) / "static" / "css" / "bootstrap-icons"
+DESTINATION = Path(settings.BASE_DIR) / "static" / "css" / "icones.css"
+
+MOTIF_ICONE = re.compile(r"\bbi-[a-z0-9]+(?:-[a-z0-9]+)*")
+
+ENTETE = """/* Fichier généré par « python manage.py construire_icones » : ne pas modifier. */
+.bi::before, [class^="bi-"]::before, [class*=" bi-"]::before {
+  content: "";
+  display: inline-block;
+  width: 1em;
+  height: 1em;
+  vertical-align: -.125em;
+  background-color: currentColor;
+  -webkit-mask: var(--bi) no-repeat center / contain;
+  mask: var(--bi) no-repeat center / contain;
+}
+"""
+
+
+def _fichiers_a_analyser():
+    dossiers = [Path(d) for d in settings.TEMPLATES[0]["DIRS"]]
+    for config in apps.get_app_configs():
+        chemin = Path(config.path)
+        # Seules les applications du projet (pas django.contrib)
+        if chemin.is_relative_to(settings.BASE_DIR):
+            dossiers += [chemin / "templates", chemin / "static"]
+    for dossier in dossiers:
+        yield from dossier.rglob("*.html")
+        yield from dossier.rglob("*.js")
+
+
+def icones_utilisees():
+    """Retourne la liste triée des icônes utilisées qui existent dans Bootstrap Icons."""
+    noms = set()
+    for fichier in _fichiers_a_analyser():
+        noms.update(MOTIF_ICONE.findall(fichier.read_text(encoding="utf-8")))
+    return sorted(nom for nom in noms if (SOURCE / f"{nom[3:]}.svg").exists())
+
+
+def _data_uri(svg):
+    svg = " ".join(svg.split()).replace('"', "'")
+    return "data:image/svg+xml," + quote(svg, safe=" /:=',;.-")
+
+
+def generer_css(noms):
+    """Retourne la feuille de style contenant les icônes ``noms`` (ex. ``bi-pencil``)."""
+    regles = [ENTETE]
+    for nom in noms:
+        svg = (SOURCE / f"{nom[3:]}.svg").read_text(encoding="utf-8")
+        regles.append(f'.{nom}::before {{ --bi: url("{_data_uri(svg)}"); }}\n')
+    return "".join(regles)
@@ -0,0 +1,104 @@
+"""
+Commande de comparaison du débit des pages de lecture entre WSGI et ASGI.
+
+Les deux chemins sont exercés dans le processus, sans serveur HTTP :
+- WSGI : ``Client`` (WSGIHandler) appelé depuis un pool de threads,
+  un thread par requête simultanée, comme un serveur WSGI multi-threads ;
+- ASGI : ``AsyncClient`` (ASGIHandler) appelé depuis une boucle asyncio,
+  les requêtes simultanées partageant un seul thread.
+
+Exemple :
+    python manage.py bench_asgi --utilisateur coach1 --requetes 500 --concurrence 32
+"""
+
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+PAGES_COACH = ["accounts:dashboard_coach", "seances:futures_sessions_coach", "seances:historique_coach"]
+PAGES_CLIENT = ["accounts:dashboard_client", "seances:historique_client"]
+
+
+class Command(BaseCommand):
+    help = "Compare le débit des pages de lecture servies en WSGI et en ASGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--utilisateur", required=True, help="Nom d'un coach ou d'un client existant.")
+        parser.add_argument("--requetes", type=int, default=200, help="Nombre de requêtes par mode.")
+        parser.add_argument("--concurrence", type=int, default=16, help="Requêtes simultanées.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options["utilisateur"])
+        except User.DoesNotExist:
+            raise CommandError(f"Utilisateur inconnu : {options['utilisateur']}")
+
+        pages = PAGES_COACH if user.groups.filter(name="coach").exists() else PAGES_CLIENT
+        urls = [reverse(page) for page in pages]
+        requetes, concurrence = options["requetes"], options["concurrence"]
+
+        # Les clients de test envoient l'en-tête « Host: testserver »
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for mode, mesure in (("WSGI", self.mesurer_wsgi), ("ASGI", self.mesurer_asgi)):
+                debut = time.perf_counter()
+                durees = mesure(user, urls, requetes, concurrence)
+                total = time.perf_counter() - debut
+                self.afficher(mode, durees, total)
+
+    def mesurer_wsgi(self, user, urls, requetes, concurrence):
+        def executer(numeros):
+            client = Client()
+            client.force_login(user)
+            durees = []
+            try:
+                for numero in numeros:
+                    debut = time.perf_counter()
+                    response = client.get(urls[numero % len(urls)])
+                    durees.append(time.perf_counter() - debut)
+                    self.verifier(response)
+            finally:
+                connections.close_all()
+            return durees
+
+        lots = [range(i, requetes, concurrence) for i in range(concurrence)]
+        with ThreadPoolExecutor(max_workers=concurrence) as pool:
+            return [duree for durees in pool.map(executer, lots) for duree in durees]
+
+    def mesurer_asgi(self, user, urls, requetes, concurrence):
+        async def executer(numeros):
+            client = AsyncClient()
+            await client.aforce_login(user)
+            durees = []
+            for numero in numeros:
+                debut = time.perf_counter()
+                response = await client.get(urls[numero % len(urls)])
+                durees.append(time.perf_counter() - debut)
+                self.verifier(response)
+            return durees
+
+        async def principal():
+            lots = [range(i, requetes, concurrence) for i in range(concurrence)]
+            resultats = await asyncio.gather(*(executer(lot) for lot in lots))
+            return [duree for durees in resultats for duree in durees]
+
+        return asyncio.run(principal())
+
+    def verifier(self, response):
+        if response.status_code != 200:
+            raise CommandError(f"Réponse inattendue : {response.status_code}")
+
+    def afficher(self, mode, durees, total):
+        centiles = statistics.quantiles(durees, n=100)
+        self.stdout.write(
+            f"{mode} : {len(durees) / total:.1f} req/s, "
+            f"p50 {centiles[49] * 1000:.1f} ms, p95 {centiles[94] * 1000:.1f} ms, p99 {centiles[98] * 1000:.1f} ms"
+        )
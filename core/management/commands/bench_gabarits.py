@@ -0,0 +1,107 @@
+"""
+Commande de mesure du rendu des gabarits à listes de séances.
+
+Chaque gabarit est rendu avec des jeux de données synthétiques (séances et
+clients construits en mémoire, sans base de données) de 10, 1 000 et 10 000
+séances par défaut. Pour chaque rendu sont affichés :
+- le temps (meilleur de ``--repetitions`` rendus, gabarit déjà compilé),
+- le temps par ligne, qui doit rester stable quand la taille augmente,
+- le pic d'allocations mémoire mesuré par tracemalloc,
+- la taille du HTML produit.
+
+Exemple :
+    python manage.py bench_gabarits --tailles 10 1000 10000 --repetitions 5
+"""
+
+import time
+import tracemalloc
+from datetime import date, time as heure, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+from django.test import RequestFactory
+
+from accounts.roles import Roles
+from seances.forms import TraitementSeancesForm
+from seances.models import Seance
+
+
+def _seances(nombre, coach, jour):
+    User = get_user_model()
+    seances = []
+    for i in range(nombre):
+        client = User(id=i + 1, username=f"client{i}", first_name=f"Prénom{i}", last_name=f"Nom{i}")
+        minutes = 8 * 60 + i % (12 * 60)
+        seances.append(Seance(
+            id=i + 1,
+            client=client,
+            coach=coach,
+            date=jour - timedelta(days=i // (12 * 60)),
+            heure_debut=heure(minutes // 60, minutes % 60),
+            objet="Coaching personnel",
+            code_rdv=i % 5,
+            message=f"Note de séance n°{i}",
+        ))
+    return seances
+
+
+# Gabarit -> construction du contexte à partir de la liste de séances
+GABARITS = {
+    "accounts/partials/rendezvous_du_jour.html": lambda seances, jour: {"rendezvous_coach": seances},
+    "seances/partials/futures_seances_tableau.html": lambda seances, jour: {"futures_seances": seances},
+    "seances/partials/historique_coach_tableau.html": lambda seances, jour: {
+        "historique_rdv": seances,
+        "curseur_suivant": None,
+        "seances_oubliees": seances,
+        "has_seances_oubliees": True,
+        "statuts_traitement": TraitementSeancesForm.STATUTS,
+        "today": jour,
+    },
+    "seances/historique_client.html": lambda seances, jour: {
+        "historiques": seances,
+        "curseur_suivant": "2025-01-01_08:00:00_1",
+        "today": jour,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = "Mesure le temps de rendu et les allocations des gabarits à listes de séances."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tailles", type=int, nargs="+", default=[10, 1000, 10000])
+        parser.add_argument("--repetitions", type=int, default=3)
+        parser.add_argument("--gabarit", action="append", help="Limite la mesure à ce gabarit (répétable).")
+
+    def handle(self, *args, **options):
+        coach = get_user_model()(id=1_000_000, username="coach", first_name="Coach")
+        request = RequestFactory().get("/")
+        request.user = coach
+        request.roles = Roles(is_coach=True, is_client=False)
+        jour = date(2025, 7, 21)
+
+        self.stdout.write(f"{'gabarit':<50} {'séances':>8} {'ms':>10} {'µs/ligne':>10} {'pic Kio':>10} {'Kio HTML':>10}")
+        for nom in options["gabarit"] or GABARITS:
+            gabarit = get_template(nom)
+            for taille in options["tailles"]:
+                contexte = GABARITS[nom](_seances(taille, coach, jour), jour)
+                # Premier rendu hors mesure : compilation et caches de résolution d'URL
+                html = gabarit.render(contexte, request)
+
+                durees = []
+                for _ in range(options["repetitions"]):
+                    debut = time.perf_counter()
+                    gabarit.render(contexte, request)
+                    durees.append(time.perf_counter() - debut)
+
+                tracemalloc.start()
+                gabarit.render(contexte, request)
+                _, pic = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                meilleur = min(durees)
+                self.stdout.write(
+                    f"{nom:<50} {taille:>8} {meilleur * 1000:>10.1f} {meilleur / taille * 1e6:>10.1f} "
+                    f"{pic / 1024:>10.0f} {len(html) / 1024:>10.0f}"
+                )
@@ -0,0 +1,329 @@
+"""
+Commande de test de charge du parcours de réservation.
+
+Des utilisateurs virtuels rejouent en parallèle, chacun dans son thread, le
+parcours complet d'un utilisateur réel, à partir des comptes créés par
+``seed_coaching`` :
+- client : connexion → tableau de bord → prise de rendez-vous (page et
+  premier créneau libre, réservation avec ``--reserver``) → historique →
+  déconnexion ;
+- coach : connexion → tableau de bord → historique → déconnexion.
+
+Les requêtes passent soit par ``Client`` (dans le processus, sans serveur
+HTTP), soit par HTTP vers un serveur lancé à part (``--url``), pour mesurer
+aussi le serveur d'application. La commande affiche le débit (parcours et
+requêtes par seconde) et les centiles p50, p95 et p99 de chaque étape.
+
+Pour comparer une modification à une référence fixe : même base (même
+``--graine`` de ``seed_coaching``), mêmes paramètres, parcours sans
+réservation pour ne pas modifier les données, et résultats enregistrés avec
+``--sortie`` puis comparés avec ``--reference``.
+
+Exemple :
+    python manage.py bench_parcours --utilisateurs 16 --iterations 20 --sortie reference.json
+    python manage.py bench_parcours --utilisateurs 16 --iterations 20 --reference reference.json
+"""
+
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http.cookiejar import CookieJar
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urljoin, urlsplit
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+ETAPES_CLIENT = ["connexion", "tableau_de_bord", "prise_rdv", "historique", "deconnexion"]
+ETAPES_COACH = ["connexion", "tableau_de_bord", "historique", "deconnexion"]
+REDIRECTIONS_MAX = 5
+
+
+class Erreur(Exception):
+    pass
+
+
+class ClientInterne:
+    """Requêtes servies dans le processus par ``django.test.Client``."""
+
+    def __init__(self, url):
+        self.client = Client()
+
+    def requete(self, methode, chemin, donnees=None):
+        if methode == "POST":
+            response = self.client.post(chemin, donnees or {})
+        else:
+            response = self.client.get(chemin, donnees or {})
+        return response.status_code, response.get("Location"), response.content
+
+    def fermer(self):
+        connections.close_all()
+
+
+class _SansRedirection(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ClientHTTP:
+    """Requêtes HTTP vers un serveur lancé à part, avec cookies et jeton CSRF."""
+
+    def __init__(self, url):
+        self.url = url
+        self.cookies = CookieJar()
+        self.ouvreur = build_opener(HTTPCookieProcessor(self.cookies), _SansRedirection)
+
+    def requete(self, methode, chemin, donnees=None):
+        url = urljoin(self.url, chemin)
+        corps = None
+        entetes = {"Referer": self.url}
+        if methode == "POST":
+            corps = urlencode(donnees or {}).encode()
+            jeton = next((cookie.value for cookie in self.cookies if cookie.name == settings.CSRF_COOKIE_NAME), "")
+            entetes["X-CSRFToken"] = jeton
+        elif donnees:
+            url += "?" + urlencode(donnees)
+        try:
+            with self.ouvreur.open(Request(url, data=corps, headers=entetes, method=methode), timeout=60) as reponse:
+                return reponse.status, reponse.headers.get("Location"), reponse.read()
+        except HTTPError as erreur:
+            return erreur.code, erreur.headers.get("Location"), erreur.read()
+
+    def fermer(self):
+        pass
+
+
+class Utilisateur:
+    """Utilisateur virtuel : rejoue son parcours et chronomètre chaque étape."""
+
+    def __init__(self, client, username, mot_de_passe, est_coach, reserver):
+        self.client = client
+        self.username = username
+        self.mot_de_passe = mot_de_passe
+        self.est_coach = est_coach
+        self.reserver = reserver
+        self.requetes = 0
+        self.reservations = 0
+
+    def naviguer(self, methode, chemin, donnees=None):
+        """Envoie une requête et suit les redirections ; retourne le corps de la dernière réponse."""
+        for _ in range(REDIRECTIONS_MAX):
+            statut, location, contenu = self.client.requete(methode, chemin, donnees)
+            self.requetes += 1
+            if statut in (301, 302, 303):
+                methode, chemin, donnees = "GET", urlsplit(location).path or chemin, None
+                continue
+            if statut != 200:
+                raise Erreur(f"{methode} {chemin} : {statut}")
+            return contenu
+        raise Erreur(f"{chemin} : trop de redirections")
+
+    def parcours(self, durees, erreurs):
+        for etape in ETAPES_COACH if self.est_coach else ETAPES_CLIENT:
+            debut = time.perf_counter()
+            try:
+                getattr(self, etape)()
+            except Erreur:
+                erreurs[etape] = erreurs.get(etape, 0) + 1
+                return
+            durees.setdefault(etape, []).append(time.perf_counter() - debut)
+
+    def connexion(self):
+        self.naviguer("GET", reverse("accounts:login"))
+        contenu = self.naviguer("POST", reverse("accounts:login"), {
+            "username": self.username, "password": self.mot_de_passe,
+        })
+        if b"Identifiant ou mot de passe incorrect" in contenu:
+            raise Erreur(f"Connexion refusée pour {self.username}")
+
+    def tableau_de_bord(self):
+        self.naviguer("GET", reverse("accounts:dashboard"))
+
+    def prise_rdv(self):
+        self.naviguer("GET", reverse("seances:prise_rdv"))
+        creneau = json.loads(self.naviguer("GET", reverse("seances:premier_creneau"), {
+            "objet": "Coaching personnel",
+        }))
+        if self.reserver and "erreur" not in creneau:
+            self.naviguer("POST", reverse("seances:prise_rdv"), {
+                "coach": creneau["coach"],
+                "date": date.fromisoformat(creneau["date"]).strftime("%d/%m/%Y"),
+                "heure_debut": creneau["heure"],
+                "objet": "Coaching personnel",
+            })
+            self.reservations += 1
+
+    def historique(self):
+        self.naviguer("GET", reverse("seances:historique_coach" if self.est_coach else "seances:historique_client"))
+
+    def deconnexion(self):
+        self.naviguer("GET", reverse("accounts:logout"))
+
+
+def _centile(triees, q):
+    if len(triees) < 2:
+        return triees[0]
+    return statistics.quantiles(triees, n=100, method="inclusive")[round(q * 100) - 1]
+
+
+class Command(BaseCommand):
+    help = "Rejoue en parallèle le parcours de réservation et mesure débit et latences."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--utilisateurs", type=int, default=8, help="Utilisateurs virtuels simultanés.")
+        parser.add_argument("--iterations", type=int, default=10, help="Parcours rejoués par utilisateur.")
+        parser.add_argument("--echauffement", type=int, default=1, help="Parcours non mesurés avant la mesure.")
+        parser.add_argument(
+            "--part-coachs", type=float, default=0.2, help="Part des utilisateurs virtuels qui sont des coachs.",
+        )
+        parser.add_argument("--prefixe", default="seed", help="Préfixe des comptes créés par seed_coaching.")
+        parser.add_argument("--mot-de-passe", default="motdepasse", help="Mot de passe de ces comptes.")
+        parser.add_argument("--url", help="Adresse d'un serveur lancé à part (sinon, requêtes dans le processus).")
+        parser.add_argument(
+            "--reserver", action="store_true", help="Réserve le premier créneau libre (modifie les données).",
+        )
+        parser.add_argument("--sortie", help="Fichier JSON où enregistrer les résultats.")
+        parser.add_argument("--reference", help="Fichier JSON de résultats auxquels comparer cette mesure.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        prefixe = options["prefixe"]
+        comptes = {
+            role: list(
+                User.objects.filter(username__startswith=f"{prefixe}_{role}_").order_by("pk")
+                .values_list("username", flat=True)[:options["utilisateurs"]]
+            )
+            for role in ("coach", "client")
+        }
+        if not comptes["client"] or not comptes["coach"]:
+            raise CommandError(f"Aucun compte « {prefixe}_… » : lancez d'abord seed_coaching.")
+
+        nb_coachs = round(options["utilisateurs"] * options["part_coachs"])
+        utilisateurs = [
+            (comptes["coach"][numero % len(comptes["coach"])], True) if numero < nb_coachs
+            else (comptes["client"][numero % len(comptes["client"])], False)
+            for numero in range(options["utilisateurs"])
+        ]
+        fabrique = ClientHTTP if options["url"] else ClientInterne
+
+        def executer(compte):
+            username, est_coach = compte
+            client = fabrique(options["url"])
+            utilisateur = Utilisateur(client, username, options["mot_de_passe"], est_coach, options["reserver"])
+            durees, erreurs = {}, {}
+            try:
+                for _ in range(options["echauffement"]):
+                    utilisateur.parcours({}, {})
+                utilisateur.requetes = utilisateur.reservations = 0
+                depart.wait()
+                for _ in range(options["iterations"]):
+                    utilisateur.parcours(durees, erreurs)
+            except BaseException:
+                # Libère les autres threads et le thread principal qui attendent le départ
+                depart.abort()
+                raise
+            finally:
+                client.fermer()
+            return durees, erreurs, utilisateur.requetes, utilisateur.reservations
+
+        # Départ commun après l'échauffement de tous les utilisateurs virtuels
+        depart = threading.Barrier(len(utilisateurs) + 1)
+        # Les clients de test envoient l'en-tête « Host: testserver »
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            with ThreadPoolExecutor(max_workers=len(utilisateurs)) as pool:
+                futures = [pool.submit(executer, compte) for compte in utilisateurs]
+                try:
+                    depart.wait()
+                except threading.BrokenBarrierError:
+                    pass  # l'erreur du thread fautif est relevée par future.result()
+                debut = time.perf_counter()
+                resultats = [future.result() for future in futures]
+                total = time.perf_counter() - debut
+
+        resume = self.resumer(resultats, total, options, nb_coachs)
+        self.afficher(resume)
+        if options["reference"]:
+            self.comparer(resume, json.loads(Path(options["reference"]).read_text(encoding="utf-8")))
+        if options["sortie"]:
+            Path(options["sortie"]).write_text(json.dumps(resume, indent=2, ensure_ascii=False), encoding="utf-8")
+            self.stdout.write(f"Résultats enregistrés dans {options['sortie']}.")
+
+    def resumer(self, resultats, total, options, nb_coachs):
+        durees, erreurs = {}, {}
+        requetes = reservations = parcours = 0
+        for durees_utilisateur, erreurs_utilisateur, requetes_utilisateur, reservations_utilisateur in resultats:
+            for etape, valeurs in durees_utilisateur.items():
+                durees.setdefault(etape, []).extend(valeurs)
+            for etape, nombre in erreurs_utilisateur.items():
+                erreurs[etape] = erreurs.get(etape, 0) + nombre
+            requetes += requetes_utilisateur
+            reservations += reservations_utilisateur
+            parcours += len(durees_utilisateur.get("deconnexion", []))
+        etapes = {}
+        for etape in dict.fromkeys(ETAPES_CLIENT + ETAPES_COACH):
+            triees = sorted(durees.get(etape, []))
+            etapes[etape] = {
+                "nombre": len(triees),
+                "erreurs": erreurs.get(etape, 0),
+                **{
+                    f"p{round(q * 100)}_ms": round(_centile(triees, q) * 1000, 2) if triees else None
+                    for q in (0.5, 0.95, 0.99)
+                },
+            }
+        return {
+            "parametres": {
+                "utilisateurs": options["utilisateurs"],
+                "coachs": nb_coachs,
+                "iterations": options["iterations"],
+                "mode": "http" if options["url"] else "interne",
+                "reserver": options["reserver"],
+            },
+            "duree_s": round(total, 3),
+            "parcours_par_s": round(parcours / total, 2),
+            "requetes_par_s": round(requetes / total, 2),
+            "reservations": reservations,
+            "etapes": etapes,
+        }
+
+    def afficher(self, resume):
+        self.stdout.write(
+            f"{resume['parcours_par_s']} parcours/s, {resume['requetes_par_s']} requêtes/s "
+            f"en {resume['duree_s']} s ({resume['reservations']} réservation(s))."
+        )
+        self.stdout.write(f"{'Étape':<16} {'n':>6} {'err.':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for etape, mesures in resume["etapes"].items():
+            centiles = " ".join(
+                f"{mesures[cle]:>9.1f}" if mesures[cle] is not None else f"{'—':>9}"
+                for cle in ("p50_ms", "p95_ms", "p99_ms")
+            )
+            self.stdout.write(f"{etape:<16} {mesures['nombre']:>6} {mesures['erreurs']:>5} {centiles}")
+
+    def comparer(self, resume, reference):
+        if reference["parametres"] != resume["parametres"]:
+            self.stderr.write("Attention : paramètres différents de ceux de la référence.")
+
+        def ecart(valeur, ancienne):
+            if valeur is None or not ancienne:
+                return "—"
+            return f"{(valeur - ancienne) / ancienne * 100:+.1f} %"
+
+        self.stdout.write(
+            f"Débit par rapport à la référence : "
+            f"{ecart(resume['parcours_par_s'], reference['parcours_par_s'])} (parcours/s)"
+        )
+        for etape, mesures in resume["etapes"].items():
+            ancienne = reference["etapes"].get(etape, {})
+            self.stdout.write(
+                f"{etape:<16} p50 {ecart(mesures['p50_ms'], ancienne.get('p50_ms'))}, "
+                f"p95 {ecart(mesures['p95_ms'], ancienne.get('p95_ms'))}, "
+                f"p99 {ecart(mesures['p99_ms'], ancienne.get('p99_ms'))}"
+            )
@@ -0,0 +1,19 @@
+"""
+Commande de génération de ``static/css/icones.css``.
+
+À relancer après l'ajout d'une icône ``bi-…`` dans un gabarit ; un test
+vérifie que le fichier versionné est à jour.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.icones import DESTINATION, generer_css, icones_utilisees
+
+
+class Command(BaseCommand):
+    help = "Génère la feuille de style des icônes Bootstrap utilisées par les gabarits."
+
+    def handle(self, *args, **options):
+        noms = icones_utilisees()
+        DESTINATION.write_text(generer_css(noms), encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(f"{len(noms)} icônes écrites dans {DESTINATION}"))
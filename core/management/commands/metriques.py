@@ -0,0 +1,52 @@
+"""
+Commande d'affichage des métriques des requêtes (voir ``core.metriques``).
+
+Affiche, par vue, le nombre de requêtes de la fenêtre glissante et les
+centiles de chaque mesure, fusionnés sur tous les processus serveur.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.metriques import CENTILES, centile, prometheus, registre
+
+COLONNES = (
+    ("duree", "Durée (ms)", 1000),
+    ("sql_requetes", "SQL (nb)", 1),
+    ("sql_duree", "SQL (ms)", 1000),
+    ("gabarits_duree", "Gabarits (ms)", 1000),
+    ("taille", "Taille (Ko)", 1 / 1024),
+)
+
+
+class Command(BaseCommand):
+    help = "Affiche les centiles p50/p95/p99 des requêtes par vue sur la fenêtre glissante."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prometheus", action="store_true", help="Sortie au format texte Prometheus.")
+
+    def handle(self, *args, **options):
+        fenetre, cumul = registre.lire()
+        if options["prometheus"]:
+            self.stdout.write(prometheus(fenetre, cumul), ending="")
+            return
+        if not fenetre:
+            self.stdout.write("Aucune requête mesurée sur la fenêtre.")
+            return
+
+        centiles = "/".join(f"p{round(q * 100)}" for q in CENTILES)
+        self.stdout.write(f"Centiles {centiles} sur les {registre.fenetre()} dernières minutes\n")
+        entete = f"{'Vue':<40} {'Requêtes':>8}" + "".join(f" {titre:>22}" for _, titre, _ in COLONNES)
+        self.stdout.write(entete)
+        self.stdout.write("-" * len(entete))
+        # Vues les plus lentes (p95) en premier
+        vues = sorted(fenetre, key=lambda vue: -centile(fenetre[vue]["duree"], "duree", 0.95))
+        for vue in vues:
+            ligne = f"{vue:<40} {fenetre[vue]['duree']['n']:>8}"
+            for metrique, _, echelle in COLONNES:
+                histogramme = fenetre[vue].get(metrique)
+                if histogramme is None:
+                    ligne += f" {'—':>22}"
+                    continue
+                valeurs = "/".join(f"{centile(histogramme, metrique, q) * echelle:.1f}" for q in CENTILES)
+                ligne += f" {valeurs:>22}"
+            self.stdout.write(ligne)
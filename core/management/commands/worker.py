@@ -0,0 +1,114 @@
+"""
+Commande d'exécution des tâches de fond (voir ``core.taches``).
+
+Le processus principal prend les tâches en charge par lots et les confie à un
+pool de threads (par défaut, adapté aux envois d'e-mails qui attendent le
+réseau) ou de processus (travail de calcul). Plusieurs workers peuvent tourner
+en même temps, sur une ou plusieurs machines.
+
+Toutes les heures, le worker supprime aussi les tâches terminées anciennes et
+les sessions expirées (voir ``core.sessions``).
+
+SIGTERM ou Ctrl+C arrêtent la prise en charge de nouvelles tâches ; les tâches
+en cours sont menées à leur terme avant la sortie.
+"""
+
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.sessions import purger_sessions
+from core.taches import executer_tache, purger_taches, reserver_taches
+
+INTERVALLE_PURGE = 60 * 60
+
+
+class Command(BaseCommand):
+    help = "Exécute les tâches de fond (e-mails, rappels…) enregistrées en base."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrence", type=int, default=4, help="Nombre de tâches exécutées en parallèle.")
+        parser.add_argument(
+            "--pool", choices=["thread", "processus"], default="thread",
+            help="Pool d'exécution : threads (par défaut) ou processus.",
+        )
+        parser.add_argument(
+            "--intervalle", type=float, default=1.0,
+            help="Attente en secondes quand aucune tâche n'est à exécuter.",
+        )
+        parser.add_argument(
+            "--une-fois", action="store_true",
+            help="Exécute les tâches arrivées à échéance puis s'arrête (cron, tests).",
+        )
+        parser.add_argument(
+            "--conserver-jours", type=int, default=7,
+            help="Durée de conservation des tâches terminées.",
+        )
+
+    def handle(self, *args, **options):
+        self.arret = False
+        if not options["une_fois"]:
+            signal.signal(signal.SIGTERM, self.arreter)
+            signal.signal(signal.SIGINT, self.arreter)
+
+        concurrence = options["concurrence"]
+        travailleur = f"{socket.gethostname()}:{os.getpid()}"
+        if options["pool"] == "processus":
+            # Les connexions ouvertes ne doivent pas être partagées avec les processus du pool
+            connections.close_all()
+            # Processus « spawn » : Django est configuré dans chaque processus avant sa première tâche
+            pool = ProcessPoolExecutor(
+                concurrence, mp_context=multiprocessing.get_context("spawn"), initializer=django.setup,
+            )
+        else:
+            pool = ThreadPoolExecutor(concurrence, thread_name_prefix="worker")
+
+        self.stdout.write(f"Worker {travailleur} : {concurrence} {options['pool']}(s).")
+        executees = 0
+        en_cours = set()
+        derniere_purge = 0.0
+        with pool:
+            while not self.arret:
+                if time.monotonic() - derniere_purge > INTERVALLE_PURGE:
+                    purger_taches(timedelta(days=options["conserver_jours"]))
+                    purger_sessions()
+                    derniere_purge = time.monotonic()
+
+                places = concurrence - len(en_cours)
+                ids = reserver_taches(places, travailleur) if places else []
+                en_cours |= {pool.submit(executer_tache, tache_id) for tache_id in ids}
+
+                if not en_cours:
+                    if options["une_fois"]:
+                        break
+                    time.sleep(options["intervalle"])
+                    continue
+
+                # Reprend dès qu'une place se libère (ou pour relever de nouvelles tâches)
+                terminees, en_cours = wait(en_cours, timeout=options["intervalle"], return_when=FIRST_COMPLETED)
+                self.signaler_erreurs(terminees)
+                executees += len(terminees)
+
+            wait(en_cours)
+            self.signaler_erreurs(en_cours)
+            executees += len(en_cours)
+
+        self.stdout.write(self.style.SUCCESS(f"{executees} tâche(s) exécutée(s)."))
+
+    def signaler_erreurs(self, futures):
+        # Erreur hors de la tâche (base indisponible…) : la tâche reste « en cours »
+        # et sera reprise après DELAI_VERROU
+        for future in futures:
+            if future.exception() is not None:
+                self.stderr.write(f"Erreur du worker : {future.exception()!r}")
+
+    def arreter(self, *args):
+        self.arret = True
@@ -0,0 +1,275 @@
+"""
+Ce module mesure les requêtes HTTP par vue et agrège les mesures en histogrammes.
+
+Pour chaque requête échantillonnée (voir ``core.middleware.MetriquesMiddleware``),
+on relève : durée totale, nombre et durée des requêtes SQL, durée de rendu des
+gabarits et taille de la réponse. Chaque valeur incrémente un compteur
+d'histogramme à intervalles logarithmiques (bornes en progression géométrique
+de raison 1,2 : un centile est estimé à 10 % près), dans la tranche de la
+minute courante. Le coût par requête est de quelques additions en mémoire.
+
+Chaque processus serveur écrit ses tranches dans un fichier JSON de
+METRIQUES_DOSSIER au plus toutes les ``INTERVALLE_ECRITURE`` secondes. La
+commande ``metriques`` et la vue Prometheus fusionnent les fichiers de tous les
+processus sur une fenêtre glissante (METRIQUES_FENETRE minutes) pour calculer
+les centiles p50, p95 et p99.
+
+Classes :
+- Mesure : valeurs relevées pendant une requête.
+- Registre : histogrammes du processus, écriture et lecture des fichiers.
+
+Fonctions :
+- mesure_courante : mesure de la requête en cours (ou None).
+- enregistrer_requete_sql : « execute wrapper » qui compte les requêtes SQL.
+- mesurer_gabarit : contexte qui chronomètre un rendu de gabarit.
+- centile : estime un centile depuis un histogramme.
+- prometheus : exporte les histogrammes au format texte Prometheus.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+
+INTERVALLE_ECRITURE = 10
+RAISON = 1.2
+
+
+def _bornes(minimum, maximum):
+    nombre = math.ceil(math.log(maximum / minimum, RAISON))
+    return [minimum * RAISON ** i for i in range(nombre + 1)]
+
+
+# Nom -> (description, nom Prometheus, bornes des intervalles)
+METRIQUES = {
+    "duree": ("Durée de la requête", "coaching_requete_duree_secondes", _bornes(1e-4, 120)),
+    # Petits nombres entiers : un intervalle par valeur jusqu'à 20
+    "sql_requetes": ("Nombre de requêtes SQL", "coaching_requete_sql_requetes", [*range(20), *_bornes(20, 1e5)]),
+    "sql_duree": ("Durée des requêtes SQL", "coaching_requete_sql_duree_secondes", _bornes(1e-5, 120)),
+    "gabarits_duree": ("Durée du rendu des gabarits", "coaching_requete_gabarits_duree_secondes", _bornes(1e-5, 120)),
+    "taille": ("Taille de la réponse", "coaching_reponse_taille_octets", _bornes(10, 1e9)),
+}
+
+CENTILES = (0.5, 0.95, 0.99)
+
+
+class Mesure:
+    """Valeurs relevées pendant une requête (partagées avec les threads de sync_to_async)."""
+
+    __slots__ = ("sql_requetes", "sql_duree", "gabarits_duree", "profondeur_gabarit")
+
+    def __init__(self):
+        self.sql_requetes = 0
+        self.sql_duree = 0.0
+        self.gabarits_duree = 0.0
+        self.profondeur_gabarit = 0
+
+
+_mesure = ContextVar("mesure", default=None)
+
+
+def mesure_courante():
+    return _mesure.get()
+
+
+def commencer_mesure():
+    """Démarre une mesure pour le contexte courant ; retourne ``(mesure, jeton)``."""
+    mesure = Mesure()
+    return mesure, _mesure.set(mesure)
+
+
+def terminer_mesure(jeton):
+    _mesure.reset(jeton)
+
+
+def enregistrer_requete_sql(execute, sql, params, many, context):
+    """Compte et chronomètre les requêtes SQL de la requête HTTP mesurée."""
+    mesure = _mesure.get()
+    if mesure is None:
+        return execute(sql, params, many, context)
+    debut = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        mesure.sql_requetes += 1
+        mesure.sql_duree += time.perf_counter() - debut
+
+
+@contextmanager
+def mesurer_gabarit():
+    """Chronomètre un rendu ; les rendus imbriqués ne sont comptés qu'une fois."""
+    mesure = _mesure.get()
+    if mesure is None:
+        yield
+        return
+    mesure.profondeur_gabarit += 1
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        mesure.profondeur_gabarit -= 1
+        if not mesure.profondeur_gabarit:
+            mesure.gabarits_duree += time.perf_counter() - debut
+
+
+def _histogramme():
+    return {"n": 0, "s": 0.0, "b": {}}
+
+
+def _ajouter(histogramme, metrique, valeur):
+    histogramme["n"] += 1
+    histogramme["s"] += valeur
+    index = str(bisect_left(METRIQUES[metrique][2], valeur))
+    histogramme["b"][index] = histogramme["b"].get(index, 0) + 1
+
+
+def _fusionner(cible, source):
+    cible["n"] += source["n"]
+    cible["s"] += source["s"]
+    for index, nombre in source.get("b", {}).items():
+        cible["b"][index] = cible["b"].get(index, 0) + nombre
+
+
+def centile(histogramme, metrique, q):
+    """Estime le centile ``q`` (entre 0 et 1) par interpolation dans l'intervalle qui le contient."""
+    if not histogramme["n"]:
+        return None
+    bornes = METRIQUES[metrique][2]
+    rang = q * histogramme["n"]
+    cumul = 0
+    for index in sorted(histogramme["b"], key=int):
+        nombre = histogramme["b"][index]
+        if cumul + nombre >= rang:
+            i = int(index)
+            haut = bornes[min(i, len(bornes) - 1)]
+            bas = bornes[i - 1] if 0 < i <= len(bornes) else (0 if i == 0 else haut)
+            if isinstance(haut, int):
+                # Intervalle d'une seule valeur entière (voir sql_requetes)
+                return haut
+            return bas + (haut - bas) * (rang - cumul) / nombre
+        cumul += nombre
+    return bornes[-1]
+
+
+class Registre:
+    """
+    Histogrammes du processus : ``tranches[minute][vue][metrique]`` sur la
+    fenêtre glissante, et ``cumul[vue][metrique]`` (nombre et somme) depuis le
+    démarrage du processus.
+    """
+
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.reinitialiser()
+
+    def reinitialiser(self):
+        with self.verrou:
+            self.tranches = {}
+            self.cumul = {}
+            self.derniere_ecriture = time.monotonic()
+
+    @staticmethod
+    def dossier():
+        return Path(settings.METRIQUES_DOSSIER)
+
+    @staticmethod
+    def fenetre():
+        return settings.METRIQUES_FENETRE
+
+    def enregistrer(self, vue, valeurs):
+        """Ajoute les ``valeurs`` (metrique -> valeur) d'une requête de ``vue``."""
+        minute = str(int(time.time() // 60))
+        with self.verrou:
+            tranche = self.tranches.setdefault(minute, {}).setdefault(vue, {})
+            cumul = self.cumul.setdefault(vue, {})
+            for metrique, valeur in valeurs.items():
+                _ajouter(tranche.setdefault(metrique, _histogramme()), metrique, valeur)
+                total = cumul.setdefault(metrique, {"n": 0, "s": 0.0})
+                total["n"] += 1
+                total["s"] += valeur
+            ecrire = time.monotonic() - self.derniere_ecriture >= INTERVALLE_ECRITURE
+        if ecrire:
+            self.ecrire()
+
+    def ecrire(self):
+        """Écrit les tranches de la fenêtre et le cumul du processus dans son fichier."""
+        limite = int(time.time() // 60) - self.fenetre()
+        with self.verrou:
+            self.tranches = {minute: vues for minute, vues in self.tranches.items() if int(minute) > limite}
+            contenu = json.dumps({"tranches": self.tranches, "cumul": self.cumul})
+            self.derniere_ecriture = time.monotonic()
+        dossier = self.dossier()
+        dossier.mkdir(parents=True, exist_ok=True)
+        chemin = dossier / f"{os.getpid()}.json"
+        temporaire = dossier / f"{os.getpid()}.{threading.get_ident()}.tmp"
+        temporaire.write_text(contenu, encoding="utf-8")
+        os.replace(temporaire, chemin)
+
+    def lire(self):
+        """
+        Fusionne les fichiers de tous les processus.
+
+        Retourne ``(fenetre, cumul)`` : histogrammes ``{vue: {metrique: histogramme}}``
+        sur la fenêtre glissante, et ``{vue: {metrique: {"n", "s"}}}`` depuis le
+        démarrage des processus encore actifs.
+        """
+        if self.cumul:
+            self.ecrire()
+        maintenant = time.time()
+        limite = int(maintenant // 60) - self.fenetre()
+        fenetre, cumul = {}, {}
+        for chemin in self.dossier().glob("*.json"):
+            try:
+                # Processus arrêté depuis plus d'une fenêtre : ses mesures sont périmées
+                if chemin.stat().st_mtime < maintenant - 60 * (self.fenetre() + 1):
+                    chemin.unlink()
+                    continue
+                donnees = json.loads(chemin.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            for minute, vues in donnees["tranches"].items():
+                if int(minute) <= limite:
+                    continue
+                for vue, metriques in vues.items():
+                    for metrique, histogramme in metriques.items():
+                        _fusionner(fenetre.setdefault(vue, {}).setdefault(metrique, _histogramme()), histogramme)
+            for vue, metriques in donnees["cumul"].items():
+                for metrique, total in metriques.items():
+                    _fusionner(cumul.setdefault(vue, {}).setdefault(metrique, _histogramme()), total)
+        return fenetre, cumul
+
+
+registre = Registre()
+
+
+def _etiquette(valeur):
+    return valeur.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus(fenetre, cumul):
+    """
+    Exporte les mesures au format texte Prometheus, en « summary » : centiles
+    sur la fenêtre glissante, ``_sum`` et ``_count`` cumulés.
+    """
+    lignes = []
+    for metrique, (description, nom, _) in METRIQUES.items():
+        lignes.append(f"# HELP {nom} {description}, par vue.")
+        lignes.append(f"# TYPE {nom} summary")
+        for vue in sorted(cumul):
+            if metrique not in cumul[vue]:
+                continue
+            etiquette = f'vue="{_etiquette(vue)}"'
+            histogramme = fenetre.get(vue, {}).get(metrique)
+            if histogramme:
+                for q in CENTILES:
+                    lignes.append(f'{nom}{{{etiquette},quantile="{q}"}} {centile(histogramme, metrique, q):.6g}')
+            lignes.append(f"{nom}_sum{{{etiquette}}} {cumul[vue][metrique]['s']:.6g}")
+            lignes.append(f"{nom}_count{{{etiquette}}} {cumul[vue][metrique]['n']}")
+    return "\n".join(lignes) + "\n"
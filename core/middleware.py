@@ -0,0 +1,249 @@
+"""
+Ce module contient les middlewares du projet.
+
+FichiersStatiquesMiddleware sert les fichiers statiques collectés (STATIC_ROOT)
+sans serveur web dédié.
+
+Au démarrage, le contenu de STATIC_ROOT est indexé en mémoire : chemin, taille,
+date de modification, ETag et variantes précompressées (.br, .gz) produites par
+``core.stockage``. Une requête n'entraîne donc aucun accès disque avant l'envoi.
+Le fichier est transmis par ``FileResponse`` : sous un serveur WSGI qui fournit
+``wsgi.file_wrapper`` (gunicorn, uWSGI), la copie est faite par le noyau
+(``sendfile``), sans passer par Python.
+
+MetriquesMiddleware mesure chaque requête (durée, SQL, gabarits, taille) pour
+les histogrammes de ``core.metriques``.
+
+Classes :
+- FichierStatique : entrée de l'index (un fichier ou une de ses variantes).
+- FichiersStatiquesMiddleware : sert les fichiers indexés, avec requêtes conditionnelles.
+- MetriquesMiddleware : mesure les requêtes par vue.
+"""
+
+import json
+import mimetypes
+import os
+import random
+import time
+from collections import namedtuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, parse_etags
+
+from . import metriques
+
+FichierStatique = namedtuple("FichierStatique", ["chemin", "taille", "modifie_le", "etag"])
+
+# Par ordre de préférence : suffixe du fichier -> valeur de Content-Encoding
+ENCODAGES = ((".br", "br"), (".gz", "gzip"))
+
+CACHE_IMMUABLE = "public, max-age=31536000, immutable"
+CACHE_COURT = "public, max-age=60"
+
+
+def _instrumenter_connexion(connection, **kwargs):
+    if metriques.enregistrer_requete_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metriques.enregistrer_requete_sql)
+
+
+def _fichier(chemin):
+    stat = os.stat(chemin)
+    return FichierStatique(
+        chemin=chemin,
+        taille=stat.st_size,
+        modifie_le=int(stat.st_mtime),
+        etag=f'"{int(stat.st_mtime):x}-{stat.st_size:x}"',
+    )
+
+
+def _encodages_acceptes(request):
+    acceptes = set()
+    for element in request.headers.get("Accept-Encoding", "").split(","):
+        nom, _, parametres = element.partition(";")
+        # « gzip;q=0 » signifie que le client refuse explicitement gzip
+        if parametres.replace(" ", "").rstrip("0.") == "q=":
+            continue
+        acceptes.add(nom.strip().lower())
+    return acceptes
+
+
+class FichiersStatiquesMiddleware:
+    """
+    Sert les fichiers de STATIC_ROOT sous STATIC_URL.
+
+    - Les noms empreintés (``style.3f2a9c.css``) sont mis en cache un an
+      (``immutable``) ; les autres pour une minute.
+    - ``If-None-Match`` et ``If-Modified-Since`` donnent une réponse 304.
+    - La variante .br ou .gz est choisie selon ``Accept-Encoding``.
+
+    Inactif si STATIC_ROOT n'a pas été rempli par ``collectstatic``.
+    À placer juste après SecurityMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        self.prefixe = "/" + settings.STATIC_URL.lstrip("/")
+        self.index = self.indexer(settings.STATIC_ROOT)
+        if not self.index:
+            raise MiddlewareNotUsed
+
+    def indexer(self, racine):
+        """Retourne ``{chemin relatif: (fichier, {encodage: variante}, immuable)}``."""
+        if not racine or not os.path.isdir(racine):
+            return {}
+        immuables = self.noms_empreintes(racine)
+        index = {}
+        for dossier, _, noms in os.walk(racine):
+            for nom in noms:
+                if nom.endswith(tuple(suffixe for suffixe, _ in ENCODAGES)):
+                    continue
+                chemin = os.path.join(dossier, nom)
+                relatif = os.path.relpath(chemin, racine).replace(os.sep, "/")
+                variantes = {
+                    encodage: _fichier(chemin + suffixe)
+                    for suffixe, encodage in ENCODAGES
+                    if os.path.exists(chemin + suffixe)
+                }
+                index[relatif] = (_fichier(chemin), variantes, relatif in immuables)
+        return index
+
+    def noms_empreintes(self, racine):
+        try:
+            with open(os.path.join(racine, "staticfiles.json"), encoding="utf-8") as manifeste:
+                return set(json.load(manifeste)["paths"].values())
+        except (OSError, ValueError, KeyError):
+            return set()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.servir(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        response = self.servir(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+    def servir(self, request):
+        """Retourne la réponse pour un fichier indexé, ou None pour laisser passer la requête."""
+        if request.method not in ("GET", "HEAD") or not request.path.startswith(self.prefixe):
+            return None
+        entree = self.index.get(request.path[len(self.prefixe):])
+        if entree is None:
+            return None
+
+        original, variantes, immuable = entree
+        acceptes = _encodages_acceptes(request)
+        encodage = next((e for _, e in ENCODAGES if e in variantes and e in acceptes), None)
+        fichier = variantes[encodage] if encodage else original
+
+        if self.non_modifie(request, fichier):
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(original.chemin)[0] or "application/octet-stream"
+            if request.method == "HEAD":
+                response = HttpResponse(content_type=content_type)
+                response["Content-Length"] = fichier.taille
+            else:
+                response = FileResponse(open(fichier.chemin, "rb"), content_type=content_type)
+                # FileResponse nommerait la variante (.gz, .br) dans cet en-tête
+                response.headers.pop("Content-Disposition", None)
+            if encodage:
+                response["Content-Encoding"] = encodage
+        response["ETag"] = fichier.etag
+        response["Last-Modified"] = http_date(fichier.modifie_le)
+        response["Cache-Control"] = CACHE_IMMUABLE if immuable else CACHE_COURT
+        if variantes:
+            response["Vary"] = "Accept-Encoding"
+        return response
+
+    def non_modifie(self, request, fichier):
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return "*" in etags or fichier.etag in etags
+        depuis = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+        return depuis is not None and fichier.modifie_le <= depuis
+
+
+class MetriquesMiddleware:
+    """
+    Mesure les requêtes résolues vers une vue : durée, nombre et durée des
+    requêtes SQL, durée de rendu des gabarits, taille de la réponse.
+
+    Une fraction METRIQUES_ECHANTILLONNAGE des requêtes est mesurée (1 : toutes,
+    0 : middleware désactivé). Les requêtes SQL sont comptées par un « execute
+    wrapper » posé sur chaque connexion ; la mesure en cours est portée par une
+    ContextVar, qui suit la requête dans les threads de ``sync_to_async``.
+
+    À placer en tête de MIDDLEWARE, pour inclure le temps des autres middlewares.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        self.taux = settings.METRIQUES_ECHANTILLONNAGE
+        if self.taux <= 0:
+            raise MiddlewareNotUsed
+        connection_created.connect(_instrumenter_connexion, dispatch_uid="core.metriques")
+        for connection in connections.all(initialized_only=True):
+            _instrumenter_connexion(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.taux:
+            return self.get_response(request)
+        mesure, jeton = metriques.commencer_mesure()
+        debut = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metriques.terminer_mesure(jeton)
+        self.enregistrer(request, response, mesure, time.perf_counter() - debut)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.taux:
+            return await self.get_response(request)
+        mesure, jeton = metriques.commencer_mesure()
+        debut = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metriques.terminer_mesure(jeton)
+        self.enregistrer(request, response, mesure, time.perf_counter() - debut)
+        return response
+
+    def enregistrer(self, request, response, mesure, duree):
+        # Fichiers statiques, 404 : pas de vue à qui attribuer la mesure
+        if request.resolver_match is None:
+            return
+        valeurs = {
+            "duree": duree,
+            "sql_requetes": mesure.sql_requetes,
+            "sql_duree": mesure.sql_duree,
+            "gabarits_duree": mesure.gabarits_duree,
+        }
+        # Réponse en flux : la taille n'est connue qu'à la fin de l'envoi
+        if not response.streaming:
+            valeurs["taille"] = len(response.content)
+        metriques.registre.enregistrer(request.resolver_match.view_name, valeurs)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=255)),
+                ('arguments', models.JSONField(default=dict)),
+                ('executer_le', models.DateTimeField(default=django.utils.timezone.now)),
+                ('statut', models.CharField(choices=[('attente', 'En attente'), ('cours', 'En cours'), ('terminee', 'Terminée'), ('echouee', 'Échouée')], default='attente', max_length=10)),
+                ('tentatives', models.PositiveSmallIntegerField(default=0)),
+                ('max_tentatives', models.PositiveSmallIntegerField(default=5)),
+                ('derniere_erreur', models.TextField(blank=True)),
+                ('verrouille_le', models.DateTimeField(blank=True, null=True)),
+                ('verrouille_par', models.CharField(blank=True, max_length=100)),
+                ('cree_le', models.DateTimeField(auto_now_add=True)),
+                ('termine_le', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['statut', 'executer_le'], name='tache_statut_executer_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,52 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class Tache(models.Model):
+    """
+    Tâche de fond en attente d'exécution par la commande ``worker``
+    (voir ``core.taches``).
+
+    Attributs :
+    - nom : chemin Python de la fonction à exécuter (décorée par ``@tache``)
+    - arguments : arguments nommés de la fonction (JSON)
+    - executer_le : date à partir de laquelle la tâche peut être exécutée
+    - statut : en attente, en cours, terminée ou échouée
+    - tentatives : nombre d'exécutions commencées
+    - max_tentatives : nombre d'exécutions avant abandon
+    - derniere_erreur : trace de la dernière exécution en échec
+    - verrouille_le, verrouille_par : prise en charge par un worker
+    - cree_le, termine_le : dates de création et de fin
+    """
+
+    EN_ATTENTE = "attente"
+    EN_COURS = "cours"
+    TERMINEE = "terminee"
+    ECHOUEE = "echouee"
+    STATUTS = [
+        (EN_ATTENTE, "En attente"),
+        (EN_COURS, "En cours"),
+        (TERMINEE, "Terminée"),
+        (ECHOUEE, "Échouée"),
+    ]
+
+    nom = models.CharField(max_length=255)
+    arguments = models.JSONField(default=dict)
+    executer_le = models.DateTimeField(default=timezone.now)
+    statut = models.CharField(max_length=10, choices=STATUTS, default=EN_ATTENTE)
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    max_tentatives = models.PositiveSmallIntegerField(default=5)
+    derniere_erreur = models.TextField(blank=True)
+    verrouille_le = models.DateTimeField(null=True, blank=True)
+    verrouille_par = models.CharField(max_length=100, blank=True)
+    cree_le = models.DateTimeField(auto_now_add=True)
+    termine_le = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.nom} ({self.get_statut_display()})"
+
+    class Meta:
+        indexes = [
+            # Prochaines tâches à exécuter, et tâches en cours dont le worker a disparu
+            models.Index(fields=["statut", "executer_le"], name="tache_statut_executer_idx"),
+        ]
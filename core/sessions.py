@@ -0,0 +1,45 @@
+"""
+Ce module supprime les sessions expirées.
+
+Avec les backends « db » et « cached_db », les sessions expirées restent dans
+la table django_session. Elles sont supprimées par lots de ``TAILLE_LOT`` :
+chaque lot est une requête courte sur l'index de ``expire_date``, qui ne
+bloque pas longtemps les connexions des utilisateurs, contrairement à un
+unique DELETE sur toute la table. La suppression est lancée par le worker
+(voir ``core.management.commands.worker``) ; ``manage.py clearsessions``
+reste utilisable depuis un cron.
+
+Fonctions :
+- purger_sessions : supprime les sessions expirées ; retourne leur nombre.
+"""
+
+from importlib import import_module
+
+from django.conf import settings
+from django.utils import timezone
+
+TAILLE_LOT = 1000
+
+
+def purger_sessions(taille_lot=TAILLE_LOT):
+    """Supprime les sessions expirées, par lots, et retourne leur nombre (0 hors stockage en base)."""
+    engine = import_module(settings.SESSION_ENGINE)
+    if not hasattr(engine.SessionStore, "get_model_class"):
+        # Cache (expiration native), fichiers ou cookies signés (rien à supprimer)
+        try:
+            engine.SessionStore.clear_expired()
+        except NotImplementedError:
+            pass
+        return 0
+
+    modele = engine.SessionStore.get_model_class()
+    maintenant = timezone.now()
+    supprimees = 0
+    while True:
+        cles = list(
+            modele.objects.filter(expire_date__lt=maintenant).values_list("session_key", flat=True)[:taille_lot]
+        )
+        if cles:
+            supprimees += modele.objects.filter(session_key__in=cles).delete()[0]
+        if len(cles) < taille_lot:
+            return supprimees
@@ -0,0 +1,62 @@
+"""
+Ce module définit le stockage des fichiers statiques utilisé en production.
+
+``collectstatic`` y écrit, pour chaque fichier, une copie dont le nom contient
+l'empreinte du contenu (``style.3f2a9c.css``), ce qui permet une mise en cache
+illimitée côté navigateur. Les fichiers texte reçoivent en plus des versions
+précompressées ``.gz`` et, si le paquet ``brotli`` est installé, ``.br`` :
+le serveur les envoie telles quelles, sans compresser à chaque requête.
+
+Classes :
+- StockageStatiqueCompresse : ManifestStaticFilesStorage + variantes précompressées.
+"""
+
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    brotli = None
+
+EXTENSIONS_COMPRESSIBLES = (".css", ".js", ".svg", ".json", ".txt", ".html", ".map", ".xml")
+
+# Une variante n'est conservée que si elle fait gagner au moins 5 %
+GAIN_MINIMAL = 0.95
+
+
+class StockageStatiqueCompresse(ManifestStaticFilesStorage):
+    # Les bibliothèques minifiées (Bootstrap, Flatpickr) sont livrées sans leurs
+    # fichiers .map : leurs commentaires sourceMappingURL ne sont pas réécrits.
+    patterns = tuple(
+        (extension, tuple(motif for motif in motifs if "sourceMappingURL" not in str(motif)))
+        for extension, motifs in ManifestStaticFilesStorage.patterns
+    )
+
+    def post_process(self, paths, dry_run=False, **options):
+        noms_hashes = set()
+        for nom, nom_hashe, traite in super().post_process(paths, dry_run, **options):
+            if nom_hashe and not isinstance(traite, Exception):
+                noms_hashes.add(nom_hashe)
+            yield nom, nom_hashe, traite
+
+        if dry_run:
+            return
+        # Compression après toutes les passes : le contenu final est alors connu
+        for nom_hashe in sorted(noms_hashes):
+            if nom_hashe.endswith(EXTENSIONS_COMPRESSIBLES) and self.exists(nom_hashe):
+                self.compresser(nom_hashe)
+
+    def compresser(self, nom):
+        with self.open(nom) as fichier:
+            contenu = fichier.read()
+        variantes = {".gz": gzip.compress(contenu, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes[".br"] = brotli.compress(contenu, quality=11)
+        for suffixe, compresse in variantes.items():
+            if len(compresse) < len(contenu) * GAIN_MINIMAL:
+                if self.exists(nom + suffixe):
+                    self.delete(nom + suffixe)
+                self._save(nom + suffixe, ContentFile(compresse))
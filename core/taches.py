@@ -0,0 +1,154 @@
+"""
+Ce module implémente une file de tâches de fond stockée en base de données.
+
+Une vue ne fait jamais le travail lent elle-même (envoi d'e-mails…) : elle
+enregistre une ligne ``Tache``, dans la même transaction que les données
+qu'elle modifie. Une tâche n'existe donc que si la modification a été validée.
+La commande ``manage.py worker`` exécute ensuite les tâches arrivées à
+échéance, dans un pool de threads ou de processus.
+
+Une fonction devient une tâche avec le décorateur ``@tache`` :
+
+    @tache(max_tentatives=3)
+    def envoyer_rappel(seance_id):
+        ...
+
+    envoyer_rappel.planifier(seance_id=seance.pk, executer_le=veille)
+
+Les arguments doivent être sérialisables en JSON. Une tâche en échec est
+relancée plus tard (délai doublé à chaque tentative) jusqu'à
+``max_tentatives``, puis marquée échouée avec sa trace d'erreur. Une tâche
+restée « en cours » plus de ``DELAI_VERROU`` (worker arrêté brutalement) est
+reprise par un autre worker : les tâches doivent donc supporter d'être
+exécutées deux fois.
+
+Fonctions :
+- tache : décorateur qui ajoute ``planifier`` à une fonction.
+- planifier : enregistre une exécution d'une tâche.
+- planifier_plusieurs : enregistre plusieurs exécutions en une requête.
+- reserver_taches : prend en charge les prochaines tâches à exécuter.
+- executer_tache : exécute une tâche prise en charge et enregistre le résultat.
+- purger_taches : supprime les tâches terminées anciennes.
+"""
+
+import functools
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Tache
+
+DELAI_VERROU = timedelta(minutes=10)
+RETARD_INITIAL = timedelta(seconds=30)
+
+
+def tache(fonction=None, *, max_tentatives=5):
+    """
+    Déclare une fonction comme tâche de fond.
+
+    La fonction reste appelable directement ; ``fonction.planifier(**arguments)``
+    l'enregistre dans la file (``executer_le`` optionnel pour une exécution différée).
+    """
+    if fonction is None:
+        return functools.partial(tache, max_tentatives=max_tentatives)
+
+    fonction.nom_tache = f"{fonction.__module__}.{fonction.__qualname__}"
+    fonction.max_tentatives = max_tentatives
+    fonction.planifier = functools.partial(planifier, fonction)
+    return fonction
+
+
+def _nouvelle_tache(fonction, arguments, executer_le=None):
+    return Tache(
+        nom=fonction.nom_tache,
+        arguments=arguments,
+        executer_le=executer_le or timezone.now(),
+        max_tentatives=fonction.max_tentatives,
+    )
+
+
+def planifier(fonction, executer_le=None, **arguments):
+    """Enregistre une exécution de ``fonction`` (décorée par ``@tache``) et la retourne."""
+    nouvelle = _nouvelle_tache(fonction, arguments, executer_le)
+    nouvelle.save()
+    return nouvelle
+
+
+def planifier_plusieurs(executions):
+    """
+    Enregistre en une requête une liste de ``(fonction, arguments, executer_le)``
+    (``executer_le`` peut valoir None).
+    """
+    return Tache.objects.bulk_create([
+        _nouvelle_tache(fonction, arguments, executer_le) for fonction, arguments, executer_le in executions
+    ])
+
+
+def reserver_taches(nombre, travailleur):
+    """
+    Prend en charge au plus ``nombre`` tâches arrivées à échéance et retourne leurs identifiants.
+
+    Sous PostgreSQL, ``SKIP LOCKED`` permet à plusieurs workers de se partager
+    la file sans s'attendre ; sous SQLite, la transaction IMMEDIATE les sérialise.
+    """
+    maintenant = timezone.now()
+    dues = (
+        Tache.objects.filter(
+            Q(statut=Tache.EN_ATTENTE, executer_le__lte=maintenant)
+            | Q(statut=Tache.EN_COURS, verrouille_le__lt=maintenant - DELAI_VERROU)
+        )
+        .order_by("executer_le")
+        .select_for_update(skip_locked=True)
+    )
+    with transaction.atomic():
+        ids = list(dues.values_list("pk", flat=True)[:nombre])
+        Tache.objects.filter(pk__in=ids).update(
+            statut=Tache.EN_COURS, verrouille_le=maintenant, verrouille_par=travailleur,
+        )
+    return ids
+
+
+def executer_tache(tache_id):
+    """
+    Exécute une tâche prise en charge par ``reserver_taches``.
+
+    Retourne le statut final : terminée, en attente (nouvelle tentative planifiée)
+    ou échouée.
+    """
+    close_old_connections()
+    try:
+        tache = Tache.objects.get(pk=tache_id)
+        tache.tentatives += 1
+        try:
+            fonction = import_string(tache.nom)
+            if not hasattr(fonction, "nom_tache"):
+                raise ValueError(f"{tache.nom} n'est pas déclarée avec @tache.")
+            fonction(**tache.arguments)
+        except Exception:
+            tache.derniere_erreur = traceback.format_exc()
+            if tache.tentatives < tache.max_tentatives:
+                tache.statut = Tache.EN_ATTENTE
+                tache.executer_le = timezone.now() + RETARD_INITIAL * 2 ** (tache.tentatives - 1)
+            else:
+                tache.statut = Tache.ECHOUEE
+                tache.termine_le = timezone.now()
+        else:
+            tache.statut = Tache.TERMINEE
+            tache.termine_le = timezone.now()
+        tache.verrouille_le, tache.verrouille_par = None, ""
+        tache.save()
+        return tache.statut
+    finally:
+        close_old_connections()
+
+
+def purger_taches(conserver=timedelta(days=7)):
+    """Supprime les tâches terminées depuis plus de ``conserver`` ; retourne leur nombre."""
+    supprimees, _ = Tache.objects.filter(
+        statut=Tache.TERMINEE, termine_le__lt=timezone.now() - conserver,
+    ).delete()
+    return supprimees
@@ -1,3 +1,262 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core import mail
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .caches import DUREE_CACHE_LOCAL, duree_cache, verifier_caches
+from .gabarits import precharger_gabarits
+from .icones import DESTINATION, generer_css, icones_utilisees
+from .metriques import centile, registre
+from .middleware import CACHE_IMMUABLE, FichiersStatiquesMiddleware
+from .models import Tache
+from .sessions import purger_sessions
+from .taches import tache
+
+
+@skipUnless(connection.vendor == "sqlite", "Réglages propres à SQLite.")
+class ReglagesSQLiteTests(TestCase):
+    """Les pragmas de ``init_command`` sont appliqués à chaque connexion."""
+
+    def pragma(self, nom):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {nom}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        self.assertEqual(self.pragma("journal_mode"), "wal")
+        # 1 = NORMAL
+        self.assertEqual(self.pragma("synchronous"), 1)
+        self.assertEqual(self.pragma("busy_timeout"), 20000)
+
+
+class CachesTests(TestCase):
+    """Un cache propre au processus est signalé et ne conserve ses entrées que brièvement."""
+
+    def test_cache_local(self):
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            self.assertEqual(duree_cache(3600), DUREE_CACHE_LOCAL)
+            self.assertEqual([avertissement.id for avertissement in verifier_caches(None)], ["core.W001"])
+
+    def test_cache_partage(self):
+        with override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": tempfile.gettempdir(),
+        }}):
+            self.assertEqual(duree_cache(3600), 3600)
+            self.assertEqual(verifier_caches(None), [])
+
+
+class IconesTests(TestCase):
+    """La feuille des icônes contient exactement les icônes utilisées par les gabarits."""
+
+    def test_feuille_a_jour(self):
+        self.assertIn("bi-speedometer2", icones_utilisees())
+        self.assertEqual(
+            DESTINATION.read_text(encoding="utf-8"),
+            generer_css(icones_utilisees()),
+            "Relancer « python manage.py construire_icones ».",
+        )
+
+
+class FichiersStatiquesTests(TestCase):
+    """Le middleware sert STATIC_ROOT avec variantes compressées et réponses 304."""
+
+    CONTENU = b"body { color: black; }" * 50
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        racine = Path(dossier.name)
+        (racine / "css").mkdir()
+        (racine / "css" / "style.abc123.css").write_bytes(self.CONTENU)
+        (racine / "css" / "style.abc123.css.gz").write_bytes(gzip.compress(self.CONTENU))
+        (racine / "staticfiles.json").write_text(json.dumps({"paths": {"css/style.css": "css/style.abc123.css"}}))
+
+        with override_settings(STATIC_ROOT=racine, STATIC_URL="static/"):
+            self.middleware = FichiersStatiquesMiddleware(lambda request: HttpResponse("vue"))
+        self.factory = RequestFactory()
+
+    def test_variante_gzip_immuable(self):
+        response = self.middleware(self.factory.get("/static/css/style.abc123.css", headers={"accept-encoding": "gzip, br"}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertEqual(response["Cache-Control"], CACHE_IMMUABLE)
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), self.CONTENU)
+
+    def test_sans_compression(self):
+        response = self.middleware(self.factory.get("/static/css/style.abc123.css", headers={"accept-encoding": "gzip;q=0"}))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(b"".join(response.streaming_content), self.CONTENU)
+
+    def test_requete_conditionnelle(self):
+        premiere = self.middleware(self.factory.get("/static/css/style.abc123.css"))
+        response = self.middleware(self.factory.get(
+            "/static/css/style.abc123.css", headers={"if-none-match": premiere["ETag"]},
+        ))
+        self.assertEqual(response.status_code, 304)
+        response = self.middleware(self.factory.get(
+            "/static/css/style.abc123.css", headers={"if-modified-since": premiere["Last-Modified"]},
+        ))
+        self.assertEqual(response.status_code, 304)
+
+    def test_fichier_inconnu(self):
+        response = self.middleware(self.factory.get("/static/css/absent.css"))
+        self.assertEqual(response.content, b"vue")
+
+
+class PrechargementGabaritsTests(TestCase):
+    """Le préchargement compile les gabarits du projet, et eux seuls."""
+
+    def test_precharger(self):
+        noms = precharger_gabarits()
+        self.assertIn("base.html", noms)
+        self.assertIn("seances/partials/historique_coach_lignes.html", noms)
+        self.assertFalse([nom for nom in noms if nom.startswith("admin/")])
+
+
+@tache
+def envoyer_bonjour(destinataire):
+    mail.send_mail("Bonjour", "Bonjour !", None, [destinataire])
+
+
+@tache(max_tentatives=2)
+def echouer():
+    raise RuntimeError("Échec attendu")
+
+
+class TachesTests(TransactionTestCase):
+    """Le worker exécute les tâches à échéance, relance puis abandonne les tâches en échec."""
+
+    def worker(self):
+        call_command("worker", "--une-fois", "--concurrence", "2", stdout=StringIO())
+
+    def test_execution_et_planification(self):
+        envoyer_bonjour.planifier(destinataire="a@exemple.fr")
+        plus_tard = envoyer_bonjour.planifier(destinataire="b@exemple.fr", executer_le=timezone.now() + timedelta(hours=1))
+        self.worker()
+
+        self.assertEqual([message.to for message in mail.outbox], [["a@exemple.fr"]])
+        self.assertEqual(Tache.objects.get(statut=Tache.TERMINEE).tentatives, 1)
+        plus_tard.refresh_from_db()
+        self.assertEqual(plus_tard.statut, Tache.EN_ATTENTE)
+
+    def test_nouvelles_tentatives(self):
+        tache_echec = echouer.planifier()
+        self.worker()
+        tache_echec.refresh_from_db()
+        self.assertEqual((tache_echec.statut, tache_echec.tentatives), (Tache.EN_ATTENTE, 1))
+        self.assertGreater(tache_echec.executer_le, timezone.now())
+        self.assertIn("Échec attendu", tache_echec.derniere_erreur)
+
+        Tache.objects.update(executer_le=timezone.now())
+        self.worker()
+        tache_echec.refresh_from_db()
+        self.assertEqual((tache_echec.statut, tache_echec.tentatives), (Tache.ECHOUEE, 2))
+
+    def test_purge_des_sessions(self):
+        expiree = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create([
+            Session(session_key=f"expiree{numero}", session_data="", expire_date=expiree) for numero in range(5)
+        ])
+        Session.objects.create(session_key="valide", session_data="", expire_date=timezone.now() + timedelta(days=1))
+        # Lots de 2 : trois suppressions, chacune dans sa propre transaction
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(purger_sessions(taille_lot=2), 5)
+        self.assertEqual(sum(requete["sql"].startswith("DELETE") for requete in requetes), 3)
+        Session.objects.create(session_key="expiree", session_data="", expire_date=expiree)
+        self.worker()
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["valide"])
+
+
+class BenchParcoursTests(TransactionTestCase):
+    """Le test de charge rejoue le parcours sur les comptes de seed_coaching et enregistre ses mesures."""
+
+    def test_parcours(self):
+        call_command("seed_coaching", "--coachs", "2", "--clients", "4", "--seances", "200", stdout=StringIO())
+        with tempfile.TemporaryDirectory() as dossier:
+            sortie = Path(dossier) / "reference.json"
+            call_command(
+                "bench_parcours", "--utilisateurs", "3", "--iterations", "1", "--part-coachs", "0.34",
+                "--reserver", "--sortie", str(sortie), stdout=StringIO(),
+            )
+            resume = json.loads(sortie.read_text(encoding="utf-8"))
+            sortie_comparaison = StringIO()
+            call_command(
+                "bench_parcours", "--utilisateurs", "3", "--iterations", "1", "--part-coachs", "0.34",
+                "--reference", str(sortie), stdout=sortie_comparaison, stderr=StringIO(),
+            )
+
+        self.assertEqual(sum(etape["erreurs"] for etape in resume["etapes"].values()), 0)
+        self.assertEqual(resume["etapes"]["connexion"]["nombre"], 3)
+        self.assertEqual(resume["etapes"]["prise_rdv"]["nombre"], 2)
+        self.assertEqual(resume["reservations"], 2)
+        self.assertIn("Débit par rapport à la référence", sortie_comparaison.getvalue())
+
+
+class MetriquesTests(TestCase):
+    """Chaque requête est attribuée à sa vue ; l'export Prometheus est protégé."""
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        reglages = override_settings(METRIQUES_DOSSIER=dossier.name, METRIQUES_JETON="secret")
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        registre.reinitialiser()
+        self.addCleanup(registre.reinitialiser)
+
+    def test_mesures_par_vue(self):
+        self.client.force_login(User.objects.create_user("alice"))
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.get(reverse("accounts:login"))
+        nb_requetes = len(requetes)
+        self.client.get("/inexistante/")
+
+        fenetre, cumul = registre.lire()
+        self.assertEqual(list(fenetre), ["accounts:login"])
+        mesures = fenetre["accounts:login"]
+        self.assertGreater(nb_requetes, 0)
+        self.assertEqual(centile(mesures["sql_requetes"], "sql_requetes", 0.5), nb_requetes)
+        self.assertGreater(mesures["gabarits_duree"]["s"], 0)
+        self.assertEqual(mesures["taille"]["s"], len(reponse.content))
+
+        sortie = StringIO()
+        call_command("metriques", stdout=sortie)
+        self.assertIn("accounts:login", sortie.getvalue())
+
+    def test_export_prometheus(self):
+        url = reverse("core:metriques")
+        self.client.get(reverse("core:index"))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        reponse = self.client.get(url, headers={"Authorization": "Bearer secret"})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertIn('coaching_requete_duree_secondes_count{vue="core:index"} 1', reponse.content.decode())
+
+    def test_sans_jeton(self):
+        url = reverse("core:metriques")
+        with self.settings(METRIQUES_JETON="", INTERNAL_IPS=["127.0.0.1"], DEBUG=False):
+            self.assertEqual(self.client.get(url).status_code, 403)
+        with self.settings(METRIQUES_JETON="", INTERNAL_IPS=["127.0.0.1"], DEBUG=True):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_centile(self):
+        for valeur in range(1, 101):
+            registre.enregistrer("vue", {"duree": valeur / 1000})
+        histogramme = registre.tranches.popitem()[1]["vue"]["duree"]
+        # Intervalles de raison 1,2 : estimation à 20 % près au plus
+        for q in (0.5, 0.95, 0.99):
+            self.assertAlmostEqual(centile(histogramme, "duree", q), q / 10, delta=q / 10 * 0.2)
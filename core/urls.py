@@ -5,4 +5,5 @@ from . import views
 app_name = "core"
 urlpatterns = [
     path("", views.index, name="index"),
+    path("metriques/", views.metriques, name="metriques"),
 ]
\ No newline at end of file
@@ -11,7 +11,40 @@
 # class IndexView(generic.ListView):
 #     template_name = "core/accueil.html"
 
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+
+from . import metriques as mesures
+
 
 def index(request):
-    return render(request, 'core/accueil.html')
\ No newline at end of file
+    return render(request, 'core/accueil.html')
+
+
+@require_safe
+@never_cache
+def metriques(request):
+    """
+    Expose les métriques des requêtes au format texte Prometheus.
+
+    Accès par ``Authorization: Bearer <METRIQUES_JETON>`` ; sans jeton configuré,
+    accès depuis INTERNAL_IPS en DEBUG seulement (REMOTE_ADDR n'est pas fiable
+    derrière un proxy).
+    """
+    if settings.METRIQUES_JETON:
+        autorise = hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {settings.METRIQUES_JETON}",
+        )
+    else:
+        autorise = settings.DEBUG and request.META.get("REMOTE_ADDR") in settings.INTERNAL_IPS
+    if not autorise:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        mesures.prometheus(*mesures.registre.lire()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
\ No newline at end of file
@@ -15,6 +15,8 @@ import os
 
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -23,12 +25,15 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-gy=db42c!e%#tgnhf6vk3v6-n^v0mfk04-8^p0)$*g8x2=i0jh'
+SECRET_KEY = os.environ.get(
+    'DJANGO_SECRET_KEY',
+    'django-insecure-gy=db42c!e%#tgnhf6vk3v6-n^v0mfk04-8^p0)$*g8x2=i0jh',
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -42,17 +47,20 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
-    'django.contrib.staticfiles',
+    'core.apps.CoreStaticFilesConfig',  # django.contrib.staticfiles
 ]
 
 STATIC_URL = "static/"
 
 MIDDLEWARE = [
+    'core.middleware.MetriquesMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.FichiersStatiquesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.RolesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -61,32 +69,223 @@ ROOT_URLCONF = 'personnal_coaching.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Moteur Django dont les rendus sont chronométrés (voir core.gabarits)
+        'BACKEND': 'core.gabarits.GabaritsMesures',
         'DIRS': [BASE_DIR / "templates"],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Gabarits compilés une fois par processus ; en développement, le
+            # serveur vide ce cache à chaque modification d'un gabarit.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'accounts.context_processors.roles',
             ],
         },
     },
 ]
 
+# Compilation de tous les gabarits du projet au démarrage (voir core.gabarits)
+PRECHARGER_GABARITS = os.environ.get('PRECHARGER_GABARITS', '0' if DEBUG else '1') == '1'
+
+# Métriques des requêtes par vue (voir core.metriques)
+# - METRIQUES_ECHANTILLONNAGE : fraction des requêtes mesurées (0 désactive la mesure)
+# - METRIQUES_DOSSIER : fichiers de mesures partagés entre les processus serveur
+# - METRIQUES_FENETRE : fenêtre glissante des centiles, en minutes
+# - METRIQUES_JETON : jeton attendu par /metriques (« Authorization: Bearer … ») ;
+#   sans jeton, l'URL n'est accessible que depuis INTERNAL_IPS, et en DEBUG seulement
+METRIQUES_ECHANTILLONNAGE = float(os.environ.get('METRIQUES_ECHANTILLONNAGE', '1'))
+METRIQUES_DOSSIER = os.environ.get('METRIQUES_DOSSIER', BASE_DIR / '.cache' / 'metriques')
+METRIQUES_FENETRE = int(os.environ.get('METRIQUES_FENETRE', '15'))
+METRIQUES_JETON = os.environ.get('METRIQUES_JETON', '')
+
 WSGI_APPLICATION = 'personnal_coaching.wsgi.application'
+ASGI_APPLICATION = 'personnal_coaching.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# Moteur choisi par la variable DB_ENGINE :
+# - "sqlite" (défaut) : fichier local (DB_NAME), en mode WAL
+# - "postgresql" : serveur PostgreSQL (DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT),
+#   avec le pool de connexions natif de Django (psycopg 3) si DB_POOL=1
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_POOL = os.environ.get('DB_POOL', '1') == '1'
+
+# Délai d'attente du verrou d'écriture SQLite, en millisecondes
+SQLITE_BUSY_TIMEOUT = 20000
+
+DATABASE_BACKENDS = {
+    'sqlite': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '0')),
+        'OPTIONS': {
+            # BEGIN IMMEDIATE : une transaction prend le verrou d'écriture dès son
+            # ouverture, ce qui sérialise les réservations concurrentes.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_BUSY_TIMEOUT / 1000,
+            # WAL : les lectures ne bloquent plus les écritures (et inversement).
+            # synchronous=NORMAL suffit en WAL : seule la dernière transaction
+            # peut être perdue en cas de coupure, jamais la cohérence du fichier.
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT};'
+                'PRAGMA mmap_size=134217728;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+        # Base de test sur disque : les tests de réservation concurrente ouvrent
+        # une connexion par thread, ce qu'une base en mémoire partagée ne permet pas.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+    'postgresql': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'coaching'),
+        'USER': os.environ.get('DB_USER', 'coaching'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # Le pool et les connexions persistantes sont incompatibles :
+        # avec le pool, chaque requête rend sa connexion au pool.
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+                'timeout': 10,
+            },
+        } if DB_POOL else {},
+    },
 }
 
+if DB_ENGINE not in DATABASE_BACKENDS:
+    raise ImproperlyConfigured(
+        f"DB_ENGINE inconnu : {DB_ENGINE!r} (valeurs acceptées : {', '.join(DATABASE_BACKENDS)})."
+    )
+
+DATABASES = {
+    'default': DATABASE_BACKENDS[DB_ENGINE],
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# L'alias "default" contient les données dérivées que les signaux invalident
+# (occupations des coachs, horaires compilés, rôles, sessions) : une
+# invalidation n'atteint que les processus qui partagent ce cache. Avec
+# plusieurs processus serveur (voir « Déploiement ASGI » dans le README), il
+# doit donc être partagé. Son backend se choisit avec CACHE_BACKEND :
+# - "locmem" (défaut si DEBUG) : mémoire du processus, pour un seul processus serveur
+# - "file" (défaut sinon) : fichiers, partagés entre processus d'une même machine
+# - "redis", "memcached" : serveur partagé, entre machines aussi (CACHE_LOCATION)
+#
+# L'alias "fragments" contient le HTML des tableaux des pages coach (voir
+# seances/fragments.py), invalidé lui aussi par signaux. Son backend se choisit
+# avec FRAGMENT_CACHE_BACKEND (mêmes valeurs, mêmes défauts : "locmem" est
+# réservé à un seul processus) et FRAGMENT_CACHE_LOCATION.
+
+
+def backend_cache(backend, location, nom, base_redis):
+    """Configuration d'un alias de cache ; ``nom`` distingue les alias qui partagent un backend."""
+    if backend == 'locmem':
+        return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': nom}
+    if backend == 'file':
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location or BASE_DIR / '.cache' / nom,
+            # Une entrée par coach et par jour : la limite par défaut (300) viderait le cache
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    if backend == 'redis':
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': location or f'redis://127.0.0.1:6379/{base_redis}',
+        }
+    if backend == 'memcached':
+        return {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': location or '127.0.0.1:11211',
+            'KEY_PREFIX': nom,
+        }
+    raise ImproperlyConfigured(
+        f"Backend de cache inconnu : {backend!r} (valeurs acceptées : locmem, file, redis, memcached)."
+    )
+
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem' if DEBUG else 'file')
+
+CACHES = {
+    'default': backend_cache(CACHE_BACKEND, os.environ.get('CACHE_LOCATION'), 'default', 0),
+    'fragments': backend_cache(
+        os.environ.get('FRAGMENT_CACHE_BACKEND', 'locmem' if DEBUG else 'file'),
+        os.environ.get('FRAGMENT_CACHE_LOCATION'), 'fragments', 1,
+    ),
+}
+
+
+# Sessions et messages
+# https://docs.djangoproject.com/en/5.2/topics/http/sessions/
+#
+# SESSION_BACKEND choisit le stockage des sessions :
+# - "cached_db" (défaut avec CACHE_BACKEND "redis" ou "memcached") : base de données,
+#   lue depuis le cache (SESSION_CACHE_ALIAS) tant qu'elle y est ; seules les
+#   écritures touchent la table django_session. Le cache doit être partagé par tous
+#   les processus serveur : sinon une session fermée (déconnexion) reste valide
+#   dans le cache des autres processus
+# - "db" (défaut sinon) : base de données à chaque requête
+# - "cache" : cache seul (à réserver à un cache partagé et persistant, Redis…)
+# - "signed_cookies" : cookie signé, aucun stockage côté serveur
+#
+# Les messages flash sont stockés dans un cookie : ajouter un message ne
+# modifie pas la session. Les sessions expirées sont supprimées par lots par
+# le worker (voir core/sessions.py).
+
+SESSION_BACKENDS = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_BACKENDS[os.environ.get(
+    'SESSION_BACKEND', 'cached_db' if CACHE_BACKEND in ('redis', 'memcached') else 'db',
+)]
+SESSION_CACHE_ALIAS = os.environ.get('SESSION_CACHE_ALIAS', 'default')
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+
+# E-mails
+# https://docs.djangoproject.com/en/5.2/topics/email/
+#
+# Les e-mails (confirmations, annulations, rappels) sont envoyés par la
+# commande ``manage.py worker`` (voir core/taches.py). En local, ils sont
+# affichés dans la console du worker ; EMAIL_BACKEND permet de choisir le
+# backend "filebased" (EMAIL_FILE_PATH) ou "smtp" (EMAIL_HOST…).
+
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_FILE_PATH = os.environ.get('EMAIL_FILE_PATH', BASE_DIR / '.mails')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', '0') == '1'
+EMAIL_TIMEOUT = 30
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'DupontIpsum <no-reply@dupontipsum.fr>')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -120,6 +319,21 @@ USE_L10N = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# En production, collectstatic produit des noms de fichiers empreintés et des
+# variantes précompressées .gz/.br (voir core.stockage).
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'core.stockage.StockageStatiqueCompresse'
+        ),
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -1,4 +1,6 @@
 from django.contrib import admin
-from .models import Seance
+from .models import ExceptionDisponibilite, HoraireHebdomadaire, Seance
 
-admin.site.register(Seance)
\ No newline at end of file
+admin.site.register(Seance)
+admin.site.register(HoraireHebdomadaire)
+admin.site.register(ExceptionDisponibilite)
@@ -0,0 +1,140 @@
+"""
+Ce module produit l'agenda iCalendar (.ics) d'un coach ou d'un client.
+
+Les applications d'agenda s'abonnent à une URL contenant un jeton signé
+(``django.core.signing``) : aucune session n'est nécessaire, et le jeton ne
+peut pas être forgé pour un autre utilisateur.
+
+Le flux est généré ligne à ligne depuis un itérateur de base de données, sans
+jamais charger tout l'historique en mémoire. Son état (nombre de séances et
+date de la dernière modification) sert d'ETag et de Last-Modified : un client
+qui interroge le flux toutes les quelques minutes reçoit une réponse 304 au
+prix d'une seule requête d'agrégat.
+
+Fonctions :
+- jeton : jeton d'abonnement d'un utilisateur.
+- utilisateur_du_jeton : retrouve l'utilisateur d'un jeton (ou None).
+- seances_agenda : séances de l'agenda d'un utilisateur (coach ou client).
+- etat_agenda : nombre de séances et date de dernière modification.
+- lignes_ics : générateur du contenu iCalendar.
+"""
+
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db.models import Count, Max
+
+from accounts.roles import roles_utilisateur
+
+from .disponibilites import CODES_ANNULES
+from .models import Seance
+
+SALT = "seances.agenda"
+
+TAILLE_LOT = 500
+
+LIBELLES = dict(Seance.CODE_CHOIX)
+
+
+def jeton(user):
+    """Retourne le jeton d'abonnement de ``user``."""
+    return signing.Signer(salt=SALT).sign(str(user.pk))
+
+
+def utilisateur_du_jeton(valeur):
+    """Retourne l'utilisateur du jeton, ou None si le jeton est invalide."""
+    try:
+        pk = int(signing.Signer(salt=SALT).unsign(valeur))
+    except (signing.BadSignature, ValueError):
+        return None
+    return get_user_model().objects.filter(pk=pk, is_active=True).first()
+
+
+def seances_agenda(user):
+    """Séances d'un coach (en tant que coach) ou d'un client (en tant que client)."""
+    if roles_utilisateur(user).is_coach:
+        return Seance.objects.filter(coach=user)
+    return Seance.objects.filter(client=user)
+
+
+def etat_agenda(user):
+    """Retourne ``(nombre, derniere_modification)`` des séances de l'agenda."""
+    etat = seances_agenda(user).aggregate(nombre=Count("id"), derniere=Max("modifie_le"))
+    return etat["nombre"], etat["derniere"]
+
+
+def _echapper(texte):
+    return (
+        texte.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _plier(ligne):
+    """Coupe une ligne à 75 octets, comme l'exige la RFC 5545."""
+    octets = ligne.encode("utf-8")
+    if len(octets) <= 75:
+        return ligne + "\r\n"
+    morceaux, debut = [], 0
+    while debut < len(octets):
+        fin = min(debut + (75 if not morceaux else 74), len(octets))
+        # Ne pas couper au milieu d'un caractère UTF-8
+        while fin < len(octets) and octets[fin] & 0xC0 == 0x80:
+            fin -= 1
+        morceaux.append(octets[debut:fin].decode("utf-8"))
+        debut = fin
+    return "\r\n ".join(morceaux) + "\r\n"
+
+
+def _utc(moment):
+    return moment.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _nom(prenom, nom, username):
+    return f"{prenom} {nom}".strip() or username
+
+
+def lignes_ics(user, domaine):
+    """
+    Génère le calendrier de ``user`` par morceaux de texte.
+
+    ``domaine`` sert à construire les UID des événements.
+    """
+    est_coach = roles_utilisateur(user).is_coach
+    autre = "client" if est_coach else "coach"
+    seances = (
+        seances_agenda(user)
+        .order_by("debut")
+        .values_list(
+            "id", "debut", "fin", "objet", "code_rdv", "modifie_le",
+            f"{autre}__first_name", f"{autre}__last_name", f"{autre}__username",
+        )
+    )
+
+    yield "".join(_plier(ligne) for ligne in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//DupontIpsum//Agenda des séances//FR",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_echapper('DupontIpsum – ' + _nom(user.first_name, user.last_name, user.username))}",
+        "REFRESH-INTERVAL;VALUE=DURATION:PT15M",
+        "X-PUBLISHED-TTL:PT15M",
+    ))
+
+    for pk, debut, fin, objet, code_rdv, modifie_le, prenom, nom, username in seances.iterator(chunk_size=TAILLE_LOT):
+        yield "".join(_plier(ligne) for ligne in (
+            "BEGIN:VEVENT",
+            f"UID:seance-{pk}@{domaine}",
+            f"DTSTAMP:{_utc(modifie_le)}",
+            f"LAST-MODIFIED:{_utc(modifie_le)}",
+            f"DTSTART:{_utc(debut)}",
+            f"DTEND:{_utc(fin)}",
+            f"SUMMARY:{_echapper(f'{objet} – {_nom(prenom, nom, username)}')}",
+            f"DESCRIPTION:{_echapper(LIBELLES.get(code_rdv, ''))}",
+            f"STATUS:{'CANCELLED' if code_rdv in CODES_ANNULES else 'CONFIRMED'}",
+            "END:VEVENT",
+        ))
+
+    yield "END:VCALENDAR\r\n"
@@ -0,0 +1,359 @@
+"""
+Ce module calcule les créneaux réservables des coachs.
+
+Pour chaque couple (coach, jour), une ``Occupation`` conserve les séances
+actives sous forme d'intervalles de minutes ``[debut, fin)`` triés et
+fusionnés. Elle est chargée en une requête, mise en cache, et sert à la fois :
+- à la validation d'une réservation : ``Occupation.libre`` cherche par
+  dichotomie le seul intervalle qui pourrait chevaucher le créneau demandé
+  (O(log n) par créneau testé, sans requête) ;
+- au calcul des créneaux libres : ``Occupation.bitmap`` produit, pour une durée
+  de séance donnée, un entier dont le bit ``i`` vaut 1 si une séance de cette
+  durée peut commencer ``i`` minutes après minuit.
+
+Règles appliquées :
+- la séance se déroule entièrement pendant les horaires de réception du coach
+  (cartes compilées par ``seances.horaires``, attachées à chaque occupation
+  lue : ``Occupation.ouvert``),
+- aucun chevauchement avec une séance existante (chaque séance dure
+  ``Seance.duree`` minutes, selon son objet),
+- une séance annulée ne bloque que sa minute de début, à cause de la
+  contrainte d'unicité (date, heure_debut, coach).
+
+L'occupation en cache (séances seules) est reconstruite (une seule requête) à chaque
+enregistrement ou suppression d'une séance du coach pour ce jour
+(voir ``seances.signals``). Cette invalidation ne vaut que pour les processus
+qui partagent le cache : avec plusieurs processus serveur, le cache "default"
+doit être partagé (CACHE_BACKEND "file", "redis" ou "memcached"). Dans un cache
+propre au processus, une occupation n'est conservée qu'une minute
+(voir ``core.caches.duree_cache``).
+
+Classes :
+- Occupation : séances actives d'un coach sur un jour.
+
+Fonctions :
+- occupation : occupation (en cache) d'un coach pour un jour.
+- occupations : occupations de plusieurs coachs et jours, en une lecture du
+  cache et au plus une requête.
+- calculer_occupation : calcule l'occupation d'un jour depuis la base.
+- calculer_occupations : calcule les occupations de plusieurs jours depuis la base,
+  horaires compris (vérifications sous verrou).
+- reconstruire : recalcule et remet en cache l'occupation d'un jour.
+- reconstruire_jours : recalcule et remet en cache les occupations de plusieurs jours.
+- invalider : retire l'occupation d'un jour du cache.
+- invalider_jours : retire les occupations de plusieurs jours du cache.
+- est_libre : indique si une séance peut commencer à l'heure donnée.
+- plages_libres : liste des plages horaires libres d'un jour.
+- plages_bitmap : liste des plages horaires libres d'un bitmap.
+- coachs_libres : coachs pouvant recevoir une séance à une heure donnée.
+- premier_creneau : premier créneau libre parmi plusieurs coachs.
+"""
+
+from bisect import bisect_right
+from datetime import time, timedelta
+
+from django.core.cache import cache
+
+from core.caches import duree_cache
+
+from . import horaires
+from .models import Seance, debut_jour
+
+NB_MINUTES = 24 * 60
+
+# Statuts qui libèrent le créneau (annulé par le client / par le coach)
+CODES_ANNULES = (3, 4)
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _cle(coach_id, jour):
+    return f"seances:occupation:{coach_id}:{jour.isoformat()}"
+
+
+def _index(heure):
+    """Convertit une heure en position dans un bitmap (minutes depuis minuit)."""
+    return heure.hour * 60 + heure.minute
+
+
+def _heure(index):
+    return time(index // 60, index % 60)
+
+
+def _debuts_possibles(ouvert, duree):
+    """Bits ``m`` tels que les minutes ``m`` à ``m + duree - 1`` soient toutes à 1 dans ``ouvert``."""
+    resultat, couvert = ouvert, 1
+    # Doublement de la longueur couverte : O(log duree) opérations sur l'entier
+    while couvert < duree:
+        pas = min(couvert, duree - couvert)
+        resultat &= resultat >> pas
+        couvert += pas
+    return resultat
+
+
+class Occupation:
+    """
+    Séances d'un coach sur un jour.
+
+    ``debuts`` et ``fins`` décrivent les intervalles occupés (minutes depuis
+    minuit), triés et fusionnés : ``fins`` est donc trié lui aussi.
+    ``annules`` contient les minutes de début des séances annulées.
+    ``ouvert`` est le bitmap des minutes de réception du coach ce jour-là.
+    """
+
+    __slots__ = ("debuts", "fins", "annules", "ouvert")
+
+    def __init__(self, seances=(), ouvert=0):
+        """``seances`` : triplets ``(heure_debut, duree, code_rdv)``."""
+        self.debuts, self.fins = [], []
+        annules = set()
+        intervalles = []
+        for heure_debut, duree, code_rdv in seances:
+            debut = _index(heure_debut)
+            if code_rdv in CODES_ANNULES:
+                annules.add(debut)
+            else:
+                intervalles.append((debut, debut + duree))
+        for debut, fin in sorted(intervalles):
+            if self.fins and debut <= self.fins[-1]:
+                self.fins[-1] = max(self.fins[-1], fin)
+            else:
+                self.debuts.append(debut)
+                self.fins.append(fin)
+        self.annules = frozenset(annules)
+        self.ouvert = ouvert
+
+    def __eq__(self, autre):
+        return isinstance(autre, Occupation) and all(
+            getattr(self, attribut) == getattr(autre, attribut) for attribut in self.__slots__
+        )
+
+    def __getstate__(self):
+        return {attribut: getattr(self, attribut) for attribut in self.__slots__}
+
+    def __setstate__(self, etat):
+        for attribut, valeur in etat.items():
+            setattr(self, attribut, valeur)
+
+    def dans_horaires(self, heure, duree):
+        """Indique si une séance de ``duree`` minutes commençant à ``heure`` tient dans les horaires."""
+        masque = ((1 << duree) - 1) << _index(heure)
+        return self.ouvert & masque == masque
+
+    def libre(self, heure, duree):
+        """Indique si une séance de ``duree`` minutes peut commencer à ``heure``."""
+        if not self.dans_horaires(heure, duree):
+            return False
+        debut = _index(heure)
+        if debut in self.annules:
+            return False
+        # Premier intervalle qui se termine après le début demandé : le seul à tester
+        i = bisect_right(self.fins, debut)
+        return i == len(self.debuts) or self.debuts[i] >= debut + duree
+
+    def bitmap(self, duree):
+        """Bitmap des débuts possibles d'une séance de ``duree`` minutes."""
+        possibles = _debuts_possibles(self.ouvert, duree)
+        if not possibles:
+            return 0
+        occupe = 0
+        for debut, fin in zip(self.debuts, self.fins):
+            # Débuts dont la séance chevaucherait [debut, fin)
+            premier = max(debut - duree + 1, 0)
+            dernier = min(fin - 1, NB_MINUTES - 1)
+            if premier <= dernier:
+                occupe |= ((1 << (dernier - premier + 1)) - 1) << premier
+        for minute in self.annules:
+            occupe |= 1 << minute
+        return possibles & ~occupe
+
+    def minutes_occupees(self):
+        return sum(fin - debut for debut, fin in zip(self.debuts, self.fins))
+
+
+def _avec_horaires(resultat, en_base=False):
+    """
+    Attache à chaque occupation ``{(coach_id, jour): occupation}`` les horaires du
+    jour, lus dans les cartes en cache ou, si ``en_base``, compilés depuis la base.
+    """
+    ouvertes = horaires.minutes_ouvertes(
+        {coach_id for coach_id, _ in resultat}, {jour for _, jour in resultat}, en_base=en_base,
+    )
+    for couple, occupation_jour in resultat.items():
+        occupation_jour.ouvert = ouvertes[couple]
+    return resultat
+
+
+def calculer_occupation(coach_id, jour):
+    """Calcule l'occupation d'un jour à partir de la base, horaires compris."""
+    return calculer_occupations([(coach_id, jour)])[coach_id, jour]
+
+
+def reconstruire(coach_id, jour):
+    """Recalcule l'occupation d'un jour et la remet en cache."""
+    occupation_jour = _calculer([(coach_id, jour)])[coach_id, jour]
+    cache.set(_cle(coach_id, jour), occupation_jour, duree_cache(CACHE_TIMEOUT))
+    return occupation_jour
+
+
+def invalider(coach_id, jour):
+    """Retire l'occupation d'un jour du cache ; elle sera recalculée à la prochaine lecture."""
+    cache.delete(_cle(coach_id, jour))
+
+
+def invalider_jours(couples):
+    """Retire du cache les occupations de plusieurs couples ``(coach_id, jour)``."""
+    cache.delete_many([_cle(coach_id, jour) for coach_id, jour in couples])
+
+
+def occupation(coach_id, jour):
+    """Retourne l'occupation d'un coach pour un jour, calculée au besoin."""
+    return occupations([coach_id], [jour])[coach_id, jour]
+
+
+def est_libre(coach_id, jour, heure, duree):
+    """Indique si une séance de ``duree`` minutes peut commencer à ``heure`` ce jour-là."""
+    return occupation(coach_id, jour).libre(heure, duree)
+
+
+def _calculer(couples):
+    """
+    Calcule depuis la base les occupations (séances seules) des couples
+    ``(coach_id, jour)`` donnés, en une seule requête sur les séances.
+
+    Les séances sont lues même les jours où le coach ne reçoit pas : l'occupation
+    mise en cache ne dépend pas des horaires, qui peuvent changer sans l'invalider.
+    """
+    couples = set(couples)
+    seances = {couple: [] for couple in couples}
+    if couples:
+        jours = {jour for _, jour in couples}
+        premier, dernier = min(jours), max(jours)
+        lignes = Seance.objects.filter(coach_id__in={coach_id for coach_id, _ in couples})
+        if (dernier - premier).days < 2 * len(jours):
+            # Jours rapprochés : une plage sur l'index (coach, debut)
+            lignes = lignes.filter(debut__gte=debut_jour(premier), debut__lt=debut_jour(dernier + timedelta(days=1)))
+        else:
+            # Jours épars (séries hebdomadaires) : liste de dates
+            lignes = lignes.filter(date__in=jours)
+        lignes = lignes.values_list("coach_id", "date", "heure_debut", "duree", "code_rdv")
+        for coach_id, jour, heure_debut, duree, code_rdv in lignes:
+            if (coach_id, jour) in seances:
+                seances[coach_id, jour].append((heure_debut, duree, code_rdv))
+    return {couple: Occupation(seances[couple]) for couple in couples}
+
+
+def calculer_occupations(couples):
+    """
+    Calcule depuis la base les occupations des couples ``(coach_id, jour)`` donnés,
+    en trois requêtes (séances, plages hebdomadaires, exceptions), sans lire le
+    cache : sert aux vérifications faites sous verrou avant un enregistrement.
+    """
+    return _avec_horaires(_calculer(couples), en_base=True)
+
+
+def reconstruire_jours(couples):
+    """
+    Recalcule et remet en cache les occupations (séances seules) de plusieurs
+    couples ``(coach_id, jour)``.
+    """
+    resultat = _calculer(couples)
+    cache.set_many({_cle(*couple): occupation_jour for couple, occupation_jour in resultat.items()}, duree_cache(CACHE_TIMEOUT))
+    return resultat
+
+
+def occupations(coach_ids, jours):
+    """
+    Retourne ``{(coach_id, jour): occupation}`` pour tous les couples demandés.
+
+    Les occupations en cache sont lues en un seul ``get_many`` ; les manquantes
+    sont calculées ensemble, en une seule requête sur les séances, puis remises
+    en cache. Les horaires du jour, lus dans les cartes compilées, y sont attachés.
+    """
+    cles = {_cle(coach_id, jour): (coach_id, jour) for coach_id in coach_ids for jour in jours}
+    resultat = {cles[cle]: occupation_jour for cle, occupation_jour in cache.get_many(list(cles)).items()}
+    manquants = [couple for couple in cles.values() if couple not in resultat]
+    if manquants:
+        resultat.update(reconstruire_jours(manquants))
+    return _avec_horaires(resultat)
+
+
+def _masquer_avant(bitmap, apres):
+    """Retire du bitmap les débuts situés avant ou à l'heure ``apres``."""
+    debut = _index(apres) + 1
+    if debut >= NB_MINUTES:
+        return 0
+    if debut > 0:
+        bitmap &= ~((1 << debut) - 1)
+    return bitmap
+
+
+def plages_libres(coach_id, jour, duree, apres=None):
+    """
+    Retourne la liste des plages ``(debut, fin)`` où une séance de ``duree``
+    minutes peut commencer.
+
+    Paramètres :
+    - coach_id : identifiant du coach
+    - jour : date concernée
+    - duree : durée de la séance, en minutes
+    - apres : heure optionnelle avant laquelle les créneaux sont ignorés
+      (utile pour le jour même)
+    """
+    return plages_bitmap(occupation(coach_id, jour).bitmap(duree), apres)
+
+
+def plages_bitmap(bitmap, apres=None):
+    """Retourne la liste des plages ``(debut, fin)`` des bits à 1 de ``bitmap``."""
+    if apres is not None:
+        bitmap = _masquer_avant(bitmap, apres)
+
+    plages = []
+    index = 0
+    while bitmap:
+        # Saut direct au prochain bit à 1, puis à la fin de la plage
+        decalage = (bitmap & -bitmap).bit_length() - 1
+        index += decalage
+        bitmap >>= decalage
+        longueur = (~bitmap & (bitmap + 1)).bit_length() - 1
+        plages.append((_heure(index), _heure(index + longueur - 1)))
+        index += longueur
+        bitmap >>= longueur
+    return plages
+
+
+def coachs_libres(coach_ids, jour, heure, duree):
+    """
+    Retourne les coachs pouvant recevoir une séance de ``duree`` minutes à
+    ``heure`` ce jour-là, du moins chargé au plus chargé.
+    """
+    resultat = occupations(coach_ids, [jour])
+    libres = [coach_id for coach_id in coach_ids if resultat[coach_id, jour].libre(heure, duree)]
+    return sorted(libres, key=lambda coach_id: resultat[coach_id, jour].minutes_occupees())
+
+
+def premier_creneau(coach_ids, moment, duree, nb_jours=30):
+    """
+    Retourne ``(coach_id, jour, heure)`` du premier créneau libre pour une séance
+    de ``duree`` minutes après ``moment`` (datetime local) parmi ``coach_ids``,
+    ou None sur les ``nb_jours`` suivants.
+
+    À heure égale, le premier coach de ``coach_ids`` l'emporte. Le coût est
+    borné : une lecture du cache et au plus une requête, quel que soit le
+    nombre de coachs.
+    """
+    jours = [moment.date() + timedelta(days=decalage) for decalage in range(nb_jours)]
+    resultat = occupations(coach_ids, jours)
+    for jour in jours:
+        meilleur = None
+        for coach_id in coach_ids:
+            bitmap = resultat[coach_id, jour].bitmap(duree)
+            if jour == moment.date():
+                bitmap = _masquer_avant(bitmap, moment.time())
+            if bitmap:
+                index = (bitmap & -bitmap).bit_length() - 1
+                if meilleur is None or index < meilleur[1]:
+                    meilleur = (coach_id, index)
+        if meilleur is not None:
+            return meilleur[0], jour, _heure(meilleur[1])
+    return None
@@ -0,0 +1,105 @@
+"""
+Ce module exporte l'historique des séances d'un coach (CSV ou XLSX).
+
+Les séances sont lues par lots (``iterator``) sous forme de tuples
+(``values_list``), sans instancier de modèle : la mémoire utilisée ne dépend
+pas de la taille de l'historique.
+- CSV : chaque ligne est transmise au client dès qu'elle est écrite
+  (StreamingHttpResponse).
+- XLSX (si ``openpyxl`` est installé) : le classeur est écrit en mode
+  ``write_only`` dans un fichier temporaire, puis envoyé.
+
+Les textes saisis par les utilisateurs (nom du client, objet, note) qui
+commencent comme une formule (``=``, ``+``, ``-``, ``@``…) sont préfixés d'une
+apostrophe : le tableur les affiche comme du texte au lieu de les exécuter.
+
+Fonctions :
+- formats_disponibles : formats d'export proposés.
+- seances_a_exporter : séances d'un coach filtrées par dates et statuts.
+- lignes_csv : générateur du fichier CSV.
+- ecrire_xlsx : écrit le classeur XLSX dans un fichier.
+"""
+
+import csv
+from datetime import timedelta
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    Workbook = None
+
+from .models import Seance, debut_jour
+
+ENTETES = ["Date", "Heure", "Client", "Objet", "Statut", "Note"]
+
+TAILLE_LOT = 2000
+
+LIBELLES = dict(Seance.CODE_CHOIX)
+
+# Premiers caractères interprétés comme une formule par les tableurs
+DEBUTS_FORMULE = ("=", "+", "-", "@", "\t", "\r")
+
+
+def formats_disponibles():
+    formats = [("csv", "CSV (Excel, LibreOffice)")]
+    if Workbook is not None:
+        formats.append(("xlsx", "Classeur Excel (.xlsx)"))
+    return formats
+
+
+def seances_a_exporter(coach, date_debut=None, date_fin=None, statuts=None):
+    """Retourne les tuples des séances du coach, du plus ancien au plus récent."""
+    seances = Seance.objects.filter(coach=coach)
+    if date_debut:
+        seances = seances.filter(debut__gte=debut_jour(date_debut))
+    if date_fin:
+        seances = seances.filter(debut__lt=debut_jour(date_fin + timedelta(days=1)))
+    if statuts:
+        seances = seances.filter(code_rdv__in=statuts)
+    return seances.order_by("debut").values_list(
+        "date", "heure_debut", "client__first_name", "client__last_name", "client__username",
+        "objet", "code_rdv", "message",
+    )
+
+
+def _texte(valeur):
+    """Neutralise un texte libre qui serait exécuté comme une formule par le tableur."""
+    return f"'{valeur}" if valeur.startswith(DEBUTS_FORMULE) else valeur
+
+
+def _lignes(seances):
+    for jour, heure, prenom, nom, username, objet, code_rdv, message in seances.iterator(chunk_size=TAILLE_LOT):
+        yield [
+            jour, heure, _texte(f"{prenom} {nom}".strip() or username), _texte(objet),
+            LIBELLES.get(code_rdv, ""), _texte(message or ""),
+        ]
+
+
+class _Echo:
+    """Pseudo-fichier : ``write`` renvoie la ligne au lieu de la stocker."""
+
+    def write(self, valeur):
+        return valeur
+
+
+def lignes_csv(seances):
+    """
+    Génère le CSV ligne par ligne.
+
+    Séparateur « ; » et BOM UTF-8 : le fichier s'ouvre directement dans un
+    tableur configuré en français.
+    """
+    writer = csv.writer(_Echo(), delimiter=";")
+    yield "\ufeff" + writer.writerow(ENTETES)
+    for jour, heure, *autres in _lignes(seances):
+        yield writer.writerow([jour.strftime("%d/%m/%Y"), heure.strftime("%H:%M"), *autres])
+
+
+def ecrire_xlsx(seances, fichier):
+    """Écrit le classeur dans ``fichier`` (mode ``write_only`` : une ligne en mémoire à la fois)."""
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet("Historique")
+    feuille.append(ENTETES)
+    for ligne in _lignes(seances):
+        feuille.append(ligne)
+    classeur.save(fichier)
@@ -1,19 +1,41 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 from django import forms
+from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.utils import timezone 
 
-from .models import Seance
+from . import disponibilites, export, notifications
+from .models import DUREES_OBJETS, Seance, duree_objet, horodatage
+from .signals import seances_modifiees
 
 
 class PriseSeanceForm(forms.ModelForm):
-    OBJET_CHOICES = [
-        ("Coaching personnel", "Coaching personnel"),
-        ("Gestion du stress", "Gestion du stress"),
-        ("Développement de la confiance en soi", "Développement de la confiance en soi"),
-    ]
+    """
+    Réservation d'une séance par un client.
 
+    Le client choisit un coach, ou laisse le champ vide pour « premier coach
+    disponible » : la séance est alors attribuée au coach libre à cette heure
+    le moins chargé ce jour-là. La disponibilité de tous les coachs est lue en
+    une fois (voir ``disponibilites.occupations``).
+
+    La durée de la séance est celle de son objet (``Seance.duree``).
+    """
+
+    OBJET_CHOICES = [(objet, f"{objet} ({duree} min)") for objet, duree in DUREES_OBJETS.items()]
+
+    MESSAGE_CRENEAU_PRIS = "Ce créneau vient d'être réservé. Merci d'en choisir un autre."
+    MESSAGE_HORS_HORAIRES = "Le coach ne reçoit pas sur ce créneau."
+    PREMIER_DISPONIBLE = "Premier coach disponible"
+
+    coach = forms.TypedChoiceField(
+        label="Coach",
+        coerce=int,
+        empty_value=None,
+        required=False,
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
     objet = forms.ChoiceField(
         choices=OBJET_CHOICES,
         widget=forms.Select(attrs={"class": "form-select"}),
@@ -21,6 +43,8 @@ class PriseSeanceForm(forms.ModelForm):
         initial="Coaching personnel"
     )
 
+    field_order = ["coach", "date", "heure_debut", "objet"]
+
     class Meta:
         model = Seance
         fields = ["date", "heure_debut", "objet"]
@@ -29,50 +53,211 @@ class PriseSeanceForm(forms.ModelForm):
             "heure_debut": forms.TimeInput(attrs={"type": "time", "class": "form-control"}),
         }
 
-    def __init__(self, *args, client=None, coach=None, **kwargs):
+    def __init__(self, *args, client=None, coachs=(), **kwargs):
         super().__init__(*args, **kwargs)
         self.client = client
-        self.coach = coach
+        self.coachs = {coach.pk: coach for coach in coachs}
+        self.fields["coach"].choices = [("", self.PREMIER_DISPONIBLE)] + [
+            (coach.pk, coach.get_full_name() or coach.username) for coach in coachs
+        ]
+        # Coachs libres sur le créneau demandé, par ordre de préférence (rempli par clean)
+        self.candidats = []
+        self.duree = None
 
     def clean(self):
         cleaned = super().clean()
         date = cleaned.get("date")
         heure = cleaned.get("heure_debut")
+        coach_id = cleaned.get("coach")
 
         if not date or not heure:
             return cleaned
+        self.duree = duree_objet(cleaned.get("objet"))
 
         # Créneau dans le futur
-        dt = datetime.combine(date, heure)
-        if timezone.make_aware(dt) < timezone.now():
+        if horodatage(date, heure) < timezone.now():
             raise ValidationError("Impossible de réserver un créneau dans le passé.")
 
-        # Interdire les weekends
-        if date.weekday() in (5, 6):
-            raise ValidationError("Les rendez-vous ne sont pas disponibles le week-end (samedi ou dimanche).")
-
-        # Conflit de créneaux pour le coach
-        delta = timedelta(minutes=10)
-        clash = (
-            Seance.objects
-            .filter(coach=self.coach, date=date)
-            .exclude(heure_debut__lt=(datetime.combine(date, heure) - delta).time())
-            .exclude(heure_debut__gt=(datetime.combine(date, heure) + delta).time())
-        )
-        if clash.exists():
-            raise ValidationError("Ce créneau est trop proche d'un autre rendez-vous.")
+        # Horaires de réception et chevauchement (lus dans les occupations en cache des coachs)
+        coach_ids = [coach_id] if coach_id else list(self.coachs)
+        self.candidats = [
+            self.coachs[pk] for pk in disponibilites.coachs_libres(coach_ids, date, heure, self.duree)
+        ]
+        if not self.candidats:
+            if not coach_id:
+                raise ValidationError("Aucun coach n'est disponible sur ce créneau.")
+            if not disponibilites.occupation(coach_id, date).dans_horaires(heure, self.duree):
+                raise ValidationError(self.MESSAGE_HORS_HORAIRES)
+            raise ValidationError("Ce créneau chevauche un autre rendez-vous.")
 
         return cleaned
 
     def save(self, commit=True):
         seance = super().save(commit=False)
         seance.client = self.client
-        seance.coach = self.coach
+        seance.coach = self.candidats[0] if self.candidats else None
+        seance.duree = self.duree
         if commit:
-            seance.full_clean()
-            seance.save()
+            # L'unicité du créneau est garantie par reserver(), sous verrou
+            seance.full_clean(validate_unique=False)
+            self.reserver(seance)
         return seance
 
+    def reserver(self, seance):
+        """
+        Enregistre la séance auprès du premier coach encore libre, de façon atomique.
+
+        Le verrou est pris par coach : select_for_update sur la ligne du coach
+        (PostgreSQL) ou verrou d'écriture de la transaction IMMEDIATE (SQLite).
+        Le créneau est revérifié en base sous ce verrou : deux réservations
+        concurrentes ne peuvent donc pas passer toutes les deux. Si le créneau
+        vient d'être pris, le coach candidat suivant est essayé.
+
+        Lève ValidationError si le créneau a été pris entre-temps chez tous les candidats.
+        """
+        for coach in self.candidats:
+            seance.coach = coach
+            try:
+                with transaction.atomic():
+                    get_user_model().objects.select_for_update().filter(pk=coach.pk).exists()
+                    occupation = disponibilites.calculer_occupation(coach.pk, seance.date)
+                    if not occupation.libre(seance.heure_debut, seance.duree):
+                        continue
+                    seance.save()
+                    notifications.notifier_reservation([seance])
+                return seance
+            except IntegrityError:
+                continue
+        raise ValidationError(self.MESSAGE_CRENEAU_PRIS)
+
+
+class SerieSeanceForm(forms.Form):
+    """
+    Réservation d'une série hebdomadaire de séances (même jour, même heure,
+    même coach, pendant ``nb_semaines`` semaines).
+
+    Toutes les occurrences sont vérifiées ensemble, dans les occupations des
+    jours concernés (une requête au plus), puis enregistrées par un seul
+    ``bulk_create``. Après validation, ``occurrences`` contient les dates
+    réservables et ``conflits`` les dates refusées avec leur motif.
+    """
+
+    NB_SEMAINES_MAX = 52
+
+    coach = forms.TypedChoiceField(
+        label="Coach", coerce=int,
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    date = forms.DateField(
+        label="Première séance",
+        widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+    )
+    heure_debut = forms.TimeField(
+        label="Heure",
+        widget=forms.TimeInput(attrs={"type": "time", "class": "form-control"}),
+    )
+    nb_semaines = forms.IntegerField(
+        label="Nombre de semaines", min_value=2, max_value=NB_SEMAINES_MAX, initial=12,
+        widget=forms.NumberInput(attrs={"class": "form-control"}),
+    )
+    objet = forms.ChoiceField(
+        choices=PriseSeanceForm.OBJET_CHOICES,
+        widget=forms.Select(attrs={"class": "form-select"}),
+        label="Objet des séances",
+        initial="Coaching personnel"
+    )
+    ignorer_conflits = forms.BooleanField(
+        label="Réserver les semaines libres et ignorer les autres", required=False,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+
+    def __init__(self, *args, client=None, coachs=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.client = client
+        self.coachs = {coach.pk: coach for coach in coachs}
+        self.fields["coach"].choices = [(coach.pk, coach.get_full_name() or coach.username) for coach in coachs]
+        self.occurrences = []
+        self.conflits = []
+
+    def clean(self):
+        cleaned = super().clean()
+        debut = cleaned.get("date")
+        heure = cleaned.get("heure_debut")
+        coach_id = cleaned.get("coach")
+        nb_semaines = cleaned.get("nb_semaines")
+
+        if not debut or not heure or not coach_id or not nb_semaines:
+            return cleaned
+
+        if horodatage(debut, heure) < timezone.now():
+            raise ValidationError("Impossible de réserver un créneau dans le passé.")
+
+        jours = [debut + timedelta(weeks=semaine) for semaine in range(nb_semaines)]
+        duree = duree_objet(cleaned.get("objet"))
+        self.occurrences, self.conflits = self.verifier(coach_id, jours, heure, duree)
+
+        if not self.occurrences:
+            raise ValidationError("Aucune des semaines demandées n'est libre.")
+        if self.conflits and not cleaned.get("ignorer_conflits"):
+            raise ValidationError(
+                f"{len(self.conflits)} séance(s) de la série sont en conflit avec d'autres rendez-vous "
+                "ou en dehors des horaires du coach."
+            )
+        return cleaned
+
+    @staticmethod
+    def verifier(coach_id, jours, heure, duree, occupations=None):
+        """
+        Sépare ``jours`` en ``(libres, conflits)`` ; ``conflits`` est une liste de
+        ``(jour, motif)``. Les occupations sont lues en cache si ``occupations``
+        n'est pas fourni.
+        """
+        if occupations is None:
+            occupations = disponibilites.occupations([coach_id], jours)
+        libres, conflits = [], []
+        for jour in jours:
+            occupation = occupations[coach_id, jour]
+            if occupation.libre(heure, duree):
+                libres.append(jour)
+            elif not occupation.dans_horaires(heure, duree):
+                conflits.append((jour, PriseSeanceForm.MESSAGE_HORS_HORAIRES))
+            else:
+                conflits.append((jour, "Créneau en chevauchement avec un autre rendez-vous."))
+        return libres, conflits
+
+    def save(self):
+        """
+        Enregistre les séances libres de la série en une transaction et retourne la liste créée.
+
+        Les occurrences sont revérifiées en base sous le verrou du coach (comme
+        ``PriseSeanceForm.reserver``). Lève ValidationError si un conflit est
+        apparu entre-temps et que les conflits ne doivent pas être ignorés.
+        """
+        coach = self.coachs[self.cleaned_data["coach"]]
+        heure = self.cleaned_data["heure_debut"]
+        duree = duree_objet(self.cleaned_data["objet"])
+        try:
+            with transaction.atomic():
+                get_user_model().objects.select_for_update().filter(pk=coach.pk).exists()
+                occupations = disponibilites.calculer_occupations((coach.pk, jour) for jour in self.occurrences)
+                self.occurrences, conflits = self.verifier(coach.pk, self.occurrences, heure, duree, occupations)
+                self.conflits += conflits
+                if not self.occurrences or (conflits and not self.cleaned_data["ignorer_conflits"]):
+                    raise ValidationError(PriseSeanceForm.MESSAGE_CRENEAU_PRIS)
+                seances = Seance.objects.bulk_create([
+                    Seance(
+                        client=self.client, coach=coach, date=jour, heure_debut=heure,
+                        objet=self.cleaned_data["objet"], duree=duree,
+                    )
+                    for jour in self.occurrences
+                ])
+                # bulk_create n'émet pas de signaux
+                seances_modifiees(seances)
+                notifications.notifier_reservation(seances)
+        except IntegrityError:
+            raise ValidationError(PriseSeanceForm.MESSAGE_CRENEAU_PRIS)
+        return seances
+
 
 class FinRdvForm(forms.Form):
     notes = forms.CharField(
@@ -100,3 +285,79 @@ class ModifierNoteHistoriqueForm(forms.ModelForm):
         labels = {
             'message': "Note ou commentaire",
         }
+
+
+class TraitementSeancesForm(forms.Form):
+    """
+    Traitement groupé des séances oubliées d'un coach.
+
+    Les données POST contiennent, pour chaque ligne affichée, ``seance_id``,
+    ``code_rdv_<id>`` (vide si la ligne n'est pas traitée) et ``note_<id>``.
+    Après validation, ``traitements`` contient la liste des tuples
+    ``(seance_id, code_rdv, note)`` à appliquer.
+    """
+
+    # Présent, absent, annulé par le coach
+    STATUTS = [choix for choix in Seance.CODE_CHOIX if choix[0] in (1, 2, 4)]
+    CODES_AUTORISES = [code for code, _ in STATUTS]
+    NOTE_ABSENT = "Marqué comme absent par le coach."
+
+    def clean(self):
+        cleaned = super().clean()
+        traitements = []
+        for valeur in self.data.getlist("seance_id"):
+            try:
+                seance_id = int(valeur)
+            except ValueError:
+                raise ValidationError("Séance invalide.")
+            code = self.data.get(f"code_rdv_{seance_id}", "")
+            if not code:
+                continue
+            try:
+                code = int(code)
+            except ValueError:
+                code = None
+            if code not in self.CODES_AUTORISES:
+                raise ValidationError("Statut invalide.")
+            note = self.data.get(f"note_{seance_id}", "").strip()
+            if not note and code == 2:
+                note = self.NOTE_ABSENT
+            traitements.append((seance_id, code, note))
+
+        if not traitements:
+            raise ValidationError("Aucune séance sélectionnée.")
+        cleaned["traitements"] = traitements
+        return cleaned
+
+
+class ExportHistoriqueForm(forms.Form):
+    """Filtres de l'export de l'historique d'un coach (paramètres GET)."""
+
+    date_debut = forms.DateField(
+        label="Du", required=False,
+        widget=forms.DateInput(attrs={"type": "date", "class": "form-control form-control-sm"}),
+    )
+    date_fin = forms.DateField(
+        label="Au", required=False,
+        widget=forms.DateInput(attrs={"type": "date", "class": "form-control form-control-sm"}),
+    )
+    statuts = forms.TypedMultipleChoiceField(
+        label="Statuts", required=False, coerce=int,
+        choices=Seance.CODE_CHOIX,
+        widget=forms.CheckboxSelectMultiple(attrs={"class": "form-check-input"}),
+    )
+    format = forms.ChoiceField(
+        label="Format", initial="csv", required=False,
+        choices=export.formats_disponibles,
+        widget=forms.Select(attrs={"class": "form-select form-select-sm"}),
+    )
+
+    def clean_format(self):
+        return self.cleaned_data["format"] or "csv"
+
+    def clean(self):
+        cleaned = super().clean()
+        debut, fin = cleaned.get("date_debut"), cleaned.get("date_fin")
+        if debut and fin and debut > fin:
+            raise ValidationError("La date de début doit précéder la date de fin.")
+        return cleaned
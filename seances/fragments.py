@@ -0,0 +1,93 @@
+"""
+Ce module met en cache le HTML des tableaux de séances des pages coach.
+
+Un fragment est identifié par son nom, le coach, le jour et la « génération »
+du coach. La génération change à chaque modification d'une séance du coach
+(voir ``seances.signals``) : les anciens fragments ne sont alors plus jamais
+lus et expirent d'eux-mêmes. Tant que rien ne change, une page coach est
+servie sans requête sur les séances.
+
+Les fragments contiennent des formulaires ({% csrf_token %}) : la clé inclut
+donc une empreinte du secret CSRF de l'utilisateur, pour ne jamais resservir
+un jeton périmé.
+
+Le cache utilisé est l'alias ``fragments`` de CACHES (mémoire locale, fichiers,
+Redis ou Memcached selon la configuration). Le changement de génération n'est vu
+que des processus qui partagent ce cache : la mémoire locale est réservée à un
+seul processus serveur.
+
+Fonctions :
+- invalider_coach : change la génération d'un coach.
+- arendre : retourne le fragment depuis le cache ou le calcule (vues async).
+"""
+
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CACHE_ALIAS = "fragments"
+CACHE_TIMEOUT = 60 * 60 * 6
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _cle_generation(coach_id):
+    return f"seances:generation:{coach_id}"
+
+
+async def _ageneration(coach_id):
+    # Horodatage plutôt que compteur : une génération évincée du cache ne peut
+    # pas repartir à une valeur déjà utilisée par un ancien fragment.
+    return await _cache().aget_or_set(_cle_generation(coach_id), time.time_ns, CACHE_TIMEOUT)
+
+
+def invalider_coach(coach_id):
+    _cache().set(_cle_generation(coach_id), time.time_ns(), CACHE_TIMEOUT)
+
+
+def _empreinte_csrf(request):
+    get_token(request)
+    secret = request.META.get("CSRF_COOKIE", "")
+    return hashlib.sha256(secret.encode()).hexdigest()[:16]
+
+
+def _cle_fragment(request, nom, coach_id, jour, generation):
+    return ":".join([
+        "seances:fragment",
+        nom,
+        str(coach_id),
+        jour.isoformat(),
+        str(generation),
+        _empreinte_csrf(request),
+    ])
+
+
+async def arendre(request, nom, coach_id, jour, template_name, acontexte):
+    """
+    Retourne le fragment HTML ``nom`` du coach pour ``jour``.
+
+    Paramètres :
+    - request : requête courante (jeton CSRF des formulaires)
+    - nom : nom du fragment
+    - coach_id : identifiant du coach
+    - jour : date de référence du fragment
+    - template_name : template du fragment
+    - acontexte : coroutine sans argument retournant le contexte du template,
+      appelée seulement si le fragment n'est pas en cache (ORM asynchrone)
+
+    Le rendu du template, synchrone, se fait dans un thread.
+    """
+    cle = _cle_fragment(request, nom, coach_id, jour, await _ageneration(coach_id))
+    html = await _cache().aget(cle)
+    if html is None:
+        contexte = await acontexte()
+        html = await sync_to_async(render_to_string)(template_name, contexte, request=request)
+        await _cache().aset(cle, html, CACHE_TIMEOUT)
+    return mark_safe(html)
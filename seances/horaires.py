@@ -0,0 +1,197 @@
+"""
+Ce module compile les horaires de réception des coachs en cartes mensuelles.
+
+Les règles (plages hebdomadaires ``HoraireHebdomadaire``, exceptions datées
+``ExceptionDisponibilite``, horaires par défaut) ne sont jamais évaluées
+pendant une réservation : elles sont compilées une fois par coach et par mois,
+en deux requêtes quel que soit le nombre de coachs et de mois, puis mises en
+cache. Une carte est un tuple d'entiers, un par jour du mois, dont le bit
+``m`` vaut 1 si le coach reçoit pendant la minute ``m`` (minutes depuis minuit).
+
+Pour un jour donné :
+- les plages hebdomadaires du jour de la semaine forment les horaires de base
+  (celles de ``HORAIRES_PAR_DEFAUT`` si le coach n'a déclaré aucune plage),
+- les ouvertures exceptionnelles y sont ajoutées,
+- puis les fermetures en sont retirées (journée entière si sans heures).
+
+Les cartes sont invalidées par les signaux des deux modèles (voir
+``seances.signals``) : le mois de l'exception modifiée, ou les mois de la
+fenêtre de réservation pour une plage hebdomadaire. Ces invalidations
+n'atteignent pas les autres processus si le cache leur est propre : les cartes
+n'y sont alors conservées qu'une minute, et les vérifications faites sous
+verrou avant d'enregistrer une séance relisent les horaires en base
+(``minutes_ouvertes(..., en_base=True)``).
+
+Fonctions :
+- cartes : cartes (en cache) de plusieurs coachs et mois.
+- minutes_ouvertes : minutes de réception de plusieurs coachs et jours.
+- jours_fermes : jours sans aucune minute de réception, par coach.
+- calendrier : données du sélecteur de dates (jours fermés par coach et tous coachs confondus).
+- invalider : retire du cache les cartes de certains mois d'un coach.
+- invalider_coach : retire du cache les cartes de la fenêtre de réservation d'un coach.
+"""
+
+from calendar import monthrange
+from datetime import time, timedelta
+
+from django.core.cache import cache
+
+from core.caches import duree_cache
+
+from .models import ExceptionDisponibilite, HoraireHebdomadaire
+
+# Horaires d'un coach qui n'a déclaré aucune plage : du lundi au vendredi, de 08h00 à 20h00
+HORAIRES_PAR_DEFAUT = {jour_semaine: [(time(8, 0), time(20, 0))] for jour_semaine in range(1, 6)}
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# Mois recompilés après un changement des plages hebdomadaires (réservations jusqu'à 52 semaines)
+HORIZON_MOIS = 13
+
+# Jours proposés par le sélecteur de dates de la prise de rendez-vous
+NB_JOURS_CALENDRIER = 90
+
+
+def _cle(coach_id, mois):
+    return f"seances:horaires:{coach_id}:{mois:%Y-%m}"
+
+
+def _mois(jour):
+    return jour.replace(day=1)
+
+
+def _mois_suivant(mois):
+    return (mois + timedelta(days=32)).replace(day=1)
+
+
+def _plage(debut, fin):
+    """Bitmap des minutes ``[debut, fin)``."""
+    premiere = debut.hour * 60 + debut.minute
+    derniere = fin.hour * 60 + fin.minute
+    return ((1 << (derniere - premiere)) - 1) << premiere
+
+
+def _semaine(plages):
+    """Bitmaps par jour de la semaine (1 à 7) à partir de ``{jour_semaine: [(debut, fin)]}``."""
+    semaine = {}
+    for jour_semaine, liste in plages.items():
+        for debut, fin in liste:
+            semaine[jour_semaine] = semaine.get(jour_semaine, 0) | _plage(debut, fin)
+    return semaine
+
+
+SEMAINE_PAR_DEFAUT = _semaine(HORAIRES_PAR_DEFAUT)
+
+
+def _compiler(coach_ids, mois):
+    """Compile les cartes de ``coach_ids`` pour les ``mois`` donnés, en deux requêtes."""
+    plages = {}
+    for coach_id, jour_semaine, debut, fin in HoraireHebdomadaire.objects.filter(coach_id__in=coach_ids).values_list(
+        "coach_id", "jour_semaine", "heure_debut", "heure_fin",
+    ):
+        plages.setdefault(coach_id, {}).setdefault(jour_semaine, []).append((debut, fin))
+    semaines = {coach_id: _semaine(plages_coach) for coach_id, plages_coach in plages.items()}
+
+    exceptions = {}
+    for coach_id, jour, type_exception, debut, fin in ExceptionDisponibilite.objects.filter(
+        coach_id__in=coach_ids, date__gte=min(mois), date__lt=_mois_suivant(max(mois)),
+    ).values_list("coach_id", "date", "type", "heure_debut", "heure_fin"):
+        exceptions.setdefault((coach_id, jour), []).append((type_exception, debut, fin))
+
+    resultat = {}
+    for coach_id in coach_ids:
+        semaine = semaines.get(coach_id, SEMAINE_PAR_DEFAUT)
+        for premier in mois:
+            carte = []
+            for numero in range(monthrange(premier.year, premier.month)[1]):
+                jour = premier + timedelta(days=numero)
+                ouvert = semaine.get(jour.isoweekday(), 0)
+                # Ouvertures d'abord : une fermeture l'emporte toujours
+                for type_exception, debut, fin in sorted(
+                    exceptions.get((coach_id, jour), ()), key=lambda exception: exception[0] != ExceptionDisponibilite.OUVERTURE,
+                ):
+                    if type_exception == ExceptionDisponibilite.OUVERTURE:
+                        ouvert |= _plage(debut, fin)
+                    elif debut is None:
+                        ouvert = 0
+                    else:
+                        ouvert &= ~_plage(debut, fin)
+                carte.append(ouvert)
+            resultat[coach_id, premier] = tuple(carte)
+    return resultat
+
+
+def cartes(coach_ids, mois):
+    """
+    Retourne ``{(coach_id, mois): carte}`` ; ``mois`` contient des premiers jours de mois.
+
+    Les cartes en cache sont lues en un seul ``get_many`` ; les manquantes sont
+    compilées ensemble (deux requêtes), puis remises en cache.
+    """
+    cles = {_cle(coach_id, premier): (coach_id, premier) for coach_id in coach_ids for premier in mois}
+    resultat = {cles[cle]: carte for cle, carte in cache.get_many(list(cles)).items()}
+    manquants = [couple for couple in cles.values() if couple not in resultat]
+    if manquants:
+        compilees = _compiler({coach_id for coach_id, _ in manquants}, {premier for _, premier in manquants})
+        compilees = {couple: compilees[couple] for couple in manquants}
+        cache.set_many({_cle(*couple): carte for couple, carte in compilees.items()}, duree_cache(CACHE_TIMEOUT))
+        resultat.update(compilees)
+    return resultat
+
+
+def minutes_ouvertes(coach_ids, jours, en_base=False):
+    """
+    Retourne ``{(coach_id, jour): bitmap des minutes de réception}``, lu dans les
+    cartes en cache, ou compilé depuis la base sans passer par le cache si ``en_base``.
+    """
+    coach_ids, jours = set(coach_ids), set(jours)
+    if not coach_ids or not jours:
+        return {}
+    mois = {_mois(jour) for jour in jours}
+    resultat = _compiler(coach_ids, mois) if en_base else cartes(coach_ids, mois)
+    return {
+        (coach_id, jour): resultat[coach_id, _mois(jour)][jour.day - 1]
+        for coach_id in coach_ids for jour in jours
+    }
+
+
+def jours_fermes(coach_ids, jours):
+    """Retourne ``{coach_id: [jours sans réception]}``, dans l'ordre de ``jours``."""
+    ouvertes = minutes_ouvertes(coach_ids, jours)
+    return {coach_id: [jour for jour in jours if not ouvertes[coach_id, jour]] for coach_id in coach_ids}
+
+
+def calendrier(coach_ids, aujourd_hui, nb_jours=NB_JOURS_CALENDRIER):
+    """
+    Données du sélecteur de dates, calculées une fois depuis les cartes :
+    première et dernière date proposées, et jours fermés par coach (clé ``""`` :
+    jours où aucun coach ne reçoit).
+    """
+    jours = [aujourd_hui + timedelta(days=decalage) for decalage in range(nb_jours)]
+    fermes = jours_fermes(coach_ids, jours)
+    tous = set(jours)
+    for liste in fermes.values():
+        tous &= set(liste)
+    return {
+        "debut": jours[0].isoformat(),
+        "fin": jours[-1].isoformat(),
+        "fermes": {
+            "": [jour.isoformat() for jour in jours if jour in tous],
+            **{str(coach_id): [jour.isoformat() for jour in liste] for coach_id, liste in fermes.items()},
+        },
+    }
+
+
+def invalider(coach_id, mois):
+    """Retire du cache les cartes d'un coach pour les ``mois`` donnés."""
+    cache.delete_many([_cle(coach_id, premier) for premier in mois])
+
+
+def invalider_coach(coach_id, aujourd_hui):
+    """Retire du cache les cartes d'un coach, du mois dernier à ``HORIZON_MOIS`` mois."""
+    premier = _mois(_mois(aujourd_hui) - timedelta(days=1))
+    mois = []
+    for _ in range(HORIZON_MOIS + 2):
+        mois.append(premier)
+        premier = _mois_suivant(premier)
+    invalider(coach_id, mois)
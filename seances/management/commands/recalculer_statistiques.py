@@ -0,0 +1,23 @@
+"""
+Commande de reconstruction des tables de synthèse des statistiques.
+
+Les tables sont tenues à jour à chaque modification de séance ; la commande
+sert à les remplir après la migration qui les crée, ou après une écriture
+faite hors de l'ORM (import, ``QuerySet.update``). Elle peut aussi être
+planifiée (cron) comme filet de sécurité.
+"""
+
+from django.core.management.base import BaseCommand
+
+from seances.statistiques import recalculer_tout
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques mensuelles des coachs à partir des séances."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--coach", type=int, help="Identifiant du coach à recalculer (tous par défaut).")
+
+    def handle(self, *args, **options):
+        nombre = recalculer_tout(options["coach"])
+        self.stdout.write(self.style.SUCCESS(f"{nombre} mois recalculé(s)."))
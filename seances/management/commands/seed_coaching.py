@@ -0,0 +1,164 @@
+"""
+Commande de génération de données synthétiques réalistes.
+
+Crée des coachs, des clients et des séances en masse, par ``bulk_create`` en
+lots (une transaction par lot) : plusieurs millions de séances se génèrent
+sans charger la mémoire ni émettre de signaux. Les tables de synthèse des
+statistiques des nouveaux coachs sont recalculées à la fin.
+
+Les séances sont réparties sur les jours ouvrés, en remontant le temps depuis
+``JOURS_A_VENIR`` jours après aujourd'hui, sur une grille de créneaux
+espacés de 90 minutes (aucun chevauchement, quelle que soit la durée de
+l'objet). Chaque client est suivi par un coach principal. Statuts :
+- séances passées : ``REPARTITION_PASSEES`` (présents, absents, annulations,
+  quelques séances jamais traitées) ;
+- séances à venir : ``REPARTITION_A_VENIR`` (prévues, quelques annulations).
+
+Les utilisateurs créés s'appellent ``<prefixe>_coach_<n>`` et
+``<prefixe>_client_<n>`` et partagent le mot de passe ``--mot-de-passe``
+(haché une seule fois). Le tirage est reproductible (``--graine``).
+
+Exemple :
+    python manage.py seed_coaching --coachs 50 --clients 5000 --seances 2000000
+"""
+
+import random
+import time
+from datetime import time as heure, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from seances.models import DUREES_OBJETS, Seance
+from seances.statistiques import recalculer_tout
+
+CRENEAUX = [heure(8 + minutes // 60, minutes % 60) for minutes in range(0, 11 * 60, 90)]
+JOURS_A_VENIR = 28
+
+# code_rdv -> proportion
+REPARTITION_PASSEES = {1: 0.74, 2: 0.08, 3: 0.10, 4: 0.05, 0: 0.03}
+REPARTITION_A_VENIR = {0: 0.92, 3: 0.06, 4: 0.02}
+
+PRENOMS = ["Camille", "Louis", "Léa", "Hugo", "Chloé", "Jules", "Manon", "Arthur", "Inès", "Lucas", "Jade", "Noah"]
+NOMS = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand", "Leroy", "Moreau"]
+
+
+class Command(BaseCommand):
+    help = "Génère des coachs, des clients et des séances synthétiques pour les mesures de performance."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--coachs", type=int, default=20, help="Nombre de coachs à créer.")
+        parser.add_argument("--clients", type=int, default=2000, help="Nombre de clients à créer.")
+        parser.add_argument("--seances", type=int, default=100_000, help="Nombre de séances à créer.")
+        parser.add_argument(
+            "--remplissage", type=float, default=0.6,
+            help="Part des créneaux occupés chaque jour ouvré (entre 0 et 1).",
+        )
+        parser.add_argument("--lot", type=int, default=5000, help="Lignes par bulk_create.")
+        parser.add_argument("--graine", type=int, default=1, help="Graine du tirage aléatoire.")
+        parser.add_argument("--prefixe", default="seed", help="Préfixe des noms d'utilisateur créés.")
+        parser.add_argument("--mot-de-passe", default="motdepasse", help="Mot de passe des utilisateurs créés.")
+
+    def handle(self, *args, **options):
+        if not options["coachs"] or not options["clients"]:
+            raise CommandError("Il faut au moins un coach et un client.")
+        if not 0 < options["remplissage"] <= 1:
+            raise CommandError("--remplissage doit être compris entre 0 (exclu) et 1.")
+        User = get_user_model()
+        prefixe = options["prefixe"]
+        if User.objects.filter(username__startswith=f"{prefixe}_").exists():
+            raise CommandError(f"Des utilisateurs « {prefixe}_… » existent déjà : choisissez un autre --prefixe.")
+
+        self.rng = random.Random(options["graine"])
+        self.lot = options["lot"]
+        debut = time.perf_counter()
+
+        mot_de_passe = make_password(options["mot_de_passe"])
+        coachs = self.creer_utilisateurs(prefixe, "coach", options["coachs"], mot_de_passe)
+        clients = self.creer_utilisateurs(prefixe, "client", options["clients"], mot_de_passe)
+        self.stdout.write(f"{len(coachs)} coach(s) et {len(clients)} client(s) créés.")
+
+        # Coach principal de chaque client
+        suivis = {coach.pk: [] for coach in coachs}
+        for client in clients:
+            suivis[self.rng.choice(coachs).pk].append(client.pk)
+        tous_clients = [client.pk for client in clients]
+
+        nombre = 0
+        lot = []
+        for seance in self.generer(coachs, suivis, tous_clients, options["seances"], options["remplissage"]):
+            lot.append(seance)
+            if len(lot) == self.lot:
+                nombre += self.enregistrer(lot)
+                lot = []
+                self.stdout.write(f"\r{nombre} séance(s)…", ending="")
+                self.stdout.flush()
+        nombre += self.enregistrer(lot)
+        self.stdout.write(f"\r{nombre} séance(s) créée(s).")
+
+        mois = sum(recalculer_tout(coach.pk) for coach in coachs)
+        self.stdout.write(self.style.SUCCESS(
+            f"Terminé en {time.perf_counter() - debut:.1f} s ({mois} mois de statistiques recalculés). "
+            f"Connexion : {prefixe}_coach_1 / {prefixe}_client_1, mot de passe « {options['mot_de_passe']} »."
+        ))
+
+    def creer_utilisateurs(self, prefixe, role, nombre, mot_de_passe):
+        User = get_user_model()
+        groupe, _ = Group.objects.get_or_create(name=role)
+        utilisateurs = [
+            User(
+                username=f"{prefixe}_{role}_{numero}",
+                first_name=self.rng.choice(PRENOMS),
+                last_name=self.rng.choice(NOMS),
+                email=f"{prefixe}_{role}_{numero}@exemple.fr",
+                password=mot_de_passe,
+            )
+            for numero in range(1, nombre + 1)
+        ]
+        with transaction.atomic():
+            utilisateurs = User.objects.bulk_create(utilisateurs, batch_size=self.lot)
+            if not all(utilisateur.pk for utilisateur in utilisateurs):
+                # Bases sans RETURNING : identifiants relus
+                utilisateurs = list(User.objects.filter(username__startswith=f"{prefixe}_{role}_"))
+            User.groups.through.objects.bulk_create(
+                [User.groups.through(user_id=utilisateur.pk, group_id=groupe.pk) for utilisateur in utilisateurs],
+                batch_size=self.lot,
+            )
+        return utilisateurs
+
+    def generer(self, coachs, suivis, tous_clients, nombre, remplissage):
+        """Produit ``nombre`` séances, jour ouvré par jour ouvré en remontant le temps."""
+        aujourd_hui = timezone.localdate()
+        objets = list(DUREES_OBJETS)
+        par_jour = max(1, round(len(CRENEAUX) * remplissage))
+        jour = aujourd_hui + timedelta(days=JOURS_A_VENIR)
+        while nombre > 0:
+            if jour.weekday() < 5:
+                repartition = REPARTITION_PASSEES if jour < aujourd_hui else REPARTITION_A_VENIR
+                for coach in coachs:
+                    clients = suivis[coach.pk] or tous_clients
+                    for heure_debut in sorted(self.rng.sample(CRENEAUX, min(par_jour, nombre))):
+                        objet = self.rng.choice(objets)
+                        yield Seance(
+                            client_id=self.rng.choice(clients),
+                            coach_id=coach.pk,
+                            date=jour,
+                            heure_debut=heure_debut,
+                            objet=objet,
+                            duree=DUREES_OBJETS[objet],
+                            code_rdv=self.rng.choices(list(repartition), weights=list(repartition.values()))[0],
+                        )
+                        nombre -= 1
+                    if nombre <= 0:
+                        return
+            jour -= timedelta(days=1)
+
+    def enregistrer(self, seances):
+        # bulk_create n'émet pas de signaux : aucune invalidation de cache ni notification
+        with transaction.atomic():
+            Seance.objects.bulk_create(seances)
+        return len(seances)
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seances', '0004_seance_code_rdv_seance_message_delete_rdvhistorique'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='seance',
+            index=models.Index(fields=['coach', 'code_rdv', 'date', 'heure_debut'], name='seance_coach_code_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seance',
+            index=models.Index(fields=['coach', 'date', 'heure_debut'], name='seance_coach_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seance',
+            index=models.Index(fields=['client', 'date', 'heure_debut'], name='seance_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seance',
+            index=models.Index(condition=models.Q(('code_rdv', 0)), fields=['client', 'date', 'heure_debut'], name='seance_client_a_venir_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seances', '0005_seance_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seance',
+            name='modifie_le',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
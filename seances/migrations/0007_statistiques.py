@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seances', '0006_seance_modifie_le'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueCreneau',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField()),
+                ('jour_semaine', models.PositiveSmallIntegerField()),
+                ('heure', models.PositiveSmallIntegerField()),
+                ('nombre', models.PositiveIntegerField(default=0)),
+                ('coach', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('coach', 'mois', 'jour_semaine', 'heure'), name='statistique_creneau_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatistiqueMensuelle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField()),
+                ('non_traites', models.PositiveIntegerField(default=0)),
+                ('presents', models.PositiveIntegerField(default=0)),
+                ('absents', models.PositiveIntegerField(default=0)),
+                ('annules_client', models.PositiveIntegerField(default=0)),
+                ('annules_coach', models.PositiveIntegerField(default=0)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('coach', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('coach', 'mois', 'client'), name='statistique_coach_mois_client_uniq')],
+            },
+        ),
+    ]
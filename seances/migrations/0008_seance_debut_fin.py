@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:05
+
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Valeur de seances.models.DUREE_SEANCE lors de cette migration
+DUREE_SEANCE = timedelta(minutes=10)
+TAILLE_LOT = 1000
+
+
+def renseigner_horaires(apps, schema_editor):
+    Seance = apps.get_model("seances", "Seance")
+    lot = []
+    for seance in Seance.objects.only("id", "date", "heure_debut").iterator(chunk_size=TAILLE_LOT):
+        seance.debut = timezone.make_aware(datetime.combine(seance.date, seance.heure_debut))
+        seance.fin = seance.debut + DUREE_SEANCE
+        lot.append(seance)
+        if len(lot) == TAILLE_LOT:
+            Seance.objects.bulk_update(lot, ["debut", "fin"])
+            lot = []
+    Seance.objects.bulk_update(lot, ["debut", "fin"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seances', '0007_statistiques'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seance',
+            name='debut',
+            field=models.DateTimeField(null=True, editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='seance',
+            name='fin',
+            field=models.DateTimeField(null=True, editable=False, blank=True),
+        ),
+        migrations.RunPython(renseigner_horaires, migrations.RunPython.noop),
+    ]
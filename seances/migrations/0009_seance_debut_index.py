@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Migration distincte de 0008 : sous PostgreSQL, ALTER TABLE ne peut pas suivre
+    # les UPDATE du remplissage dans la même transaction
+
+    dependencies = [
+        ('seances', '0008_seance_debut_fin'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='seance',
+            name='debut',
+            field=models.DateTimeField(editable=False, blank=True),
+        ),
+        migrations.AlterField(
+            model_name='seance',
+            name='fin',
+            field=models.DateTimeField(editable=False, blank=True),
+        ),
+        migrations.AlterModelOptions(
+            name='seance',
+            options={'ordering': ['debut']},
+        ),
+        migrations.RemoveIndex(
+            model_name='seance',
+            name='seance_coach_code_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='seance',
+            name='seance_coach_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='seance',
+            name='seance_client_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='seance',
+            name='seance_client_a_venir_idx',
+        ),
+        migrations.AddIndex(
+            model_name='seance',
+            index=models.Index(fields=['coach', 'code_rdv', 'debut'], name='seance_coach_code_debut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seance',
+            index=models.Index(fields=['coach', 'debut'], name='seance_coach_debut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seance',
+            index=models.Index(fields=['client', 'debut'], name='seance_client_debut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seance',
+            index=models.Index(condition=models.Q(('code_rdv', 0)), fields=['client', 'debut'], name='seance_client_a_venir_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:40
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+# Valeurs de seances.models.DUREES_OBJETS lors de cette migration
+DUREES_OBJETS = {
+    "Coaching personnel": 60,
+    "Gestion du stress": 30,
+    "Développement de la confiance en soi": 90,
+}
+DUREE_PAR_DEFAUT = 60
+TAILLE_LOT = 1000
+
+
+def renseigner_durees(apps, schema_editor):
+    Seance = apps.get_model("seances", "Seance")
+    lot = []
+    for seance in Seance.objects.only("id", "objet", "debut").iterator(chunk_size=TAILLE_LOT):
+        seance.duree = DUREES_OBJETS.get(seance.objet, DUREE_PAR_DEFAUT)
+        seance.fin = seance.debut + timedelta(minutes=seance.duree)
+        lot.append(seance)
+        if len(lot) == TAILLE_LOT:
+            Seance.objects.bulk_update(lot, ["duree", "fin"])
+            lot = []
+    Seance.objects.bulk_update(lot, ["duree", "fin"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seances', '0009_seance_debut_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seance',
+            name='duree',
+            field=models.PositiveSmallIntegerField(blank=True, default=60, help_text='Durée en minutes'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(renseigner_durees, migrations.RunPython.noop),
+    ]
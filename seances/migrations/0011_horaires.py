@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seances', '0010_seance_duree'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HoraireHebdomadaire',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour_semaine', models.PositiveSmallIntegerField(choices=[(1, 'Lundi'), (2, 'Mardi'), (3, 'Mercredi'), (4, 'Jeudi'), (5, 'Vendredi'), (6, 'Samedi'), (7, 'Dimanche')])),
+                ('heure_debut', models.TimeField()),
+                ('heure_fin', models.TimeField()),
+                ('coach', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horaires', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['coach', 'jour_semaine', 'heure_debut'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExceptionDisponibilite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('type', models.CharField(choices=[('fermeture', 'Fermeture'), ('ouverture', 'Ouverture exceptionnelle')], default='fermeture', max_length=10)),
+                ('heure_debut', models.TimeField(blank=True, null=True)),
+                ('heure_fin', models.TimeField(blank=True, null=True)),
+                ('motif', models.CharField(blank=True, max_length=255)),
+                ('coach', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions_disponibilite', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['coach', 'date', 'heure_debut'],
+                'indexes': [models.Index(fields=['coach', 'date'], name='exception_coach_date_idx')],
+            },
+        ),
+    ]
@@ -1,7 +1,90 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from datetime import time
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+
+# Durée (en minutes) d'une séance selon son objet : choix proposés à la réservation
+DUREES_OBJETS = {
+    "Coaching personnel": 60,
+    "Gestion du stress": 30,
+    "Développement de la confiance en soi": 90,
+}
+DUREE_PAR_DEFAUT = 60
+
+
+def duree_objet(objet):
+    """Durée en minutes d'une séance ayant cet objet."""
+    return DUREES_OBJETS.get(objet, DUREE_PAR_DEFAUT)
+
+
+def horodatage(jour, heure):
+    """Date et heure locales (fuseau TIME_ZONE) combinées en datetime aware."""
+    return timezone.make_aware(datetime.combine(jour, heure))
+
+
+def debut_jour(jour):
+    """Minuit (heure locale) du jour donné, en datetime aware : borne des plages sur ``debut``."""
+    return horodatage(jour, time.min)
+
+
+class SeanceQuerySet(models.QuerySet):
+    """
+    Requêtes nommées sur les séances, utilisées par les vues.
+
+    Les requêtes destinées aux pages coach joignent le client (select_related)
+    pour que l'affichage de son nom ne déclenche pas une requête par ligne.
+
+    Les fenêtres de temps sont des plages simples sur ``debut`` (datetime
+    aware), servies chacune par un index (coach ou client, debut) : ni union
+    date / heure, ni ``OR`` sur deux colonnes.
+
+    Méthodes :
+    - today_for_coach() : séances non traitées du jour pour un coach
+    - upcoming_for_coach() : séances non traitées à partir d'une date pour un coach
+    - for_coach_history() : séances traitées jusqu'à aujourd'hui pour un coach
+    - forgotten_for_coach() : séances passées restées non traitées pour un coach
+    - upcoming_for_client() : prochaines séances non traitées d'un client
+    - history_for_client() : séances passées d'un client
+    - bulk_create() : renseigne ``debut`` et ``fin`` avant l'insertion
+    """
+
+    def with_client(self):
+        return self.select_related("client")
+
+    def today_for_coach(self, coach, today):
+        return (
+            self.with_client()
+            .filter(coach=coach, code_rdv=0, debut__gte=debut_jour(today), debut__lt=debut_jour(today + timedelta(days=1)))
+            .order_by("debut")
+        )
+
+    def upcoming_for_coach(self, coach, start):
+        return self.with_client().filter(coach=coach, code_rdv=0, debut__gte=debut_jour(start)).order_by("debut")
+
+    def for_coach_history(self, coach, today):
+        return (
+            self.with_client()
+            .filter(coach=coach, debut__lt=debut_jour(today + timedelta(days=1)))
+            .exclude(code_rdv=0)
+            .order_by("-debut")
+        )
+
+    def forgotten_for_coach(self, coach, today):
+        return self.with_client().filter(coach=coach, code_rdv=0, debut__lt=debut_jour(today)).order_by("-debut")
+
+    def upcoming_for_client(self, client, moment):
+        return self.filter(client=client, code_rdv=0, debut__gt=moment).order_by("debut")
+
+    def history_for_client(self, client, moment):
+        return self.filter(client=client, debut__lt=moment).order_by("-debut")
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create n'appelle pas save()
+        objs = list(objs)
+        for seance in objs:
+            seance.calculer_horaires()
+        return super().bulk_create(objs, *args, **kwargs)
 
 
 class Seance(models.Model):
@@ -16,10 +99,19 @@ class Seance(models.Model):
     - objet : sujet de la séance
     - code_rdv : statut du rendez-vous (1 = présent, 2 = absent, 3 = annulé client, 4 = annulé coach, 0 = non traité)
     - message : champ libre visible uniquement par le coach (remarques ou bilan)
+    - modifie_le : date de dernière modification (ETag de l'agenda iCalendar) ;
+      à renseigner explicitement dans les ``bulk_update``
+    - duree : durée en minutes (par défaut, celle de l'objet : voir ``DUREES_OBJETS``)
+    - debut, fin : début et fin de la séance en datetime aware, déduits de
+      ``date``, ``heure_debut`` et ``duree`` à chaque enregistrement (colonnes des requêtes par plage)
 
     Méthodes :
     - __str__() : représentation en texte de la séance
-    - clean() : valide l'heure
+    - from_db() : mémorise le créneau lu en base (``_creneau_initial``, ``_jour_initial``)
+    - clean() : vérifie que la séance se termine le jour même et, pour un créneau
+      nouveau ou modifié, qu'elle se déroule pendant les horaires de réception du coach
+    - calculer_horaires() : renseigne ``duree`` (si vide), ``debut`` et ``fin``
+    - save() : enregistre la séance après ``calculer_horaires()``
     """
 
     CODE_CHOIX = [
@@ -37,14 +129,212 @@ class Seance(models.Model):
     objet = models.CharField(max_length=255)
     code_rdv = models.IntegerField(choices=CODE_CHOIX, default=0)
     message = models.TextField(blank=True, null=True)
+    modifie_le = models.DateTimeField(auto_now=True)
+    duree = models.PositiveSmallIntegerField(blank=True, help_text="Durée en minutes")
+    debut = models.DateTimeField(editable=False, blank=True)
+    fin = models.DateTimeField(editable=False, blank=True)
+
+    objects = SeanceQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Créneau d'origine, lu sans charger les champs différés : le jour sert à
+        # invalider aussi l'ancien jour d'une séance déplacée (voir seances.signals)
+        instance._creneau_initial = tuple(
+            instance.__dict__.get(champ) for champ in ("coach_id", "date", "heure_debut", "duree")
+        )
+        instance._jour_initial = instance._creneau_initial[:2]
+        return instance
 
     def __str__(self):
         return f"Rdv avec {self.client.username} avec {self.coach.username} le {self.date} à {self.heure_debut}"
 
     def clean(self):
-        if self.heure_debut < time(8, 0) or self.heure_debut > time(20, 0):
-            raise ValidationError("Les rendez-vous doivent être pris entre 08h00 et 20h00.")
+        duree = self.duree if self.duree is not None else duree_objet(self.objet)
+        debut = self.heure_debut.hour * 60 + self.heure_debut.minute
+        if debut + duree > 24 * 60:
+            raise ValidationError("La séance doit se terminer le jour même.")
+
+        # Horaires de réception du coach, relus en base (pas dans les cartes en cache) ;
+        # une séance existante dont le créneau ne change pas n'est pas revérifiée
+        creneau = (self.coach_id, self.date, self.heure_debut, duree)
+        if None not in creneau and creneau != getattr(self, "_creneau_initial", None):
+            from .horaires import minutes_ouvertes  # seances.horaires importe ce module
+
+            ouvert = minutes_ouvertes([self.coach_id], [self.date], en_base=True)[self.coach_id, self.date]
+            masque = ((1 << duree) - 1) << debut
+            if ouvert & masque != masque:
+                raise ValidationError("Le coach ne reçoit pas sur ce créneau.")
+
+    def calculer_horaires(self):
+        if self.duree is None:
+            self.duree = duree_objet(self.objet)
+        self.debut = horodatage(self.date, self.heure_debut)
+        self.fin = self.debut + timedelta(minutes=self.duree)
+
+    def save(self, *args, **kwargs):
+        self.calculer_horaires()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"date", "heure_debut", "duree"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "debut", "fin"}
+        super().save(*args, **kwargs)
 
     class Meta:
         unique_together = ("date", "heure_debut", "coach")
-        ordering = ["date", "heure_debut"]
+        ordering = ["debut"]
+        indexes = [
+            # Séances du jour, futures et oubliées d'un coach (filtre sur code_rdv)
+            models.Index(fields=["coach", "code_rdv", "debut"], name="seance_coach_code_debut_idx"),
+            # Historique d'un coach, bitmaps de disponibilités et statistiques
+            models.Index(fields=["coach", "debut"], name="seance_coach_debut_idx"),
+            # Historique d'un client
+            models.Index(fields=["client", "debut"], name="seance_client_debut_idx"),
+            # Prochaines séances d'un client : seules les séances non traitées sont indexées
+            models.Index(
+                fields=["client", "debut"],
+                condition=models.Q(code_rdv=0),
+                name="seance_client_a_venir_idx",
+            ),
+        ]
+
+
+class StatistiqueMensuelle(models.Model):
+    """
+    Table de synthèse : nombre de séances d'un client avec un coach sur un mois,
+    par statut. Tenue à jour par ``seances.statistiques``.
+
+    Attributs :
+    - coach, client : utilisateurs concernés
+    - mois : premier jour du mois
+    - non_traites, presents, absents, annules_client, annules_coach : compteurs par statut
+    """
+
+    coach = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    client = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    mois = models.DateField()
+    non_traites = models.PositiveIntegerField(default=0)
+    presents = models.PositiveIntegerField(default=0)
+    absents = models.PositiveIntegerField(default=0)
+    annules_client = models.PositiveIntegerField(default=0)
+    annules_coach = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["coach", "mois", "client"], name="statistique_coach_mois_client_uniq"),
+        ]
+
+
+class StatistiqueCreneau(models.Model):
+    """
+    Table de synthèse : nombre de séances maintenues (non annulées) d'un coach
+    par mois, jour de la semaine et heure de début.
+
+    Attributs :
+    - coach : utilisateur coach
+    - mois : premier jour du mois
+    - jour_semaine : 1 = lundi … 7 = dimanche (ISO 8601)
+    - heure : heure de début (0 à 23)
+    - nombre : nombre de séances
+    """
+
+    coach = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    mois = models.DateField()
+    jour_semaine = models.PositiveSmallIntegerField()
+    heure = models.PositiveSmallIntegerField()
+    nombre = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["coach", "mois", "jour_semaine", "heure"], name="statistique_creneau_uniq",
+            ),
+        ]
+
+
+class HoraireHebdomadaire(models.Model):
+    """
+    Plage de réception habituelle d'un coach, répétée chaque semaine
+    (plusieurs plages par jour pour une pause déjeuner).
+
+    Un coach sans aucune plage reçoit du lundi au vendredi, de 08h00 à 20h00
+    (voir ``seances.horaires``).
+
+    Attributs :
+    - coach : utilisateur coach
+    - jour_semaine : 1 = lundi … 7 = dimanche (ISO 8601)
+    - heure_debut, heure_fin : plage de réception ; une séance doit s'y dérouler entièrement
+    """
+
+    JOURS = [
+        (1, "Lundi"), (2, "Mardi"), (3, "Mercredi"), (4, "Jeudi"),
+        (5, "Vendredi"), (6, "Samedi"), (7, "Dimanche"),
+    ]
+
+    coach = models.ForeignKey(User, on_delete=models.CASCADE, related_name="horaires")
+    jour_semaine = models.PositiveSmallIntegerField(choices=JOURS)
+    heure_debut = models.TimeField()
+    heure_fin = models.TimeField()
+
+    def __str__(self):
+        return f"{self.get_jour_semaine_display()} {self.heure_debut:%H:%M}-{self.heure_fin:%H:%M}"
+
+    def clean(self):
+        if self.heure_debut is not None and self.heure_fin is not None and self.heure_fin <= self.heure_debut:
+            raise ValidationError("L'heure de fin doit suivre l'heure de début.")
+
+    class Meta:
+        ordering = ["coach", "jour_semaine", "heure_debut"]
+
+
+class ExceptionDisponibilite(models.Model):
+    """
+    Exception datée aux horaires hebdomadaires d'un coach.
+
+    - fermeture sans heures : le coach ne reçoit pas de la journée (congés, jour férié)
+    - fermeture avec heures : la plage est retirée des horaires du jour
+    - ouverture (heures obligatoires) : la plage est ajoutée aux horaires du jour
+
+    Attributs :
+    - coach : utilisateur coach
+    - date : jour concerné
+    - type : fermeture ou ouverture
+    - heure_debut, heure_fin : plage concernée (vides : journée entière)
+    - motif : texte libre
+    """
+
+    FERMETURE = "fermeture"
+    OUVERTURE = "ouverture"
+    TYPES = [(FERMETURE, "Fermeture"), (OUVERTURE, "Ouverture exceptionnelle")]
+
+    coach = models.ForeignKey(User, on_delete=models.CASCADE, related_name="exceptions_disponibilite")
+    date = models.DateField()
+    type = models.CharField(max_length=10, choices=TYPES, default=FERMETURE)
+    heure_debut = models.TimeField(null=True, blank=True)
+    heure_fin = models.TimeField(null=True, blank=True)
+    motif = models.CharField(max_length=255, blank=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Jour d'origine, pour invalider aussi l'ancien mois d'une exception déplacée (voir seances.signals)
+        instance._jour_initial = (instance.__dict__.get("coach_id"), instance.__dict__.get("date"))
+        return instance
+
+    def __str__(self):
+        plage = f" {self.heure_debut:%H:%M}-{self.heure_fin:%H:%M}" if self.heure_debut else ""
+        return f"{self.get_type_display()} le {self.date}{plage}"
+
+    def clean(self):
+        if (self.heure_debut is None) != (self.heure_fin is None):
+            raise ValidationError("Indiquez les deux heures de la plage, ou aucune pour la journée entière.")
+        if self.heure_debut is None and self.type == self.OUVERTURE:
+            raise ValidationError("Une ouverture exceptionnelle doit préciser sa plage horaire.")
+        if self.heure_debut is not None and self.heure_fin <= self.heure_debut:
+            raise ValidationError("L'heure de fin doit suivre l'heure de début.")
+
+    class Meta:
+        ordering = ["coach", "date", "heure_debut"]
+        indexes = [
+            models.Index(fields=["coach", "date"], name="exception_coach_date_idx"),
+        ]
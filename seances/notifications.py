@@ -0,0 +1,101 @@
+"""
+Ce module envoie les e-mails liés aux séances, en tâches de fond.
+
+Les vues et formulaires ne font qu'enregistrer les tâches (``notifier_*``),
+dans la transaction qui modifie les séances ; l'envoi est fait par la commande
+``manage.py worker`` avec le backend e-mail configuré (console ou fichiers en
+local). Chaque tâche relit la séance au moment de l'envoi : un rappel n'est pas
+envoyé pour une séance annulée ou déplacée entre-temps.
+
+Fonctions :
+- notifier_reservation : planifie la confirmation et les rappels de séances réservées.
+- notifier_statut : planifie l'avis de changement de statut d'une séance.
+- notifier_statuts : planifie, en une requête, les avis de plusieurs séances.
+- envoyer_confirmation, envoyer_rappel, envoyer_statut : tâches d'envoi.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core.taches import planifier_plusieurs, tache
+
+from .models import Seance
+
+# Heure d'envoi du rappel, la veille de la séance
+HEURE_RAPPEL = time(18, 0)
+
+SUJETS_STATUT = {
+    1: "Séance terminée",
+    2: "Absence à votre séance",
+    3: "Séance annulée par le client",
+    4: "Séance annulée par le coach",
+}
+
+
+def _envoyer(destinataire, sujet, gabarit, contexte):
+    if not destinataire.email:
+        return
+    corps = render_to_string(f"seances/emails/{gabarit}.txt", {"destinataire": destinataire, **contexte})
+    send_mail(f"DupontIpsum – {sujet}", corps, None, [destinataire.email])
+
+
+def _seances(ids):
+    return list(Seance.objects.select_related("client", "coach").filter(pk__in=ids).order_by("date", "heure_debut"))
+
+
+@tache
+def envoyer_confirmation(seance_ids):
+    """Confirme une réservation (ou une série) au client et au coach."""
+    seances = [seance for seance in _seances(seance_ids) if seance.code_rdv == 0]
+    if not seances:
+        return
+    premiere = seances[0]
+    sujet = "Séance réservée" if len(seances) == 1 else f"{len(seances)} séances réservées"
+    _envoyer(premiere.client, sujet, "confirmation", {"seances": seances, "autre": premiere.coach})
+    _envoyer(premiere.coach, sujet, "confirmation", {"seances": seances, "autre": premiere.client})
+
+
+@tache
+def envoyer_rappel(seance_id, date, heure):
+    """Rappelle au client sa séance du lendemain, si elle a toujours lieu à la même heure."""
+    seance = next(iter(_seances([seance_id])), None)
+    if seance is None or seance.code_rdv != 0 or (seance.date.isoformat(), f"{seance.heure_debut:%H:%M}") != (date, heure):
+        return
+    _envoyer(seance.client, "Rappel de votre séance de demain", "rappel", {"seance": seance})
+
+
+@tache
+def envoyer_statut(seance_id):
+    """Prévient l'autre partie d'une annulation, ou le client d'une absence ou de la fin d'une séance."""
+    seance = next(iter(_seances([seance_id])), None)
+    if seance is None or seance.code_rdv not in SUJETS_STATUT:
+        return
+    destinataire = seance.coach if seance.code_rdv == 3 else seance.client
+    _envoyer(destinataire, SUJETS_STATUT[seance.code_rdv], "statut", {"seance": seance})
+
+
+def notifier_reservation(seances):
+    """
+    Planifie, en une requête, la confirmation des séances réservées ensemble et
+    un rappel la veille de chacune (sauf si la veille est déjà passée).
+    """
+    maintenant = timezone.now()
+    executions = [(envoyer_confirmation, {"seance_ids": [seance.pk for seance in seances]}, None)]
+    for seance in seances:
+        veille = timezone.make_aware(datetime.combine(seance.date - timedelta(days=1), HEURE_RAPPEL))
+        if veille > maintenant:
+            arguments = {"seance_id": seance.pk, "date": seance.date.isoformat(), "heure": f"{seance.heure_debut:%H:%M}"}
+            executions.append((envoyer_rappel, arguments, veille))
+    planifier_plusieurs(executions)
+
+
+def notifier_statut(seance):
+    envoyer_statut.planifier(seance_id=seance.pk)
+
+
+def notifier_statuts(seances):
+    """Planifie en une requête l'avis de changement de statut de chaque séance."""
+    planifier_plusieurs([(envoyer_statut, {"seance_id": seance.pk}, None) for seance in seances])
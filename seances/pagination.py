@@ -0,0 +1,73 @@
+"""
+Ce module implémente une pagination par curseur (keyset) pour les historiques.
+
+Au lieu d'un OFFSET, chaque page reprend après la dernière séance affichée,
+identifiée par le couple (debut, id). Le coût d'une page ne dépend
+donc pas de l'ancienneté du compte.
+
+Fonctions :
+- encoder_curseur : transforme une séance en curseur texte.
+- decoder_curseur : retrouve le couple (debut, id) d'un curseur.
+- page_keyset : retourne une page de séances et le curseur de la page suivante.
+- apage_keyset : version asynchrone de ``page_keyset``.
+"""
+
+from datetime import datetime, timezone
+
+from django.db.models import Q
+
+TAILLE_PAGE = 50
+
+
+def encoder_curseur(seance):
+    return f"{int(seance.debut.timestamp())}_{seance.pk}"
+
+
+def decoder_curseur(curseur):
+    """
+    Décode un curseur produit par ``encoder_curseur``.
+
+    Lève ValueError si le curseur est mal formé.
+    """
+    horodatage, pk = curseur.split("_")
+    try:
+        debut = datetime.fromtimestamp(int(horodatage), tz=timezone.utc)
+    except (OverflowError, OSError) as exc:
+        raise ValueError(curseur) from exc
+    return debut, int(pk)
+
+
+def _page(queryset, curseur, taille):
+    queryset = queryset.order_by("-debut", "-id")
+    if curseur:
+        debut, pk = decoder_curseur(curseur)
+        # La plage debut <= curseur est parcourue dans l'index ; le OR ne départage que les ex aequo
+        queryset = queryset.filter(debut__lte=debut).filter(Q(debut__lt=debut) | Q(id__lt=pk))
+    # Une ligne de plus pour savoir s'il reste une page à charger
+    return queryset[:taille + 1]
+
+
+def _decouper(seances, taille):
+    if len(seances) > taille:
+        seances = seances[:taille]
+        return seances, encoder_curseur(seances[-1])
+    return seances, None
+
+
+def page_keyset(queryset, curseur=None, taille=TAILLE_PAGE):
+    """
+    Retourne ``(seances, curseur_suivant)`` pour un queryset trié du plus récent
+    au plus ancien. ``curseur_suivant`` vaut None sur la dernière page.
+
+    Paramètres :
+    - queryset : séances à paginer
+    - curseur : curseur de la dernière séance de la page précédente (ou None)
+    - taille : nombre de séances par page
+
+    Lève ValueError si le curseur est mal formé.
+    """
+    return _decouper(list(_page(queryset, curseur, taille)), taille)
+
+
+async def apage_keyset(queryset, curseur=None, taille=TAILLE_PAGE):
+    return _decouper([seance async for seance in _page(queryset, curseur, taille)], taille)
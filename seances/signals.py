@@ -0,0 +1,86 @@
+"""
+Ce module maintient les données dérivées des séances à jour.
+
+Chaque enregistrement ou suppression d'une séance reconstruit l'occupation
+du coach pour le jour concerné (et pour l'ancien jour si la
+séance a été déplacée), invalide les fragments HTML en cache du coach, et
+recalcule ses statistiques du mois une fois la transaction validée.
+
+Chaque modification des horaires d'un coach invalide ses cartes d'horaires
+compilées (voir ``seances.horaires``) : le mois de l'exception (et son ancien
+mois si elle a été déplacée), ou toute la fenêtre de réservation pour une
+plage hebdomadaire.
+"""
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import disponibilites, fragments, horaires, statistiques
+from .models import ExceptionDisponibilite, HoraireHebdomadaire, Seance
+
+
+def _jours_concernes(instance):
+    jours = {(instance.coach_id, instance.date)}
+    # Instantané pris par Seance.from_db (absent pour une nouvelle séance) ; un champ
+    # différé à la lecture (``only``/``defer``) est pris à sa valeur actuelle
+    initial = getattr(instance, "_jour_initial", None)
+    if initial:
+        coach_id, jour = initial
+        jours.add((coach_id or instance.coach_id, jour or instance.date))
+    return jours
+
+
+def seances_modifiees(instances):
+    """
+    Met à jour les données dérivées après modification de séances.
+
+    Appelée par les signaux pour un enregistrement unitaire, et directement
+    après un ``bulk_update``/``bulk_create``, qui n'émettent pas de signaux.
+    """
+    jours = set()
+    for instance in instances:
+        jours |= _jours_concernes(instance)
+        instance._jour_initial = (instance.coach_id, instance.date)
+
+    # Invalidation immédiate, puis reconstruction une fois la transaction validée
+    # (une lecture concurrente avant le commit a pu remettre l'ancien état en cache)
+    disponibilites.invalider_jours(jours)
+    transaction.on_commit(partial(disponibilites.reconstruire_jours, jours))
+    for coach_id in {coach_id for coach_id, _ in jours}:
+        fragments.invalider_coach(coach_id)
+        transaction.on_commit(partial(fragments.invalider_coach, coach_id))
+        mois = {statistiques.debut_mois(jour) for coach, jour in jours if coach == coach_id}
+        transaction.on_commit(partial(statistiques.recalculer_mois, coach_id, mois))
+
+
+@receiver(post_save, sender=Seance)
+@receiver(post_delete, sender=Seance)
+def seance_modifiee(sender, instance, **kwargs):
+    seances_modifiees([instance])
+
+
+@receiver(post_save, sender=HoraireHebdomadaire)
+@receiver(post_delete, sender=HoraireHebdomadaire)
+def horaire_modifie(sender, instance, **kwargs):
+    # Invalidation immédiate, puis de nouveau après validation (comme pour les séances)
+    horaires.invalider_coach(instance.coach_id, timezone.localdate())
+    transaction.on_commit(partial(horaires.invalider_coach, instance.coach_id, timezone.localdate()))
+
+
+@receiver(post_save, sender=ExceptionDisponibilite)
+@receiver(post_delete, sender=ExceptionDisponibilite)
+def exception_modifiee(sender, instance, **kwargs):
+    mois = {}
+    # Instantané pris par ExceptionDisponibilite.from_db (absent pour une nouvelle exception)
+    initial = getattr(instance, "_jour_initial", (None, None))
+    for coach_id, jour in {(instance.coach_id, instance.date), initial}:
+        if coach_id is not None and jour is not None:
+            mois.setdefault(coach_id, set()).add(jour.replace(day=1))
+    instance._jour_initial = (instance.coach_id, instance.date)
+    for coach_id, premiers in mois.items():
+        horaires.invalider(coach_id, premiers)
+        transaction.on_commit(partial(horaires.invalider, coach_id, premiers))
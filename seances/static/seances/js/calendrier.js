@@ -0,0 +1,20 @@
+// Options Flatpickr communes : jours proposés et jours fermés du coach choisi
+// (données compilées côté serveur et incluses dans la page, sans requête)
+function optionsCalendrier(coachChoisi) {
+  const donnees = JSON.parse(document.getElementById("calendrier").textContent);
+  const fermes = {};
+  for (const [coach, jours] of Object.entries(donnees.fermes)) {
+    fermes[coach] = new Set(jours);
+  }
+  return {
+    minDate: new Date(donnees.debut + "T00:00"),
+    maxDate: new Date(donnees.fin + "T00:00"),
+    disable: [
+      function (date) {
+        // Clé "" : jours où aucun coach ne reçoit (« premier coach disponible »)
+        const jours = fermes[coachChoisi()] || fermes[""];
+        return jours.has(flatpickr.formatDate(date, "Y-m-d"));
+      }
+    ]
+  };
+}
@@ -0,0 +1,27 @@
+// Chargement progressif des historiques : la ligne ".js-page-suivante" porte
+// l'URL de la page suivante et est remplacée par les lignes reçues dès qu'elle
+// devient visible.
+document.addEventListener('DOMContentLoaded', () => {
+  const observer = new IntersectionObserver((entries) => {
+    entries.forEach((entry) => {
+      if (!entry.isIntersecting) {
+        return;
+      }
+      const sentinelle = entry.target;
+      observer.unobserve(sentinelle);
+      fetch(sentinelle.dataset.url, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+        .then((response) => response.text())
+        .then((html) => {
+          const tbody = document.createElement('tbody');
+          tbody.innerHTML = html;
+          const suivante = tbody.querySelector('.js-page-suivante');
+          sentinelle.replaceWith(...tbody.children);
+          if (suivante) {
+            observer.observe(suivante);
+          }
+        });
+    });
+  });
+
+  document.querySelectorAll('.js-page-suivante').forEach((sentinelle) => observer.observe(sentinelle));
+});
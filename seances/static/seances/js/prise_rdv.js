@@ -0,0 +1,82 @@
+// Initialisation de Flatpickr et affichage des créneaux libres des coachs
+const plagesLibres = document.getElementById("plagesLibres");
+const premierCreneau = document.getElementById("premierCreneau");
+const choisirPremierCreneau = document.getElementById("choisirPremierCreneau");
+const champCoach = document.querySelector("select[name='coach']");
+const champObjet = document.querySelector("select[name='objet']");
+
+// Paramètres &coach=… (vide pour « premier coach disponible ») et &objet=… (durée de la séance)
+function parametreCoach() {
+  const coach = champCoach && champCoach.value ? "&coach=" + champCoach.value : "";
+  return coach + (champObjet ? "&objet=" + encodeURIComponent(champObjet.value) : "");
+}
+
+// Affiche les plages libres pour la date choisie (du coach choisi, ou de l'ensemble des coachs)
+function afficherDisponibilites(selectedDates, dateStr, instance) {
+  if (!selectedDates.length) {
+    plagesLibres.textContent = "";
+    return;
+  }
+  const jour = instance.formatDate(selectedDates[0], "Y-m-d");
+  fetch(plagesLibres.dataset.url + "?date=" + jour + parametreCoach())
+    .then((response) => response.json())
+    .then((data) => {
+      if (!data.plages || !data.plages.length) {
+        plagesLibres.textContent = "Aucun créneau disponible ce jour-là.";
+        return;
+      }
+      plagesLibres.textContent = "Créneaux disponibles : " + data.plages
+        .map((plage) => plage[0] === plage[1] ? plage[0] : plage[0] + " – " + plage[1])
+        .join(", ");
+    });
+}
+
+// Affiche le premier créneau libre et propose de remplir le formulaire avec
+function afficherPremierCreneau() {
+  fetch(premierCreneau.dataset.url + "?" + parametreCoach().slice(1))
+    .then((response) => response.json())
+    .then((data) => {
+      if (data.erreur) {
+        premierCreneau.textContent = data.erreur;
+        choisirPremierCreneau.hidden = true;
+        return;
+      }
+      const jour = new Date(data.date + "T00:00").toLocaleDateString("fr-FR", { weekday: "long", day: "numeric", month: "long" });
+      premierCreneau.textContent = "Premier créneau libre : " + jour + " à " + data.heure + " avec " + data.nom + ".";
+      choisirPremierCreneau.hidden = false;
+      choisirPremierCreneau.onclick = () => {
+        if (champCoach) {
+          champCoach.value = data.coach;
+        }
+        heure.setDate(data.heure, true, "H:i");
+        calendrier.setDate(data.date, true, "Y-m-d");
+      };
+    });
+}
+
+const calendrier = flatpickr("input[type='date']", {
+  dateFormat: "d/m/Y",
+  locale: "fr",
+  ...optionsCalendrier(() => champCoach ? champCoach.value : ""),
+  onChange: afficherDisponibilites,
+  onReady: afficherDisponibilites
+});
+const heure = flatpickr("input[type='time']", {
+  enableTime: true,
+  noCalendar: true,
+  dateFormat: "H:i",
+  time_24hr: true,
+  defaultHour: 8,   // Heure par défaut : 10h
+  defaultMinute: 0 // Minute par défaut : 30
+});
+
+for (const champ of [champCoach, champObjet]) {
+  if (champ) {
+    champ.addEventListener("change", () => {
+      calendrier.redraw();
+      afficherDisponibilites(calendrier.selectedDates, "", calendrier);
+      afficherPremierCreneau();
+    });
+  }
+}
+afficherPremierCreneau();
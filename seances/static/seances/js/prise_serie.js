@@ -0,0 +1,16 @@
+// Initialisation de Flatpickr pour la première séance de la série
+const champCoach = document.querySelector("select[name='coach']");
+const calendrier = flatpickr("input[type='date']", {
+  dateFormat: "d/m/Y",
+  locale: "fr",
+  ...optionsCalendrier(() => champCoach.value)
+});
+champCoach.addEventListener("change", () => calendrier.redraw());
+flatpickr("input[type='time']", {
+  enableTime: true,
+  noCalendar: true,
+  dateFormat: "H:i",
+  time_24hr: true,
+  defaultHour: 8,
+  defaultMinute: 0
+});
@@ -0,0 +1,209 @@
+"""
+Ce module tient à jour les statistiques de présence des coachs.
+
+Les pages de statistiques ne lisent jamais la table des séances : elles
+agrègent deux tables de synthèse (``StatistiqueMensuelle`` et
+``StatistiqueCreneau``), dont la taille dépend du nombre de clients et de mois,
+pas du nombre de séances.
+
+Une modification de séance recalcule uniquement les mois concernés du coach,
+une fois la transaction validée (voir ``seances.signals``) : une requête
+d'agrégat par table sur ces mois d'un seul coach, servie par l'index
+(coach, debut). La commande ``recalculer_statistiques`` reconstruit
+l'ensemble (après une migration ou un import de données).
+
+Définition des taux, sur les séances traitées :
+- présence : présents / (présents + absents)
+- absence : absents / (présents + absents)
+- annulation : annulées (client ou coach) / séances traitées
+
+Fonctions :
+- debut_mois : premier jour du mois d'une date.
+- recalculer_mois : recalcule les tables de synthèse d'un coach pour des mois donnés.
+- recalculer_tout : recalcule les tables de synthèse de tous les mois (ou d'un coach).
+- statistiques_coach : statistiques par mois, par client et créneaux les plus chargés.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+from .disponibilites import CODES_ANNULES
+from .models import Seance, StatistiqueCreneau, StatistiqueMensuelle, debut_jour
+
+# Statut -> compteur de StatistiqueMensuelle
+COMPTEURS = {
+    0: "non_traites",
+    1: "presents",
+    2: "absents",
+    3: "annules_client",
+    4: "annules_coach",
+}
+
+JOURS_SEMAINE = {1: "Lundi", 2: "Mardi", 3: "Mercredi", 4: "Jeudi", 5: "Vendredi", 6: "Samedi", 7: "Dimanche"}
+
+NB_MOIS = 12
+NB_CRENEAUX = 5
+
+
+def debut_mois(jour):
+    return jour.replace(day=1)
+
+
+def _mois_suivant(mois):
+    return (mois + timedelta(days=32)).replace(day=1)
+
+
+def _mois_precedent(mois, nombre):
+    for _ in range(nombre):
+        mois = (mois - timedelta(days=1)).replace(day=1)
+    return mois
+
+
+def recalculer_mois(coach_id, mois):
+    """
+    Recalcule les lignes de synthèse d'un coach pour les mois donnés
+    (premiers jours de mois), quel qu'en soit le nombre, en un nombre fixe de requêtes.
+
+    Les lignes sont écrites par upsert : deux recalculs concurrents du même mois
+    ne se heurtent pas à la contrainte d'unicité.
+    """
+    mois = set(mois)
+    if not mois:
+        return
+    seances = (
+        Seance.objects.filter(
+            coach_id=coach_id, debut__gte=debut_jour(min(mois)), debut__lt=debut_jour(_mois_suivant(max(mois))),
+        )
+        .annotate(mois=TruncMonth("date"))
+        .filter(mois__in=mois)
+        .order_by()
+    )
+
+    par_client = {}
+    for mois_seance, client_id, code_rdv, nombre in (
+        seances.values_list("mois", "client_id", "code_rdv").annotate(nombre=Count("id"))
+    ):
+        compteurs = par_client.setdefault((mois_seance, client_id), dict.fromkeys(COMPTEURS.values(), 0))
+        compteurs[COMPTEURS[code_rdv]] = nombre
+
+    creneaux = (
+        seances.exclude(code_rdv__in=CODES_ANNULES)
+        .values_list("mois", "date__iso_week_day", "heure_debut__hour")
+        .annotate(nombre=Count("id"))
+    )
+    creneaux = {(mois_seance, jour_semaine, heure): nombre for mois_seance, jour_semaine, heure, nombre in creneaux}
+
+    with transaction.atomic():
+        lignes = StatistiqueMensuelle.objects.filter(coach_id=coach_id, mois__in=mois)
+        lignes.filter(id__in=[
+            pk for pk, mois_ligne, client_id in lignes.values_list("id", "mois", "client_id")
+            if (mois_ligne, client_id) not in par_client
+        ]).delete()
+        StatistiqueMensuelle.objects.bulk_create(
+            [
+                StatistiqueMensuelle(coach_id=coach_id, mois=mois_ligne, client_id=client_id, **compteurs)
+                for (mois_ligne, client_id), compteurs in par_client.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["coach", "mois", "client"],
+            update_fields=list(COMPTEURS.values()),
+        )
+
+        anciens = StatistiqueCreneau.objects.filter(coach_id=coach_id, mois__in=mois)
+        anciens.filter(id__in=[
+            pk for pk, *cle in anciens.values_list("id", "mois", "jour_semaine", "heure")
+            if tuple(cle) not in creneaux
+        ]).delete()
+        StatistiqueCreneau.objects.bulk_create(
+            [
+                StatistiqueCreneau(coach_id=coach_id, mois=mois_ligne, jour_semaine=jour_semaine, heure=heure, nombre=nombre)
+                for (mois_ligne, jour_semaine, heure), nombre in creneaux.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["coach", "mois", "jour_semaine", "heure"],
+            update_fields=["nombre"],
+        )
+
+
+def recalculer_tout(coach_id=None):
+    """
+    Recalcule toutes les lignes de synthèse, mois par mois.
+
+    Retourne le nombre de couples (coach, mois) recalculés.
+    """
+    seances = Seance.objects.order_by()
+    lignes = StatistiqueMensuelle.objects.all()
+    creneaux = StatistiqueCreneau.objects.all()
+    if coach_id is not None:
+        seances = seances.filter(coach_id=coach_id)
+        lignes = lignes.filter(coach_id=coach_id)
+        creneaux = creneaux.filter(coach_id=coach_id)
+
+    mois_actifs = set(seances.annotate(mois=TruncMonth("date")).values_list("coach_id", "mois").distinct())
+    # Les mois qui n'ont plus aucune séance sont recalculés aussi, ce qui les vide
+    mois_actifs |= set(lignes.values_list("coach_id", "mois").distinct())
+    mois_actifs |= set(creneaux.values_list("coach_id", "mois").distinct())
+
+    par_coach = {}
+    for coach, mois in mois_actifs:
+        par_coach.setdefault(coach, set()).add(mois)
+    for coach, mois in par_coach.items():
+        recalculer_mois(coach, mois)
+    return len(mois_actifs)
+
+
+def _avec_taux(ligne):
+    """Ajoute à une ligne de compteurs le total traité et les taux (en %, ou None)."""
+    # Les sommes sont annotées sous « nb_<compteur> » : un alias ne peut pas reprendre le nom d'un champ
+    for compteur in COMPTEURS.values():
+        if f"nb_{compteur}" in ligne:
+            ligne[compteur] = ligne.pop(f"nb_{compteur}")
+    annulees = ligne["annules_client"] + ligne["annules_coach"]
+    venues = ligne["presents"] + ligne["absents"]
+    ligne["traitees"] = venues + annulees
+    ligne["taux_presence"] = 100 * ligne["presents"] / venues if venues else None
+    ligne["taux_absence"] = 100 * ligne["absents"] / venues if venues else None
+    ligne["taux_annulation"] = 100 * annulees / ligne["traitees"] if ligne["traitees"] else None
+    return ligne
+
+
+def statistiques_coach(coach, aujourd_hui, nb_mois=NB_MOIS):
+    """
+    Statistiques des ``nb_mois`` derniers mois d'un coach (mois courant inclus).
+
+    Retourne un dictionnaire :
+    - par_mois : compteurs et taux par mois, du plus ancien au plus récent
+    - par_client : compteurs et taux par client, par nombre de présences décroissant
+    - creneaux : les créneaux (jour, heure) les plus chargés
+    - total : compteurs et taux sur toute la période
+    """
+    depuis = _mois_precedent(debut_mois(aujourd_hui), nb_mois - 1)
+    lignes = StatistiqueMensuelle.objects.filter(coach=coach, mois__gte=depuis)
+    sommes = {f"nb_{compteur}": Sum(compteur) for compteur in COMPTEURS.values()}
+
+    par_mois = [_avec_taux(ligne) for ligne in lignes.values("mois").annotate(**sommes).order_by("mois")]
+    par_client = [
+        _avec_taux(ligne)
+        for ligne in lignes.values("client_id", "client__first_name", "client__last_name", "client__username")
+        .annotate(**sommes)
+        .order_by("-nb_presents", "client__username")
+    ]
+    total = {compteur: sum(ligne[compteur] for ligne in par_mois) for compteur in COMPTEURS.values()}
+
+    creneaux = (
+        StatistiqueCreneau.objects.filter(coach=coach, mois__gte=depuis)
+        .values("jour_semaine", "heure")
+        .annotate(nombre=Sum("nombre"))
+        .order_by("-nombre", "jour_semaine", "heure")[:NB_CRENEAUX]
+    )
+    return {
+        "par_mois": par_mois,
+        "par_client": par_client,
+        "creneaux": [
+            {**creneau, "jour": JOURS_SEMAINE[creneau["jour_semaine"]]} for creneau in creneaux
+        ],
+        "total": _avec_taux(total),
+    }
@@ -1,3 +1,817 @@
-from django.test import TestCase
+import re
+import threading
+from io import StringIO
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core import mail
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Tache
+
+from . import agenda, disponibilites, export, fragments, horaires, notifications, statistiques
+from .forms import PriseSeanceForm
+from .models import ExceptionDisponibilite, HoraireHebdomadaire, Seance, StatistiqueCreneau, StatistiqueMensuelle
+from .pagination import TAILLE_PAGE, _page, encoder_curseur, page_keyset
+
+
+class SeanceTestMixin:
+    """Création des utilisateurs et des séances communes aux tests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach = User.objects.create_user("coach", password="motdepasse")
+        Group.objects.create(name="coach").user_set.add(cls.coach)
+        cls.client_group = Group.objects.create(name="client")
+
+    def setUp(self):
+        # Les caches (disponibilités, rôles, fragments) survivent au rollback des tests
+        for cache in caches.all():
+            cache.clear()
+
+    @classmethod
+    def creer_client(cls, numero):
+        client = User.objects.create_user(f"client{numero}", first_name=f"Prénom{numero}")
+        cls.client_group.user_set.add(client)
+        return client
+
+    def creer_seances(self, nombre, jour, code_rdv=0, debut=0):
+        """Crée ``nombre`` séances pour des clients distincts, espacées d'une minute."""
+        seances = []
+        for i in range(debut, debut + nombre):
+            client = self.creer_client(i)
+            minutes = 8 * 60 + i
+            seances.append(Seance.objects.create(
+                client=client,
+                coach=self.coach,
+                date=jour,
+                heure_debut=time(minutes // 60, minutes % 60),
+                objet="Coaching personnel",
+                code_rdv=code_rdv,
+            ))
+        return seances
+
+
+class NombreDeRequetesTests(SeanceTestMixin, TestCase):
+    """Le nombre de requêtes des pages coach ne dépend pas du nombre de lignes."""
+
+    def compter_requetes(self, url):
+        self.client.force_login(self.coach)
+        # Premier passage pour remplir les caches (rôles, disponibilités), puis
+        # fragments HTML vidés : les requêtes des tableaux doivent être exécutées
+        self.client.get(url)
+        fragments.invalider_coach(self.coach.pk)
+        with CaptureQueriesContext(connection) as contexte:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue([q for q in contexte.captured_queries if "seances_seance" in q["sql"]])
+        return len(contexte.captured_queries)
+
+    def assertNombreDeRequetesConstant(self, url, jour, code_rdv):
+        self.creer_seances(1, jour, code_rdv)
+        une_ligne = self.compter_requetes(url)
+        self.creer_seances(30, jour, code_rdv, debut=1)
+        self.assertEqual(self.compter_requetes(url), une_ligne)
+
+    def test_dashboard_coach(self):
+        self.assertNombreDeRequetesConstant(reverse("accounts:dashboard_coach"), timezone.localdate(), 0)
+
+    def test_futures_sessions_coach(self):
+        demain = timezone.localdate() + timedelta(days=1)
+        self.assertNombreDeRequetesConstant(reverse("seances:futures_sessions_coach"), demain, 0)
+
+    def test_historique_coach(self):
+        hier = timezone.localdate() - timedelta(days=1)
+        self.assertNombreDeRequetesConstant(reverse("seances:historique_coach"), hier, 1)
+
+    def test_historique_coach_seances_oubliees(self):
+        hier = timezone.localdate() - timedelta(days=1)
+        self.assertNombreDeRequetesConstant(reverse("seances:historique_coach"), hier, 0)
+
+
+class FragmentsEnCacheTests(SeanceTestMixin, TestCase):
+    """Les tableaux coach sont servis depuis le cache tant qu'aucune séance ne change."""
+
+    def requetes_seances(self, url):
+        with CaptureQueriesContext(connection) as contexte:
+            response = self.client.get(url)
+        return response, [q["sql"] for q in contexte.captured_queries if "seances_seance" in q["sql"]]
+
+    def test_dashboard_coach(self):
+        url = reverse("accounts:dashboard_coach")
+        self.client.force_login(self.coach)
+        premiere, = self.creer_seances(1, timezone.localdate())
+
+        response, requetes = self.requetes_seances(url)
+        self.assertTrue(requetes)
+        self.assertContains(response, "Prénom0")
+
+        response, requetes = self.requetes_seances(url)
+        self.assertEqual(requetes, [])
+        self.assertContains(response, "Prénom0")
+
+        premiere.code_rdv = 1
+        premiere.save()
+        response, requetes = self.requetes_seances(url)
+        self.assertTrue(requetes)
+        self.assertNotContains(response, "Prénom0")
+
+
+class TraitementGroupeTests(SeanceTestMixin, TestCase):
+    """Les séances oubliées sont traitées en une requête, en tout ou rien."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.coach)
+        self.hier = timezone.localdate() - timedelta(days=1)
+
+    def donnees(self, seances, code):
+        donnees = {"seance_id": [s.pk for s in seances]}
+        for seance in seances:
+            donnees[f"code_rdv_{seance.pk}"] = code
+            donnees[f"note_{seance.pk}"] = ""
+        return donnees
+
+    def test_traitement_groupe(self):
+        seances = self.creer_seances(20, self.hier)
+        self.client.post(reverse("seances:traiter_seances_oubliees"), self.donnees(seances[:1], 1))
+
+        with CaptureQueriesContext(connection) as contexte:
+            response = self.client.post(reverse("seances:traiter_seances_oubliees"), self.donnees(seances[1:], 2))
+        self.assertRedirects(response, reverse("seances:historique_coach"))
+        self.assertLess(len(contexte.captured_queries), 10)
+        self.assertEqual(Seance.objects.filter(code_rdv=2).count(), 19)
+        self.assertEqual(Seance.objects.get(pk=seances[1].pk).message, "Marqué comme absent par le coach.")
+        self.assertEqual(Tache.objects.filter(nom=notifications.envoyer_statut.nom_tache).count(), 20)
+
+    def test_seance_d_un_autre_coach(self):
+        seance, = self.creer_seances(1, self.hier)
+        autre = self.creer_client(99)
+        etrangere = Seance.objects.create(
+            client=seance.client, coach=autre, date=self.hier, heure_debut=time(9, 0), objet="Coaching personnel",
+        )
+        self.client.post(reverse("seances:traiter_seances_oubliees"), self.donnees([seance, etrangere], 1))
+        self.assertFalse(Seance.objects.exclude(code_rdv=0).exists())
+
+
+class PaginationKeysetTests(SeanceTestMixin, TestCase):
+    """Les pages successives couvrent tout l'historique, sans doublon ni trou."""
+
+    def test_pages_successives(self):
+        hier = timezone.localdate() - timedelta(days=1)
+        seances = self.creer_seances(TAILLE_PAGE + 5, hier, code_rdv=1)
+        queryset = Seance.objects.for_coach_history(self.coach, timezone.localdate())
+
+        premiere, curseur = page_keyset(queryset)
+        self.assertEqual(len(premiere), TAILLE_PAGE)
+        seconde, curseur_fin = page_keyset(queryset, curseur)
+        self.assertIsNone(curseur_fin)
+        self.assertEqual(
+            [s.pk for s in premiere + seconde],
+            [s.pk for s in sorted(seances, key=lambda s: s.heure_debut, reverse=True)],
+        )
+
+    def test_fragment_page_suivante(self):
+        hier = timezone.localdate() - timedelta(days=1)
+        self.creer_seances(TAILLE_PAGE + 1, hier, code_rdv=1)
+        self.client.force_login(self.coach)
+
+        response = self.client.get(reverse("seances:historique_coach"))
+        curseur = response.context["curseur_suivant"]
+        self.assertIsNotNone(curseur)
+
+        response = self.client.get(reverse("seances:historique_coach_page"), {"curseur": curseur})
+        self.assertEqual(len(response.context["historique_rdv"]), 1)
+        self.assertIsNone(response.context["curseur_suivant"])
+
+        response = self.client.get(reverse("seances:historique_coach_page"), {"curseur": "invalide"})
+        self.assertEqual(response.status_code, 400)
+
+
+class AgendaTests(SeanceTestMixin, TestCase):
+    """Le flux iCalendar est complet, et répond 304 tant que rien ne change."""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("seances:agenda_ics", args=[agenda.jeton(self.coach)])
+        self.seances = self.creer_seances(3, timezone.localdate() + timedelta(days=1))
+
+    def test_flux_et_requete_conditionnelle(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        contenu = b"".join(response.streaming_content).decode()
+        self.assertEqual(contenu.count("BEGIN:VEVENT"), 3)
+        self.assertIn("Prénom0", contenu)
+
+        with CaptureQueriesContext(connection) as contexte:
+            response = self.client.get(self.url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        # Propriétaire du jeton, ses rôles (non mis en cache localement) et dernière modification
+        self.assertLessEqual(len(contexte.captured_queries), 3)
+
+        etag = response["ETag"]
+        self.seances[0].code_rdv = 4
+        self.seances[0].save()
+        response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("STATUS:CANCELLED", b"".join(response.streaming_content).decode())
+
+    def test_jeton_invalide(self):
+        jeton_client = agenda.jeton(self.seances[0].client)
+        self.assertEqual(self.client.get(self.url.replace(agenda.jeton(self.coach), jeton_client + "x")).status_code, 404)
+
+
+class ExportHistoriqueTests(SeanceTestMixin, TestCase):
+    """L'export suit les filtres et lit les séances par lots, sans instancier de modèle."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.coach)
+        self.hier = timezone.localdate() - timedelta(days=1)
+        self.creer_seances(5, self.hier, code_rdv=1)
+        self.creer_seances(3, self.hier - timedelta(days=30), code_rdv=2, debut=5)
+
+    def exporter(self, **filtres):
+        response = self.client.get(reverse("seances:export_historique_coach"), filtres)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+
+    def test_filtres(self):
+        lignes = self.exporter()
+        self.assertEqual(lignes[0], ";".join(export.ENTETES))
+        self.assertEqual(len(lignes), 9)
+        self.assertEqual(len(self.exporter(statuts=[2])), 4)
+        self.assertEqual(len(self.exporter(date_debut=self.hier.isoformat())), 6)
+        self.assertIn("Présent", self.exporter(date_debut=self.hier.isoformat())[1])
+
+    def test_dates_inversees(self):
+        response = self.client.get(reverse("seances:export_historique_coach"), {
+            "date_debut": self.hier.isoformat(), "date_fin": (self.hier - timedelta(days=1)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_formules_neutralisees(self):
+        seance = Seance.objects.filter(date=self.hier).first()
+        User.objects.filter(pk=seance.client_id).update(first_name='=HYPERLINK("http://exemple.test")', last_name="")
+        Seance.objects.filter(pk=seance.pk).update(message="@SUM(A1:A2)")
+        ligne = next(ligne for ligne in self.exporter() if "HYPERLINK" in ligne)
+        self.assertIn(';"\'=HYPERLINK(""http://exemple.test"")";', ligne)
+        self.assertTrue(ligne.endswith(";'@SUM(A1:A2)"))
+
+    @skipUnless(export.Workbook is not None, "openpyxl n'est pas installé.")
+    def test_xlsx(self):
+        response = self.client.get(reverse("seances:export_historique_coach"), {"format": "xlsx"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"PK"))
+
+
+class PlusieursCoachsTests(SeanceTestMixin, TestCase):
+    """La recherche de créneaux sur tous les coachs se fait en un nombre borné de requêtes."""
+
+    NB_COACHS = 4
+
+    def setUp(self):
+        super().setUp()
+        self.coachs = [self.coach]
+        for numero in range(1, self.NB_COACHS):
+            coach = User.objects.create_user(f"coach{numero}")
+            Group.objects.get(name="coach").user_set.add(coach)
+            self.coachs.append(coach)
+        self.jour = timezone.localdate() + timedelta(days=7 - timezone.localdate().weekday())
+        # Le premier coach est occupé à l'ouverture du lundi
+        self.creer_seances(1, self.jour)
+
+    def test_occupations_en_une_requete(self):
+        coach_ids = [coach.pk for coach in self.coachs]
+        jours = [self.jour + timedelta(days=i) for i in range(14)]
+        # Deux requêtes pour les cartes d'horaires, une pour les séances
+        with self.assertNumQueries(3):
+            occupations = disponibilites.occupations(coach_ids, jours)
+        self.assertEqual(len(occupations), self.NB_COACHS * 14)
+        self.assertEqual(
+            occupations[self.coach.pk, self.jour], disponibilites.calculer_occupation(self.coach.pk, self.jour),
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(disponibilites.occupations(coach_ids, jours), occupations)
+
+    def test_seance_deplacee(self):
+        lendemain = self.jour + timedelta(days=1)
+        disponibilites.occupations([self.coach.pk], [self.jour, lendemain])
+        seance = Seance.objects.only("date").get(coach=self.coach)
+        seance.date = lendemain
+        seance.save()
+        occupations = disponibilites.occupations([self.coach.pk], [self.jour, lendemain])
+        self.assertTrue(occupations[self.coach.pk, self.jour].libre(time(8, 0), 60))
+        self.assertFalse(occupations[self.coach.pk, lendemain].libre(time(8, 0), 60))
+
+    def test_premier_creneau(self):
+        coach_ids = [coach.pk for coach in self.coachs]
+        moment = timezone.make_aware(datetime.combine(self.jour, time(7, 0)))
+        self.assertEqual(
+            disponibilites.premier_creneau(coach_ids, moment, 60), (self.coachs[1].pk, self.jour, time(8, 0)),
+        )
+        # Séance existante de 08h00 à 09h00
+        self.assertEqual(disponibilites.premier_creneau(coach_ids[:1], moment, 60), (self.coach.pk, self.jour, time(9, 0)))
+
+    def test_premier_coach_disponible(self):
+        self.client.force_login(self.creer_client(99))
+        response = self.client.post(reverse("seances:prise_rdv"), {
+            "coach": "",
+            "date": self.jour.strftime("%d/%m/%Y"),
+            "heure_debut": "08:05",
+            "objet": "Coaching personnel",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertNotEqual(Seance.objects.get(date=self.jour, heure_debut=time(8, 5)).coach, self.coach)
+
+        response = self.client.post(reverse("seances:prise_rdv"), {
+            "coach": self.coach.pk,
+            "date": self.jour.strftime("%d/%m/%Y"),
+            "heure_debut": "08:06",
+            "objet": "Coaching personnel",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Seance.objects.filter(heure_debut=time(8, 6)).exists())
+
+        # Séance de 30 minutes juste après celle de 08h00-09h00
+        response = self.client.post(reverse("seances:prise_rdv"), {
+            "coach": self.coach.pk,
+            "date": self.jour.strftime("%d/%m/%Y"),
+            "heure_debut": "09:00",
+            "objet": "Gestion du stress",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Seance.objects.get(coach=self.coach, heure_debut=time(9, 0)).duree, 30)
+
+
+class DisponibilitesCoachTests(SeanceTestMixin, TestCase):
+    """Plages libres d'un jour, en JSON, pour le sélecteur de créneaux de la prise de rendez-vous."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.creer_client(99))
+        self.lundi = timezone.localdate() + timedelta(days=7 - timezone.localdate().weekday())
+        # Séance de 08h00 à 09h00 ; horaires par défaut : 08h00-20h00
+        self.creer_seances(1, self.lundi)
+
+    def disponibilites(self, **parametres):
+        return self.client.get(reverse("seances:disponibilites_coach"), parametres)
+
+    def test_plages(self):
+        for parametres in ({"coach": self.coach.pk}, {}):
+            response = self.disponibilites(date=self.lundi.isoformat(), objet="Coaching personnel", **parametres)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {"date": self.lundi.isoformat(), "plages": [["09:00", "19:00"]]})
+        # Séance de 30 minutes : derniers débuts plus tard
+        response = self.disponibilites(date=self.lundi.isoformat(), objet="Gestion du stress")
+        self.assertEqual(response.json()["plages"], [["09:00", "19:30"]])
+
+    def test_jour_passe(self):
+        hier = timezone.localdate() - timedelta(days=1)
+        response = self.disponibilites(date=hier.isoformat())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"date": hier.isoformat(), "plages": []})
+
+    def test_parametres_invalides(self):
+        for parametres in (
+            {"date": "31/12/2030"},
+            {},
+            {"date": self.lundi.isoformat(), "coach": "abc"},
+            {"date": self.lundi.isoformat(), "coach": self.coach.pk + 1000},
+        ):
+            response = self.disponibilites(**parametres)
+            self.assertEqual(response.status_code, 400, parametres)
+            self.assertIn("erreur", response.json())
+
+
+class PremierCreneauTests(SeanceTestMixin, TestCase):
+    """Premier créneau libre des 30 prochains jours, en JSON."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.creer_client(99))
+        self.lundi = timezone.localdate() + timedelta(days=7 - timezone.localdate().weekday())
+        # Coach fermé sur toute la fenêtre, sauf le lundi qui vient, occupé de 08h00 à 09h00
+        for decalage in range(30):
+            jour = timezone.localdate() + timedelta(days=decalage)
+            if jour != self.lundi:
+                ExceptionDisponibilite.objects.create(coach=self.coach, date=jour)
+        self.creer_seances(1, self.lundi)
+
+    def premier_creneau(self, **parametres):
+        return self.client.get(reverse("seances:premier_creneau"), {"objet": "Coaching personnel", **parametres})
+
+    def test_creneau(self):
+        for parametres in ({"coach": self.coach.pk}, {}):
+            response = self.premier_creneau(**parametres)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {
+                "coach": self.coach.pk, "nom": "coach", "date": self.lundi.isoformat(), "heure": "09:00",
+            })
+
+    def test_aucun_creneau(self):
+        ExceptionDisponibilite.objects.create(coach=self.coach, date=self.lundi)
+        response = self.premier_creneau()
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("erreur", response.json())
+
+    def test_coach_invalide(self):
+        for coach in ("abc", self.coach.pk + 1000):
+            response = self.premier_creneau(coach=coach)
+            self.assertEqual(response.status_code, 400, coach)
+            self.assertIn("erreur", response.json())
+
+
+class OccupationTests(TestCase):
+    """Les chevauchements tiennent compte de la durée des séances ; bitmap et recherche s'accordent."""
+
+    def setUp(self):
+        self.occupation = disponibilites.Occupation([
+            (time(9, 0), 60, 0),
+            (time(9, 30), 90, 1),  # chevauche la précédente : intervalles fusionnés en 09h00-11h00
+            (time(14, 0), 30, 0),
+            (time(16, 0), 60, 3),  # annulée : seule la minute de début reste prise
+        ], ouvert=horaires.SEMAINE_PAR_DEFAUT[1])
+
+    def test_libre(self):
+        self.assertEqual((self.occupation.debuts, self.occupation.fins), ([540, 840], [660, 870]))
+        self.assertTrue(self.occupation.libre(time(8, 0), 60))
+        self.assertFalse(self.occupation.libre(time(8, 1), 60))
+        self.assertTrue(self.occupation.libre(time(11, 0), 90))
+        self.assertFalse(self.occupation.libre(time(13, 0), 90))
+        self.assertTrue(self.occupation.libre(time(13, 30), 30))
+        self.assertFalse(self.occupation.libre(time(16, 0), 30))
+        self.assertTrue(self.occupation.libre(time(16, 1), 30))
+        self.assertTrue(self.occupation.libre(time(19, 30), 30))
+        self.assertFalse(self.occupation.libre(time(19, 31), 30))
+        self.assertFalse(self.occupation.libre(time(7, 59), 30))
+
+    def test_bitmap_coherent(self):
+        for duree in (30, 60, 90):
+            bitmap = self.occupation.bitmap(duree)
+            for index in range(disponibilites.NB_MINUTES):
+                heure = disponibilites._heure(index)
+                self.assertEqual(bool(bitmap >> index & 1), self.occupation.libre(heure, duree), (duree, heure))
+
+
+class HorairesReceptionTests(SeanceTestMixin, TestCase):
+    """Les horaires hebdomadaires et les exceptions sont compilés en cartes et respectés à la réservation."""
+
+    def setUp(self):
+        super().setUp()
+        self.lundi = timezone.localdate() + timedelta(days=7 - timezone.localdate().weekday())
+        self.samedi = self.lundi + timedelta(days=5)
+        # Lundi 09h00-12h00 et 14h00-18h00, aucune autre plage
+        for debut, fin in ((time(9, 0), time(12, 0)), (time(14, 0), time(18, 0))):
+            HoraireHebdomadaire.objects.create(coach=self.coach, jour_semaine=1, heure_debut=debut, heure_fin=fin)
+
+    def test_cartes(self):
+        jours = [self.lundi, self.lundi + timedelta(days=1), self.samedi]
+        with self.assertNumQueries(2):
+            ouvertes = horaires.minutes_ouvertes([self.coach.pk], jours)
+        with self.assertNumQueries(0):
+            self.assertEqual(horaires.minutes_ouvertes([self.coach.pk], jours), ouvertes)
+        occupation = disponibilites.Occupation(ouvert=ouvertes[self.coach.pk, self.lundi])
+        self.assertEqual(
+            disponibilites.plages_bitmap(occupation.bitmap(60)), [(time(9, 0), time(11, 0)), (time(14, 0), time(17, 0))],
+        )
+        self.assertFalse(occupation.dans_horaires(time(11, 30), 60))
+        self.assertEqual(ouvertes[self.coach.pk, self.lundi + timedelta(days=1)], 0)
+
+        # Ouverture exceptionnelle le samedi, fermeture du lundi matin : cartes invalidées par les signaux
+        ExceptionDisponibilite.objects.create(
+            coach=self.coach, date=self.samedi, type=ExceptionDisponibilite.OUVERTURE,
+            heure_debut=time(10, 0), heure_fin=time(12, 0),
+        )
+        ExceptionDisponibilite.objects.create(
+            coach=self.coach, date=self.lundi, heure_debut=time(9, 0), heure_fin=time(12, 0),
+        )
+        self.assertEqual(disponibilites.plages_libres(self.coach.pk, self.samedi, 60), [(time(10, 0), time(11, 0))])
+        self.assertEqual(disponibilites.plages_libres(self.coach.pk, self.lundi, 60), [(time(14, 0), time(17, 0))])
+
+        # Fermeture de la journée entière
+        ExceptionDisponibilite.objects.create(coach=self.coach, date=self.lundi, motif="Congés")
+        self.assertEqual(disponibilites.plages_libres(self.coach.pk, self.lundi, 30), [])
+        fermes = horaires.calendrier([self.coach.pk], self.lundi, 7)["fermes"]
+        self.assertEqual(fermes[str(self.coach.pk)], [
+            (self.lundi + timedelta(days=decalage)).isoformat() for decalage in (0, 1, 2, 3, 4, 6)
+        ])
+        self.assertEqual(fermes[""], fermes[str(self.coach.pk)])
+
+    def test_reservation_hors_horaires(self):
+        self.client.force_login(self.creer_client(99))
+        response = self.client.post(reverse("seances:prise_rdv"), {
+            "coach": self.coach.pk,
+            "date": self.lundi.strftime("%d/%m/%Y"),
+            "heure_debut": "11:30",
+            "objet": "Coaching personnel",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, PriseSeanceForm.MESSAGE_HORS_HORAIRES)
+        self.assertIn(self.samedi.isoformat(), response.context["calendrier"]["fermes"][str(self.coach.pk)])
+        self.assertContains(response, 'id="calendrier"')
+
+        response = self.client.post(reverse("seances:prise_rdv"), {
+            "coach": self.coach.pk,
+            "date": self.lundi.strftime("%d/%m/%Y"),
+            "heure_debut": "11:30",
+            "objet": "Gestion du stress",
+        })
+        self.assertEqual(response.status_code, 302)
+
+        # Série : les lundis fermés sont signalés à part
+        ExceptionDisponibilite.objects.create(coach=self.coach, date=self.lundi + timedelta(weeks=1))
+        response = self.client.post(reverse("seances:prise_serie"), {
+            "coach": self.coach.pk,
+            "date": self.lundi.strftime("%d/%m/%Y"),
+            "heure_debut": "09:00",
+            "nb_semaines": 3,
+            "objet": "Coaching personnel",
+        })
+        self.assertEqual(response.context["form"].conflits, [
+            (self.lundi + timedelta(weeks=1), PriseSeanceForm.MESSAGE_HORS_HORAIRES),
+        ])
+
+    def test_verification_en_base(self):
+        seance = Seance.objects.create(
+            client=self.creer_client(99), coach=self.coach, date=self.lundi, heure_debut=time(9, 0), objet="Coaching personnel",
+        )
+        self.assertTrue(disponibilites.est_libre(self.coach.pk, self.lundi, time(10, 0), 60))
+        # Fermeture enregistrée sans signal : invalidation faite par un autre processus, cartes en cache périmées
+        ExceptionDisponibilite.objects.bulk_create([ExceptionDisponibilite(coach=self.coach, date=self.lundi)])
+        self.assertTrue(disponibilites.est_libre(self.coach.pk, self.lundi, time(10, 0), 60))
+        self.assertFalse(disponibilites.calculer_occupation(self.coach.pk, self.lundi).dans_horaires(time(10, 0), 60))
+
+        nouvelle = Seance(client=seance.client, coach=self.coach, date=self.lundi, heure_debut=time(10, 0), objet="Coaching personnel")
+        with self.assertRaisesMessage(ValidationError, PriseSeanceForm.MESSAGE_HORS_HORAIRES):
+            nouvelle.full_clean(validate_unique=False)
+        # Créneau inchangé : une séance existante reste modifiable
+        seance = Seance.objects.get(pk=seance.pk)
+        seance.message = "Bilan"
+        with self.assertNumQueries(0):
+            seance.clean()
+        seance.heure_debut = time(14, 0)
+        with self.assertRaisesMessage(ValidationError, PriseSeanceForm.MESSAGE_HORS_HORAIRES):
+            seance.clean()
+
+
+class SerieSeancesTests(SeanceTestMixin, TestCase):
+    """Une série est vérifiée et enregistrée en un nombre de requêtes indépendant de sa longueur."""
+
+    def setUp(self):
+        super().setUp()
+        self.mardi = timezone.localdate() + timedelta(days=8 - timezone.localdate().weekday())
+        self.client.force_login(self.creer_client(99))
+
+    def reserver(self, nb_semaines, **donnees):
+        return self.client.post(reverse("seances:prise_serie"), {
+            "coach": self.coach.pk,
+            "date": self.mardi.strftime("%d/%m/%Y"),
+            "heure_debut": "10:00",
+            "nb_semaines": nb_semaines,
+            "objet": "Coaching personnel",
+            **donnees,
+        })
+
+    def test_requetes_independantes_du_nombre_de_semaines(self):
+        requetes = []
+        for nb_semaines in (4, 52):
+            Seance.objects.all().delete()
+            for cache in caches.all():
+                cache.clear()
+            with CaptureQueriesContext(connection) as contexte:
+                self.assertEqual(self.reserver(nb_semaines).status_code, 302)
+            requetes.append(len(contexte))
+            self.assertEqual(Seance.objects.filter(heure_debut=time(10, 0)).count(), nb_semaines)
+        self.assertEqual(requetes[0], requetes[1])
+
+    def test_conflits(self):
+        autre = self.creer_client(1)
+        Seance.objects.create(
+            client=autre, coach=self.coach, date=self.mardi + timedelta(weeks=2),
+            heure_debut=time(10, 5), objet="Coaching personnel",
+        )
+        response = self.reserver(6)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([jour for jour, _ in response.context["form"].conflits], [self.mardi + timedelta(weeks=2)])
+        self.assertEqual(Seance.objects.filter(heure_debut=time(10, 0)).count(), 0)
+
+        self.assertEqual(self.reserver(6, ignorer_conflits="on").status_code, 302)
+        self.assertEqual(Seance.objects.filter(heure_debut=time(10, 0)).count(), 5)
+
+
+class NotificationsTests(SeanceTestMixin, TestCase):
+    """Les réservations et changements de statut planifient des e-mails au lieu de les envoyer."""
+
+    def setUp(self):
+        super().setUp()
+        self.mardi = timezone.localdate() + timedelta(days=8 - timezone.localdate().weekday())
+        self.client_seance = self.creer_client(1)
+        self.client_seance.email = "client@exemple.fr"
+        self.client_seance.save()
+        self.client.force_login(self.client_seance)
+
+    def test_reservation_puis_annulation(self):
+        self.client.post(reverse("seances:prise_rdv"), {
+            "date": self.mardi.strftime("%d/%m/%Y"), "heure_debut": "10:00", "objet": "Coaching personnel",
+        })
+        seance = Seance.objects.get()
+        self.assertEqual(mail.outbox, [])
+        taches = dict(Tache.objects.values_list("nom", "arguments"))
+        self.assertEqual(taches[notifications.envoyer_confirmation.nom_tache], {"seance_ids": [seance.pk]})
+        self.assertEqual(taches[notifications.envoyer_rappel.nom_tache]["heure"], "10:00")
+
+        notifications.envoyer_confirmation(seance_ids=[seance.pk])
+        notifications.envoyer_rappel(seance_id=seance.pk, date=seance.date.isoformat(), heure="10:00")
+        self.assertEqual([message.to for message in mail.outbox], [["client@exemple.fr"], ["client@exemple.fr"]])
+
+        self.client.post(reverse("seances:annuler_seance", args=[seance.pk]))
+        self.assertTrue(Tache.objects.filter(nom=notifications.envoyer_statut.nom_tache).exists())
+        # Séance annulée : plus de rappel
+        notifications.envoyer_rappel(seance_id=seance.pk, date=seance.date.isoformat(), heure="10:00")
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class StatistiquesTests(SeanceTestMixin, TestCase):
+    """Les tables de synthèse suivent les séances, et la page ne lit qu'elles."""
+
+    def setUp(self):
+        super().setUp()
+        self.lundi = timezone.localdate() - timedelta(days=timezone.localdate().weekday() + 7)
+
+    def test_maintenu_a_la_validation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            seances = self.creer_seances(4, self.lundi, code_rdv=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            seances[0].code_rdv = 2
+            seances[0].save()
+            seances[1].code_rdv = 3
+            seances[1].save()
+
+        mois = statistiques.debut_mois(self.lundi)
+        lignes = StatistiqueMensuelle.objects.filter(coach=self.coach, mois=mois)
+        self.assertEqual(lignes.count(), 4)
+        self.assertEqual(sum(lignes.values_list("presents", flat=True)), 2)
+        self.assertEqual(StatistiqueCreneau.objects.get(coach=self.coach, mois=mois).nombre, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            seances[2].delete()
+        self.assertEqual(lignes.count(), 3)
+
+    def test_recalculer_tout_et_page(self):
+        self.creer_seances(3, self.lundi, code_rdv=1)
+        self.creer_seances(1, self.lundi, code_rdv=2, debut=3)
+        self.creer_seances(1, self.lundi, code_rdv=4, debut=4)
+        self.assertEqual(StatistiqueMensuelle.objects.count(), 0)
+        self.assertEqual(statistiques.recalculer_tout(), 1)
+
+        self.client.force_login(self.coach)
+        self.client.get(reverse("seances:statistiques_coach"))
+        with self.assertNumQueries(6):
+            # session (lue en base : cache de test propre au processus), utilisateur, rôles (cache de test propre au processus :
+            # relus en base, voir accounts.roles), puis trois agrégats sur les tables de synthèse
+            response = self.client.get(reverse("seances:statistiques_coach"))
+        self.assertEqual(response.context["total"]["taux_presence"], 75)
+        self.assertEqual(response.context["total"]["taux_annulation"], 20)
+        self.assertEqual(response.context["creneaux"][0], {"jour_semaine": 1, "heure": 8, "nombre": 4, "jour": "Lundi"})
+
+
+class HorairesTests(SeanceTestMixin, TestCase):
+    """``debut`` et ``fin`` suivent la date et l'heure de la séance, au fuseau local."""
+
+    def test_synchronisation(self):
+        seance, = self.creer_seances(1, date(2025, 7, 21))
+        self.assertEqual(seance.debut, datetime(2025, 7, 21, 6, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(seance.fin - seance.debut, timedelta(minutes=60))
+
+        seance.date, seance.heure_debut, seance.duree = date(2025, 12, 22), time(9, 30), 90
+        seance.save(update_fields=["date", "heure_debut", "duree"])
+        seance.refresh_from_db()
+        self.assertEqual(seance.debut, datetime(2025, 12, 22, 8, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(seance.fin, datetime(2025, 12, 22, 10, 0, tzinfo=dt_timezone.utc))
+
+    def test_fenetres_client(self):
+        maintenant = timezone.localtime()
+        passee, = self.creer_seances(1, timezone.localdate() - timedelta(days=1))
+        future, = Seance.objects.bulk_create([Seance(
+            client=passee.client, coach=self.coach, date=maintenant.date() + timedelta(days=1),
+            heure_debut=time(8, 0), objet="Coaching personnel",
+        )])
+        self.assertEqual(list(Seance.objects.upcoming_for_client(passee.client, maintenant)), [future])
+        self.assertEqual(list(Seance.objects.history_for_client(passee.client, maintenant)), [passee])
+
+
+class SeedCoachingTests(TestCase):
+    """Les données générées respectent les contraintes du modèle et alimentent les statistiques."""
+
+    def test_generation(self):
+        call_command(
+            "seed_coaching", "--coachs", "3", "--clients", "20", "--seances", "500", "--lot", "64", stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.filter(groups__name="coach", username__startswith="seed_").count(), 3)
+        self.assertEqual(Seance.objects.count(), 500)
+        # Aucun chevauchement chez un même coach
+        for coach_id in Seance.objects.values_list("coach_id", flat=True).distinct():
+            seances = list(Seance.objects.filter(coach_id=coach_id).order_by("debut"))
+            for avant, apres in zip(seances, seances[1:]):
+                self.assertGreaterEqual(apres.debut, avant.fin)
+        self.assertFalse(Seance.objects.filter(date__gte=timezone.localdate(), code_rdv__in=(1, 2)).exists())
+        self.assertTrue(StatistiqueMensuelle.objects.exists())
+
+
+@skipUnless(connection.vendor == "sqlite", "Les plans attendus sont ceux de SQLite.")
+class PlansDeRequetesTests(SeanceTestMixin, TestCase):
+    """
+    Chaque requête des vues doit être une plage sur un index dédié (EXPLAIN QUERY
+    PLAN), déjà dans l'ordre d'affichage : jamais de parcours complet de la table
+    des séances ni de tri.
+    """
+
+    PARCOURS_COMPLET = re.compile(r"\bSCAN seances_seance\b")
+
+    def assertUtiliseIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIsNone(self.PARCOURS_COMPLET.search(plan), plan)
+        self.assertIn(f"USING INDEX {index}", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_plans(self):
+        moment = timezone.make_aware(datetime(2025, 7, 21, 10, 0))
+        jour = moment.date()
+        client = self.creer_client(0)
+        cas = [
+            (Seance.objects.today_for_coach(self.coach, jour), "seance_coach_code_debut_idx"),
+            (Seance.objects.upcoming_for_coach(self.coach, jour), "seance_coach_code_debut_idx"),
+            (Seance.objects.for_coach_history(self.coach, jour), "seance_coach_debut_idx"),
+            (Seance.objects.forgotten_for_coach(self.coach, jour), "seance_coach_code_debut_idx"),
+            (Seance.objects.upcoming_for_client(client, moment), "seance_client_a_venir_idx"),
+            (Seance.objects.history_for_client(client, moment), "seance_client_debut_idx"),
+            # Page suivante d'un historique (pagination par curseur)
+            (
+                _page(Seance.objects.for_coach_history(self.coach, jour), encoder_curseur(Seance(pk=1, debut=moment)), 10),
+                "seance_coach_debut_idx",
+            ),
+        ]
+        for queryset, index in cas:
+            with self.subTest(index=index, requete=str(queryset.query)):
+                self.assertUtiliseIndex(queryset, index)
+
+
+class ReservationConcurrenteTests(SeanceTestMixin, TransactionTestCase):
+    """Des réservations simultanées ne créent jamais deux séances qui se chevauchent."""
+
+    NB_CLIENTS = 12
+
+    def setUp(self):
+        super().setUp()
+        self.setUpTestData()
+
+    def prochain_jour_ouvre(self):
+        jour = timezone.localdate() + timedelta(days=7)
+        while jour.weekday() in (5, 6):
+            jour += timedelta(days=1)
+        return jour
+
+    def test_reservations_simultanees(self):
+        jour = self.prochain_jour_ouvre()
+        clients = [self.creer_client(i) for i in range(self.NB_CLIENTS)]
+        depart = threading.Barrier(self.NB_CLIENTS, timeout=30)
+        statuts = []
+
+        def reserver(numero, client):
+            try:
+                navigateur = self.client_class()
+                navigateur.force_login(client)
+                depart.wait()
+                # Séances d'une heure commençant entre 10h00 et 10h11 : une seule réservation possible
+                response = navigateur.post(reverse("seances:prise_rdv"), {
+                    "date": jour.strftime("%d/%m/%Y"),
+                    "heure_debut": f"10:{numero:02d}",
+                    "objet": "Coaching personnel",
+                })
+                statuts.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=reserver, args=(i, c)) for i, c in enumerate(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(statuts), self.NB_CLIENTS)
+        self.assertTrue(set(statuts) <= {200, 302}, statuts)
+
+        seances = list(Seance.objects.filter(coach=self.coach, date=jour).order_by("debut"))
+        self.assertTrue(seances)
+        self.assertEqual(statuts.count(302), len(seances))
+        for avant, apres in zip(seances, seances[1:]):
+            self.assertGreaterEqual(apres.debut, avant.fin)
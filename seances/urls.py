@@ -5,10 +5,19 @@ from . import views
 app_name = "seances"
 urlpatterns = [
      path("prise_rdv/", views.prise_rdv, name="prise_rdv"),
+     path("prise_rdv/serie/", views.prise_serie, name="prise_serie"),
+     path("prise_rdv/disponibilites/", views.disponibilites_coach, name="disponibilites_coach"),
+     path("prise_rdv/premier_creneau/", views.premier_creneau, name="premier_creneau"),
      path("annuler/<int:seance_id>/", views.annuler_seance, name="annuler_seance"),
      path("rdv/<int:rdv_id>/fin/", views.confirmer_fin_rdv, name="confirmer_fin_rdv"),
      path("absent/<int:seance_id>/", views.marquer_absent, name="marquer_absent"),
      path("historique_client/", views.historique_client , name="historique_client"),
+     path("historique_client/page/", views.historique_client_page, name="historique_client_page"),
      path("historique_coach/", views.historique_coach , name="historique_coach"),
+     path("historique_coach/page/", views.historique_coach_page, name="historique_coach_page"),
+     path("historique_coach/export/", views.export_historique_coach, name="export_historique_coach"),
+     path("historique_coach/traiter/", views.traiter_seances_oubliees, name="traiter_seances_oubliees"),
+     path("statistiques/", views.statistiques_coach, name="statistiques_coach"),
      path('futures_sessions/', views.futures_sessions_coach, name='futures_sessions_coach'),
+     path("agenda/<str:jeton>/agenda.ics", views.agenda_ics, name="agenda_ics"),
 ]
@@ -1,35 +1,166 @@
+import tempfile
+from datetime import date
+from functools import reduce
+from operator import or_
+
+from django.http import FileResponse, Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.utils import timezone
 from django.utils.timezone import localtime, now
 
-from .forms import PriseSeanceForm, FinRdvForm, ModifierNoteHistoriqueForm
-from .models import Seance
-from django.views.decorators.http import require_POST
+from accounts.roles import coachs_actifs, roles_utilisateur
+from core.asynchrone import arender, autilisateur
+
+from . import agenda, disponibilites, export, fragments, horaires, notifications, statistiques
+from .forms import (
+    ExportHistoriqueForm, FinRdvForm, ModifierNoteHistoriqueForm, PriseSeanceForm, SerieSeanceForm,
+    TraitementSeancesForm,
+)
+from .models import Seance, debut_jour, duree_objet
+from .pagination import apage_keyset
+from .signals import seances_modifiees
+from django.views.decorators.http import condition, require_POST, require_safe
 from django.views.decorators.cache import never_cache
 
-User = get_user_model()
 
 @login_required
 def prise_rdv(request):
-    coachs = User.objects.filter(groups__name='coach')
-    if not coachs.exists():
+    coachs = coachs_actifs()
+    if not coachs:
+        return redirect("accounts:dashboard_client")
+
+    if request.method == "POST":
+        form = PriseSeanceForm(request.POST, client=request.user, coachs=coachs)
+        if form.is_valid():
+            try:
+                form.save()
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                messages.success(request, "Votre rendez-vous a bien été enregistré.<br /> Vous pouvez le consulter dans votre espace personnel.")
+                return redirect("accounts:dashboard_client")
+    else:
+        form = PriseSeanceForm(client=request.user, coachs=coachs)
+
+    calendrier = horaires.calendrier([coach.pk for coach in coachs], timezone.localdate())
+    return render(request, "seances/prise_rdv.html", {"form": form, "calendrier": calendrier})
+
+
+@login_required
+def prise_serie(request):
+    """
+    Réservation d'une série hebdomadaire de séances.
+
+    Les conflits sont listés semaine par semaine ; le client peut alors choisir
+    de ne réserver que les semaines libres.
+    """
+    coachs = coachs_actifs()
+    if not coachs:
         return redirect("accounts:dashboard_client")
 
-    coach = coachs.first()
     if request.method == "POST":
-        form = PriseSeanceForm(request.POST, client=request.user, coach=coach)
+        form = SerieSeanceForm(request.POST, client=request.user, coachs=coachs)
         if form.is_valid():
-            form.save()
-            messages.success(request, "Votre rendez-vous a bien été enregistré.<br /> Vous pouvez le consulter dans votre espace personnel.")
-            return redirect("accounts:dashboard_client")
+            try:
+                seances = form.save()
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                message = f"{len(seances)} séance(s) réservée(s)."
+                if form.conflits:
+                    message += f" {len(form.conflits)} semaine(s) ignorée(s) pour cause de conflit."
+                messages.success(request, message)
+                return redirect("accounts:dashboard_client")
     else:
-        form = PriseSeanceForm(client=request.user, coach=coach)
+        form = SerieSeanceForm(client=request.user, coachs=coachs)
+
+    calendrier = horaires.calendrier([coach.pk for coach in coachs], timezone.localdate())
+    return render(request, "seances/prise_serie.html", {"form": form, "calendrier": calendrier})
+
 
-    return render(request, "seances/prise_rdv.html", {"form": form, "coach": coach})
+def _coachs_demandes(request):
+    """
+    Identifiants des coachs visés par ``?coach=<id>`` (tous si le paramètre est vide).
+
+    Lève ValueError si le coach demandé n'existe pas.
+    """
+    coach_ids = [coach.pk for coach in coachs_actifs()]
+    valeur = request.GET.get("coach")
+    if not valeur:
+        return coach_ids
+    if int(valeur) not in coach_ids:
+        raise ValueError(valeur)
+    return [int(valeur)]
+
+
+@login_required
+def disponibilites_coach(request):
+    """
+    Retourne en JSON les plages libres pour la date demandée (?date=AAAA-MM-JJ).
+
+    Avec ``?coach=<id>``, les plages de ce coach ; sans, les plages où au moins
+    un coach est libre. Les débuts proposés laissent place à une séance de la
+    durée de ``?objet=`` (durée par défaut sinon). Les plages sont calculées à
+    partir des occupations des coachs, sans requête sur les séances
+    lorsque celles-ci sont déjà en cache. Pour le jour même, les créneaux
+    déjà passés sont retirés.
+    """
+    try:
+        jour = date.fromisoformat(request.GET.get("date", ""))
+        coach_ids = _coachs_demandes(request)
+    except ValueError:
+        return JsonResponse({"erreur": "Date ou coach invalide."}, status=400)
+
+    if not coach_ids:
+        return JsonResponse({"erreur": "Aucun coach disponible."}, status=404)
+
+    now_local = localtime(now())
+    if jour < now_local.date():
+        plages = []
+    else:
+        apres = now_local.time() if jour == now_local.date() else None
+        duree = duree_objet(request.GET.get("objet"))
+        occupations = disponibilites.occupations(coach_ids, [jour])
+        bitmap = reduce(or_, (occupation.bitmap(duree) for occupation in occupations.values()))
+        plages = disponibilites.plages_bitmap(bitmap, apres=apres)
+
+    return JsonResponse({
+        "date": jour.isoformat(),
+        "plages": [[debut.strftime("%H:%M"), fin.strftime("%H:%M")] for debut, fin in plages],
+    })
+
+
+@login_required
+def premier_creneau(request):
+    """
+    Retourne en JSON le premier créneau libre, tous coachs confondus
+    (ou pour ``?coach=<id>``), sur les 30 prochains jours, pour une séance
+    de la durée de ``?objet=``.
+
+    Une lecture du cache et au plus une requête, quel que soit le nombre de coachs.
+    """
+    try:
+        coach_ids = _coachs_demandes(request)
+    except ValueError:
+        return JsonResponse({"erreur": "Coach invalide."}, status=400)
+
+    creneau = disponibilites.premier_creneau(coach_ids, localtime(now()), duree_objet(request.GET.get("objet")))
+    if creneau is None:
+        return JsonResponse({"erreur": "Aucun créneau libre dans les 30 prochains jours."}, status=404)
+
+    coach_id, jour, heure = creneau
+    coach = next(coach for coach in coachs_actifs() if coach.pk == coach_id)
+    return JsonResponse({
+        "coach": coach_id,
+        "nom": coach.get_full_name() or coach.username,
+        "date": jour.isoformat(),
+        "heure": heure.strftime("%H:%M"),
+    })
 
 
 @require_POST
@@ -44,10 +175,12 @@ def annuler_seance(request, seance_id):
     code_rdv = 3 if request.user == seance.client else 4
     seance.code_rdv = code_rdv
     seance.message = note
-    seance.save()
+    with transaction.atomic():
+        seance.save()
+        notifications.notifier_statut(seance)
 
     messages.success(request, "Le rendez-vous a été annulé.")
-    return redirect("accounts:dashboard_client" if request.user.groups.filter(name="client").exists() else "accounts:dashboard_coach")
+    return redirect("accounts:dashboard_client" if request.roles.is_client else "accounts:dashboard_coach")
 
 
 @login_required
@@ -56,7 +189,9 @@ def marquer_absent(request, seance_id):
     seance = get_object_or_404(Seance, id=seance_id, coach=request.user)
     seance.code_rdv = 2
     seance.message = "Marqué comme absent par le coach."
-    seance.save()
+    with transaction.atomic():
+        seance.save()
+        notifications.notifier_statut(seance)
     messages.success(request, "Le client a été marqué comme absent.")
     return redirect("accounts:dashboard_coach")
 
@@ -69,7 +204,9 @@ def confirmer_fin_rdv(request, rdv_id):
     if form.is_valid():
         rdv.code_rdv = 1
         rdv.message = form.cleaned_data['notes']
-        rdv.save()
+        with transaction.atomic():
+            rdv.save()
+            notifications.notifier_statut(rdv)
         messages.success(request, "Le rendez-vous a été marqué comme terminé.")
     else:
         messages.error(request, "Une erreur est survenue. Merci de réessayer.")
@@ -78,90 +215,234 @@ def confirmer_fin_rdv(request, rdv_id):
 
 @login_required
 @never_cache
-def historique_client(request):
+async def historique_client(request):
+    user = await autilisateur(request)
     now_local = localtime(now())
     today = now_local.date()
-    current_time = now_local.time()
 
-    # Séances passées (date < aujourd’hui)
-    anciennes_seances = Seance.objects.filter(
-        client=request.user,
-        date__lt=today
-    )
-
-    # Séances du jour dont l’heure est déjà passée
-    seances_du_jour_terminees = Seance.objects.filter(
-        client=request.user,
-        date=today,
-        heure_debut__lt=current_time
-    )
+    historiques, curseur_suivant = await apage_keyset(Seance.objects.history_for_client(user, now_local))
 
-    # Union des deux ensembles
-    historiques = (anciennes_seances | seances_du_jour_terminees).order_by('-date', '-heure_debut')
-
-    return render(request, 'seances/historique_client.html', {
+    return await arender(request, 'seances/historique_client.html', {
         'historiques': historiques,
+        'curseur_suivant': curseur_suivant,
         'today': today,
-        'is_client': True,
-        'is_coach': False,
     })
 
 
+@login_required
+@never_cache
+async def historique_client_page(request):
+    """Fragment HTML de la page suivante de l'historique client (chargement progressif)."""
+    user = await autilisateur(request)
+    now_local = localtime(now())
+    try:
+        historiques, curseur_suivant = await apage_keyset(
+            Seance.objects.history_for_client(user, now_local),
+            request.GET.get("curseur"),
+        )
+    except ValueError:
+        return HttpResponseBadRequest("Curseur invalide.")
+
+    return await arender(request, 'seances/partials/historique_client_lignes.html', {
+        'historiques': historiques,
+        'curseur_suivant': curseur_suivant,
+        'today': now_local.date(),
+    })
 
 
 @login_required
 @never_cache
-def historique_coach(request):
-    coach = request.user
+async def historique_coach(request):
+    coach = await autilisateur(request)
     today = timezone.localdate()
 
-    historiques = Seance.objects.filter(
-        coach=coach,
-        date__lte=today
-    ).exclude(code_rdv=0).order_by('-date', '-heure_debut')
-
-    seances_oubliees = Seance.objects.filter(
-        coach=coach,
-        date__lt=today,
-        code_rdv=0
-    ).order_by('-date', '-heure_debut')
-
     if request.method == "POST":
-        rdv_id = request.POST.get("rdv_id")
-        rdv = get_object_or_404(Seance, id=rdv_id, coach=coach)
+        rdv = await Seance.objects.filter(id=request.POST.get("rdv_id"), coach=coach).afirst()
+        if rdv is None:
+            raise Http404("Séance introuvable.")
         notes = request.POST.get("notes", "").strip()
         if notes:
             rdv.message = notes
-            rdv.save()
+            await rdv.asave()
             messages.success(request, "Note mise à jour avec succès.")
         else:
             messages.error(request, "La note ne peut pas être vide.")
         return redirect("seances:historique_coach")
 
+    async def contexte_tableau():
+        historiques, curseur_suivant = await apage_keyset(Seance.objects.for_coach_history(coach, today))
+        seances_oubliees = [rdv async for rdv in Seance.objects.forgotten_for_coach(coach, today)]
+        return {
+            'historique_rdv': historiques,
+            'curseur_suivant': curseur_suivant,
+            'seances_oubliees': seances_oubliees,
+            'has_seances_oubliees': bool(seances_oubliees),
+            'statuts_traitement': TraitementSeancesForm.STATUTS,
+            'today': today,
+        }
+
     context = {
-        'historique_rdv': historiques,
+        'tableau_historique': await fragments.arendre(
+            request, "historique", coach.pk, today,
+            'seances/partials/historique_coach_tableau.html', contexte_tableau,
+        ),
         'form_note': ModifierNoteHistoriqueForm(),
-        'seances_oubliees': seances_oubliees,
-        'has_seances_oubliees': seances_oubliees.exists(),
-        'is_coach': True,
+        'form_export': ExportHistoriqueForm(),
     }
-    return render(request, 'seances/historique_coach.html', context)
+    return await arender(request, 'seances/historique_coach.html', context)
+
+
+@login_required
+@require_POST
+def traiter_seances_oubliees(request):
+    """
+    Applique en une fois les statuts choisis pour les séances oubliées du coach.
+
+    La propriété des séances est vérifiée en une requête ; si l'une d'elles
+    n'appartient pas au coach ou a déjà été traitée, rien n'est modifié.
+    Les modifications sont écrites avec un seul ``bulk_update``.
+    """
+    form = TraitementSeancesForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, " ".join(form.non_field_errors()))
+        return redirect("seances:historique_coach")
+
+    traitements = {seance_id: (code, note) for seance_id, code, note in form.cleaned_data["traitements"]}
+    with transaction.atomic():
+        seances = list(
+            Seance.objects.select_for_update()
+            .filter(id__in=traitements, coach=request.user, code_rdv=0, debut__lt=debut_jour(timezone.localdate()))
+        )
+        if len(seances) != len(traitements):
+            messages.error(request, "Certaines séances ne peuvent pas être traitées. Aucune modification n'a été enregistrée.")
+            return redirect("seances:historique_coach")
+
+        maintenant = timezone.now()
+        for seance in seances:
+            seance.code_rdv, seance.message = traitements[seance.id]
+            seance.modifie_le = maintenant
+        Seance.objects.bulk_update(seances, ["code_rdv", "message", "modifie_le"])
+        seances_modifiees(seances)
+        notifications.notifier_statuts(seances)
+
+    messages.success(request, f"{len(seances)} séance(s) traitée(s).")
+    return redirect("seances:historique_coach")
 
 
 @login_required
 @never_cache
-def futures_sessions_coach(request):
-    coach = request.user
+async def historique_coach_page(request):
+    """Fragment HTML de la page suivante de l'historique coach (chargement progressif)."""
+    coach = await autilisateur(request)
+    today = timezone.localdate()
+    try:
+        historiques, curseur_suivant = await apage_keyset(
+            Seance.objects.for_coach_history(coach, today),
+            request.GET.get("curseur"),
+        )
+    except ValueError:
+        return HttpResponseBadRequest("Curseur invalide.")
+
+    return await arender(request, 'seances/partials/historique_coach_lignes.html', {
+        'historique_rdv': historiques,
+        'curseur_suivant': curseur_suivant,
+        'today': today,
+    })
+
+
+@login_required
+@never_cache
+async def futures_sessions_coach(request):
+    coach = await autilisateur(request)
     tomorrow = timezone.localdate() + timezone.timedelta(days=1)
 
-    futures_seances = Seance.objects.filter(
-        coach=coach,
-        date__gte=tomorrow,
-        code_rdv=0  # seulement les futurs rdv non traités
-    ).order_by('date', 'heure_debut')
+    async def contexte_tableau():
+        # seulement les futurs rdv non traités
+        return {'futures_seances': [rdv async for rdv in Seance.objects.upcoming_for_coach(coach, tomorrow)]}
 
     context = {
-        'futures_seances': futures_seances,
-        'is_coach': True,
+        'tableau_futures_seances': await fragments.arendre(
+            request, "futures_seances", coach.pk, tomorrow,
+            'seances/partials/futures_seances_tableau.html', contexte_tableau,
+        ),
     }
-    return render(request, 'seances/futures_sessions_coach.html', context)
+    return await arender(request, 'seances/futures_sessions_coach.html', context)
+
+
+@login_required
+@require_safe
+def export_historique_coach(request):
+    """
+    Exporte l'historique du coach en CSV (transmis au fil de l'eau) ou en XLSX.
+
+    Filtres (GET) : ``date_debut``, ``date_fin``, ``statuts`` (répétable), ``format``.
+    """
+    form = ExportHistoriqueForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(" ".join(erreur for erreurs in form.errors.values() for erreur in erreurs))
+
+    filtres = form.cleaned_data
+    seances = export.seances_a_exporter(request.user, filtres["date_debut"], filtres["date_fin"], filtres["statuts"])
+    nom = f"historique_{timezone.localdate():%Y%m%d}"
+
+    if filtres["format"] == "xlsx":
+        fichier = tempfile.TemporaryFile()
+        export.ecrire_xlsx(seances, fichier)
+        fichier.seek(0)
+        return FileResponse(
+            fichier, as_attachment=True, filename=f"{nom}.xlsx",
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+
+    response = StreamingHttpResponse(export.lignes_csv(seances), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{nom}.csv"'
+    return response
+
+
+@login_required
+@require_safe
+def statistiques_coach(request):
+    """Taux de présence, d'absence et d'annulation du coach, lus dans les tables de synthèse."""
+    context = statistiques.statistiques_coach(request.user, timezone.localdate())
+    context["nb_mois"] = statistiques.NB_MOIS
+    return render(request, "seances/statistiques_coach.html", context)
+
+
+def _etat_agenda(request, jeton):
+    """Utilisateur du jeton et état de son agenda, calculés une fois par requête."""
+    if not hasattr(request, "_etat_agenda"):
+        user = agenda.utilisateur_du_jeton(jeton)
+        if user is None:
+            raise Http404("Agenda introuvable.")
+        request._etat_agenda = (user, *agenda.etat_agenda(user))
+    return request._etat_agenda
+
+
+def _etag_agenda(request, jeton):
+    user, nombre, derniere = _etat_agenda(request, jeton)
+    role = "coach" if roles_utilisateur(user).is_coach else "client"
+    return f"{role}-{user.pk}-{nombre}-{derniere.timestamp() if derniere else 0}"
+
+
+def _derniere_modification_agenda(request, jeton):
+    return _etat_agenda(request, jeton)[2]
+
+
+@require_safe
+@condition(etag_func=_etag_agenda, last_modified_func=_derniere_modification_agenda)
+def agenda_ics(request, jeton):
+    """
+    Flux iCalendar des séances d'un coach ou d'un client, identifié par un jeton signé.
+
+    Une requête conditionnelle (If-None-Match / If-Modified-Since) reçoit une
+    réponse 304 tant qu'aucune séance de l'agenda n'a changé ; sinon le
+    calendrier est transmis au fil de sa génération.
+    """
+    user = _etat_agenda(request, jeton)[0]
+    response = StreamingHttpResponse(
+        agenda.lignes_ics(user, request.get_host().split(":")[0]),
+        content_type="text/calendar; charset=utf-8",
+    )
+    response["Content-Disposition"] = 'inline; filename="agenda.ics"'
+    response["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,18 @@
+// Modales partagées par toutes les lignes d'un tableau.
+// La modale porte le modèle d'URL de son formulaire, calculé une seule fois
+// côté serveur avec l'identifiant 0 (data-action-modele) ; le bouton qui l'ouvre
+// fournit l'identifiant de la séance (data-rdv-id) et le texte à afficher
+// (data-resume). Une seule modale par action, quel que soit le nombre de lignes.
+document.addEventListener("show.bs.modal", (event) => {
+  const modale = event.target;
+  const bouton = event.relatedTarget;
+  if (!modale.classList.contains("js-modale-action") || !bouton) {
+    return;
+  }
+  const formulaire = modale.querySelector("form");
+  formulaire.reset();
+  formulaire.action = modale.dataset.actionModele.replace("/0/", "/" + bouton.dataset.rdvId + "/");
+  modale.querySelectorAll(".js-resume").forEach((element) => {
+    element.textContent = bouton.dataset.resume;
+  });
+});